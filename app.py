@@ -1,30 +1,78 @@
+import math
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, Response, stream_with_context, jsonify, abort
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired
-from fpdf import FPDF
-import pandas as pd
-import io
-from io import BytesIO
+from datetime import date
 import sqlite3
 from functools import wraps
+import db
+import instrumentacion
+import replica
+from db import conectar_bd, transaccion_inmediata
+from replica import conectar_lectura, solo_lectura
+from crear_bd import crear_bd
+from pagos import aplicar_pago
+from diario import ajustar_balance, anular_transaccion, corregir_transaccion, balances_al
+from importar_datos import TIPOS_IMPORTACION, MAX_MOVIMIENTOS_LOTE, importar, leer_filas, registrar_lote
+from cache import CacheTTL
+from resumen import ResumenTablero
+from catalogo_proveedores import CatalogoProveedores, buscar_por_prefijo
+from listados import LISTADOS, FILAS_POR_PAGINA, FILAS_MAX_POR_PAGINA, consultar_pagina, version_listado, version_tablas
+from estado_cuenta import (COLUMNAS_ESTADO, MOVIMIENTOS_POR_PAGINA, MOVIMIENTOS_MAX_POR_PAGINA, saldo_apertura,
+                           consultar_estado_cuenta, recorrer_estado_cuenta)
+from busqueda import TIPOS_BUSQUEDA, RESULTADOS_POR_PAGINA, RESULTADOS_MAX_POR_PAGINA, buscar
+from generador_reportes import (TABLAS_REPORTE, ESCRITORES, MIMETYPES, EXTENSIONES, generar_csv_en_bloques,
+                                 csv_de_bloques, version_tabla, consultar_reporte)
+from trabajos_reportes import CacheArtefactos, ColaReportes
+from programador_pagos import ProgramadorPagos, propuesta_actual, facturas_propuesta, generar_propuesta
 
 # Configuración básica de la aplicación
 app = Flask(__name__)
-app.secret_key = 'supersecretkey'  # Cambia esta clave en producción
+# En producción la clave se toma de CXP_SECRET_KEY (servidor.py no arranca sin ella)
+app.secret_key = os.environ.get('CXP_SECRET_KEY', 'supersecretkey')
 
 # Configuración de Flask-Login
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
-# Conexión a la base de datos SQLite
-def conectar_bd():
-    db_path = os.path.join(os.path.dirname(__file__), 'cuentas_por_pagar.db')
-    return sqlite3.connect(db_path)
+# Conexión a la base de datos SQLite (una conexión del pool por petición)
+db.init_app(app)
+
+# Medición opcional de SQL, plantillas y tiempos por petición (CXP_INSTRUMENTACION=1)
+instrumentacion.init_app(app)
+
+# Réplica de lectura opcional para reportes y listados (CXP_REPLICA=1)
+replica.init_app(app)
+
+# Asegura que existan las tablas, índices y triggers que usa la aplicación
+crear_bd()
+
+# Reportes en segundo plano y caché de archivos generados
+REPORTES_CACHE_MB = int(os.environ.get('CXP_REPORTES_CACHE_MB', '256'))
+REPORTES_PROCESOS = int(os.environ.get('CXP_REPORTES_PROCESOS', '2'))
+REPORTES_DIR = os.environ.get('CXP_REPORTES_DIR', os.path.join(app.instance_path, 'reportes'))
+cola_reportes = ColaReportes(
+    db.DB_PATH,
+    CacheArtefactos(REPORTES_DIR, REPORTES_CACHE_MB * 1024 * 1024),
+    procesos=REPORTES_PROCESOS,
+)
+
+# Propuesta de pagos por vencimiento e instantánea diaria de saldos en segundo plano
+# (CXP_PAGOS_PROGRAMADOR=0 lo desactiva; la propuesta se puede seguir generando desde
+# su página y las instantáneas hay que tomarlas con diario.py desde cron)
+PAGOS_PROGRAMADOR = os.environ.get('CXP_PAGOS_PROGRAMADOR', '1') == '1'
+programador_pagos = ProgramadorPagos(app.logger)
+
+# El hilo se inicia con la primera petición de cada proceso, después del fork
+@app.before_request
+def iniciar_programador_pagos():
+    if PAGOS_PROGRAMADOR:
+        programador_pagos.iniciar()
 
 # Modelo de Usuario
 class User(UserMixin):
@@ -37,16 +85,29 @@ class User(UserMixin):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-# Carga del usuario desde la base de datos
+# Caché de usuarios para no consultar la base de datos en cada petición. Cada proceso
+# tiene la suya y la aplicación no modifica usuarios, así que el TTL es la única
+# invalidación: un cambio de rol hecho directamente en la base de datos tarda hasta
+# CXP_USUARIOS_CACHE_TTL segundos en verse en todos los procesos.
+USUARIOS_CACHE_TTL = int(os.environ.get('CXP_USUARIOS_CACHE_TTL', '60'))
+usuarios_cache = CacheTTL(ttl=USUARIOS_CACHE_TTL)
+
+# Carga del usuario desde la caché o desde la base de datos
 @login_manager.user_loader
 def load_user(user_id):
+    user = usuarios_cache.obtener(str(user_id))
+    if user is not None:
+        return user
+
     with conectar_bd() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM usuarios WHERE id = ?', (user_id,))
         user_data = cursor.fetchone()
 
     if user_data:
-        return User(id=user_data[0], username=user_data[1], password_hash=user_data[2], role=user_data[3])
+        user = User(id=user_data[0], username=user_data[1], password_hash=user_data[2], role=user_data[3])
+        usuarios_cache.guardar(str(user_id), user)
+        return user
     return None
 
 # Formulario de Login usando Flask-WTF
@@ -55,8 +116,9 @@ class LoginForm(FlaskForm):
     password = PasswordField('Contraseña', validators=[DataRequired()])
     submit = SubmitField('Iniciar Sesión')
 
-# Ruta para login
+# Ruta para login (el POST solo lee el usuario: no cuenta como escritura para la réplica)
 @app.route('/login', methods=['GET', 'POST'])
+@solo_lectura
 def login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -72,6 +134,8 @@ def login():
         if user_data:
             user = User(id=user_data[0], username=user_data[1], password_hash=user_data[2], role=user_data[3])
             if user.check_password(password):
+                # Al iniciar sesión se usan los datos recién leídos
+                usuarios_cache.guardar(str(user.id), user)
                 login_user(user)
                 flash('Inicio de sesión exitoso', 'success')
                 return redirect(url_for('index'))
@@ -93,6 +157,20 @@ def role_required(role):
         return decorated_function
     return wrapper
 
+# Estado de la réplica de lectura: archivo vigente y retraso de sus datos
+@app.route('/estadisticas/replica')
+@login_required
+@role_required('admin')
+def estadisticas_replica():
+    return jsonify(replica.estado())
+
+# Aciertos y fallos de la caché de usuarios
+@app.route('/estadisticas/cache_usuarios')
+@login_required
+@role_required('admin')
+def estadisticas_cache_usuarios():
+    return jsonify(usuarios_cache.estadisticas())
+
 # Ruta para cerrar sesión
 @app.route('/logout')
 @login_required
@@ -101,13 +179,19 @@ def logout():
     flash('Has cerrado sesión', 'info')
     return redirect(url_for('login'))
 
+# Resumen del tablero de inicio, se recalcula solo cuando cambian los datos
+resumen_tablero = ResumenTablero()
+
+# Proveedores de los formularios, se vuelven a leer solo al agregar, editar o eliminar uno
+catalogo_proveedores = CatalogoProveedores()
+
 # Ruta principal
 @app.route('/')
 @login_required
 def index():
     # Redirige según el rol
     if current_user.role == 'admin':
-        return render_template('index.html', admin=True)
+        return render_template('index.html', admin=True, resumen=resumen_tablero.obtener(conectar_bd()))
     else:
         return render_template('index.html', admin=False)
 
@@ -124,7 +208,8 @@ def agregar_proveedor():
         
         with conectar_bd() as conn:
             cursor = conn.cursor()
-            cursor.execute('INSERT INTO proveedores (id_proveedor, nombre, balance) VALUES (?, ?, ?)', (id_proveedor, nombre, balance))
+            cursor.execute('INSERT INTO proveedores (id_proveedor, nombre, balance, balance_inicial) VALUES (?, ?, ?, ?)',
+                           (id_proveedor, nombre, balance, balance))
             conn.commit()
         return redirect('/listar_proveedores')
     return render_template('agregar_proveedor.html')
@@ -138,16 +223,26 @@ def editar_proveedor(id_proveedor):
         if request.method == 'POST':
             # Obtener datos del formulario
             nombre = request.form.get('nombre')
-            balance = request.form.get('balance')
-
-            # Actualizar la base de datos
-            cursor.execute(
-                'UPDATE proveedores SET nombre = ?, balance = ? WHERE id_proveedor = ?',
-                (nombre, balance, id_proveedor)
-            )
-            conn.commit()
+            try:
+                balance = float(request.form.get('balance'))
+            except (TypeError, ValueError):
+                balance = float('nan')
+            if not math.isfinite(balance):
+                flash('El balance debe ser un número.', 'danger')
+                return redirect(url_for('editar_proveedor', id_proveedor=id_proveedor))
+
+            # El ajuste manual del balance se registra en el diario como un movimiento de
+            # hoy por la diferencia, así los balances anteriores no cambian (ver diario.py)
+            try:
+                with transaccion_inmediata(conn):
+                    cursor.execute('UPDATE proveedores SET nombre = ? WHERE id_proveedor = ?', (nombre, id_proveedor))
+                    ajustar_balance(cursor, id_proveedor, balance)
+            except ValueError as e:
+                flash(str(e), 'danger')
+            except sqlite3.Error as e:
+                flash(f'Error al actualizar el proveedor: {e}', 'danger')
             return redirect('/listar_proveedores')
-        
+
         # Obtener el proveedor actual para mostrar en el formulario de edición
         cursor.execute('SELECT * FROM proveedores WHERE id_proveedor = ?', (id_proveedor,))
         proveedor = cursor.fetchone()
@@ -161,53 +256,110 @@ def editar_proveedor(id_proveedor):
 def eliminar_proveedor(id_proveedor):
     with conectar_bd() as conn:
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM proveedores WHERE id_proveedor = ?', (id_proveedor,))
-        conn.commit()
+        try:
+            cursor.execute('DELETE FROM proveedores WHERE id_proveedor = ?', (id_proveedor,))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            # Las claves foráneas impiden dejar transacciones o facturas sin proveedor
+            conn.rollback()
+            flash('No se puede eliminar un proveedor con transacciones o facturas registradas.', 'danger')
     return redirect('/listar_proveedores')
 
 @app.route('/listar_proveedores')
 @login_required
 @role_required('admin')
 def listar_proveedores():
-    with conectar_bd() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM proveedores')
-        proveedores = cursor.fetchall()
-    return render_template('listar_proveedores.html', proveedores=proveedores)
+    # Las filas se cargan por páginas desde /api/proveedores (static/scripts.js)
+    return render_template('listar_proveedores.html')
 
 
+# Tamaño de página del listado de transacciones
+TRANSACCIONES_POR_PAGINA = 50
+TRANSACCIONES_MAX_POR_PAGINA = 500
+
 @app.route('/listar_transacciones', methods=['GET'])
 @login_required
 @role_required('admin')
 def listar_transacciones():
-    transaccion_filtro = request.args.get('id_transaccion')
-    proveedor_filtro = request.args.get('proveedor_id')
+    transaccion_filtro = request.args.get('id_transaccion', type=int)
+    proveedor_filtro = request.args.get('proveedor_id', type=int)
     tipo_filtro = request.args.get('tipo_movimiento')
-    monto_filtro = request.args.get('monto')
+    monto_filtro = request.args.get('monto', type=float)
 
+    # Paginación por cursor sobre id_transaccion
+    despues = request.args.get('despues', type=int)
+    antes = request.args.get('antes', type=int)
+    por_pagina = request.args.get('por_pagina', TRANSACCIONES_POR_PAGINA, type=int)
+    por_pagina = max(1, min(por_pagina, TRANSACCIONES_MAX_POR_PAGINA))
 
-    query = 'SELECT * FROM transacciones WHERE 1=1'
+    # anulada indica si la transacción ya tiene su contrapartida (idx_transacciones_original)
+    query = '''SELECT t.*, EXISTS (SELECT 1 FROM transacciones a WHERE a.id_original = t.id_transaccion) AS anulada
+               FROM transacciones t WHERE 1=1'''
     params = []
 
     if tipo_filtro:
         query += ' AND tipo_movimiento = ?'
         params.append(tipo_filtro)
-    if proveedor_filtro:
-        query += ' AND id_proveedor LIKE ?'
-        params.append(f'%{proveedor_filtro}%')
-    if transaccion_filtro:
-        query += ' AND id_transaccion LIKE ?'
-        params.append(f'%{transaccion_filtro}%')
-    if monto_filtro:
+    if proveedor_filtro is not None:
+        query += ' AND id_proveedor = ?'
+        params.append(proveedor_filtro)
+    if transaccion_filtro is not None:
+        query += ' AND id_transaccion = ?'
+        params.append(transaccion_filtro)
+    if monto_filtro is not None:
         query += ' AND monto = ?'
         params.append(monto_filtro)
 
-    with conectar_bd() as conn:
+    if antes is not None:
+        query += ' AND id_transaccion < ? ORDER BY id_transaccion DESC LIMIT ?'
+        params.extend([antes, por_pagina + 1])
+    else:
+        if despues is not None:
+            query += ' AND id_transaccion > ?'
+            params.append(despues)
+        query += ' ORDER BY id_transaccion LIMIT ?'
+        params.append(por_pagina + 1)
+
+    with conectar_lectura() as conn:
         cursor = conn.cursor()
         cursor.execute(query, params)
         transacciones = cursor.fetchall()
 
-    return render_template('listar_transacciones.html', transacciones=transacciones)
+    # La fila extra indica si hay más resultados en la dirección pedida
+    hay_mas = len(transacciones) > por_pagina
+    transacciones = transacciones[:por_pagina]
+    if antes is not None:
+        transacciones.reverse()
+        hay_siguiente, hay_anterior = True, hay_mas
+    else:
+        hay_siguiente, hay_anterior = hay_mas, despues is not None
+
+    filtros = {
+        'id_transaccion': transaccion_filtro,
+        'proveedor_id': proveedor_filtro,
+        'tipo_movimiento': tipo_filtro,
+        'monto': monto_filtro,
+        'por_pagina': por_pagina,
+    }
+    filtros = {clave: valor for clave, valor in filtros.items() if valor not in (None, '')}
+
+    siguiente_url = anterior_url = None
+    if transacciones and hay_siguiente:
+        siguiente_url = url_for('listar_transacciones', despues=transacciones[-1][0], **filtros)
+    if transacciones and hay_anterior:
+        anterior_url = url_for('listar_transacciones', antes=transacciones[0][0], **filtros)
+
+    return render_template('listar_transacciones.html', transacciones=transacciones, filtros=filtros,
+                           siguiente_url=siguiente_url, anterior_url=anterior_url)
+
+
+# Monto de un formulario como float, o None si no es un número mayor que cero
+def leer_monto(valor):
+    try:
+        monto = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return monto if 0 < monto < float('inf') else None
 
 
 @app.route('/agregar_transaccion', methods=['GET', 'POST'])
@@ -216,123 +368,111 @@ def listar_transacciones():
 def agregar_transaccion():
     if request.method == 'POST':
         id_proveedor = request.form['id_proveedor']
-        monto = float(request.form['monto'])
+        monto = leer_monto(request.form['monto'])
         tipo_movimiento = request.form['tipo_movimiento']
 
-        with conectar_bd() as conn:
-            cursor = conn.cursor()
-
-            # Verificar si el proveedor existe
-            cursor.execute('SELECT balance FROM proveedores WHERE id_proveedor = ?', (id_proveedor,))
-            proveedor = cursor.fetchone()
-
-            if not proveedor:
-                flash('El proveedor no existe.', 'danger')
-                return redirect('/listar_transacciones')
+        if tipo_movimiento not in ('CR', 'DB'):
+            flash('Tipo de movimiento inválido.', 'danger')
+            return redirect('/listar_transacciones')
+        if monto is None:
+            flash('El monto debe ser un número mayor que cero.', 'danger')
+            return redirect('/listar_transacciones')
 
-            balance_actual = proveedor[0]
+        conn = conectar_bd()
+        cursor = conn.cursor()
 
-            # Calcular el nuevo balance
-            if tipo_movimiento == 'DB':
-                nuevo_balance = balance_actual - monto
-            elif tipo_movimiento == 'CR':
-                nuevo_balance = balance_actual + monto
-            else:
-                flash('Tipo de movimiento inválido.', 'danger')
-                return redirect('/listar_transacciones')
+        # Verificar si el proveedor existe
+        cursor.execute('SELECT 1 FROM proveedores WHERE id_proveedor = ?', (id_proveedor,))
+        if not cursor.fetchone():
+            flash('El proveedor no existe.', 'danger')
+            return redirect('/listar_transacciones')
 
-            try:
+        try:
+            # El balance del proveedor lo actualiza el trigger trg_balance_insert
+            with transaccion_inmediata(conn):
                 # Insertar la transacción
                 cursor.execute('''
-                    INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto)
-                    VALUES (?, ?, ?)
+                    INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto, fecha_registro)
+                    VALUES (?, ?, ?, datetime('now', 'localtime'))
                 ''', (id_proveedor, tipo_movimiento, monto))
 
-                # Actualizar el balance del proveedor
-                cursor.execute('UPDATE proveedores SET balance = ? WHERE id_proveedor = ?', (nuevo_balance, id_proveedor))
-
-                # Si es un pago (CR), verificar y eliminar la factura correspondiente
+                # Si es un pago (CR), aplicarlo a las facturas pendientes del proveedor
                 if tipo_movimiento == 'CR':
-                    cursor.execute('''
-                        SELECT id_factura FROM facturas 
-                        WHERE id_proveedor = ? AND monto = ?
-                    ''', (id_proveedor, monto))
-                    factura = cursor.fetchone()
+                    aplicaciones = aplicar_pago(cursor, cursor.lastrowid, id_proveedor, monto)
+                    if aplicaciones:
+                        flash(f'Pago aplicado a {len(aplicaciones)} factura(s).', 'success')
+        except sqlite3.Error as e:
+            flash(f'Error al registrar la transacción: {e}', 'danger')
 
-                    if factura:
-                        cursor.execute('DELETE FROM facturas WHERE id_factura = ?', (factura[0],))
-                        flash('Factura pagada y eliminada con éxito.', 'success')
+        return redirect('/listar_transacciones')
 
-                conn.commit()
-            except sqlite3.Error as e:
-                flash(f'Error al registrar la transacción: {e}', 'danger')
-                conn.rollback()
+    # Proveedores para el formulario (desde el catálogo en memoria)
+    return render_template('agregar_transaccion.html', proveedores=catalogo_proveedores.obtener(conectar_bd()))
 
-        return redirect('/listar_transacciones')
 
-    # Obtener proveedores para el formulario
-    with conectar_bd() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT id_proveedor, nombre FROM proveedores')
-        proveedores = cursor.fetchall()
+# Registro de muchos movimientos en una sola transacción. Recibe un arreglo JSON de
+# movimientos, o {"movimientos": [...], "parcial": true} para registrar los válidos
+# aunque haya errores en otros.
+@app.route('/api/transacciones/lote', methods=['POST'])
+@login_required
+@role_required('admin')
+def registrar_lote_transacciones():
+    datos = request.get_json(silent=True)
+    parcial = False
+    if isinstance(datos, dict):
+        parcial = bool(datos.get('parcial'))
+        datos = datos.get('movimientos')
+    if not isinstance(datos, list) or not datos:
+        return jsonify({'error': 'Se espera un arreglo JSON de movimientos'}), 400
+    if len(datos) > MAX_MOVIMIENTOS_LOTE:
+        return jsonify({'error': f'El lote supera el máximo de {MAX_MOVIMIENTOS_LOTE} movimientos'}), 413
+
+    try:
+        resultados, registrado = registrar_lote(conectar_bd(), datos, parcial)
+    except sqlite3.Error as e:
+        app.logger.exception('Error al registrar el lote de transacciones')
+        return jsonify({'error': f'Error al registrar el lote: {e}'}), 500
 
-    return render_template('agregar_transaccion.html', proveedores=proveedores)
+    cuerpo = {
+        'registrados': sum(1 for resultado in resultados if resultado['estado'] == 'registrado'),
+        'errores': sum(1 for resultado in resultados if resultado['estado'] == 'error'),
+        'resultados': resultados,
+    }
+    return jsonify(cuerpo), 200 if registrado else 422
 
 
 @app.route('/editar_transaccion/<int:id_transaccion>', methods=['GET', 'POST'])
 @login_required
 @role_required('admin')
 def editar_transaccion(id_transaccion):
-    with conectar_bd() as conn:
-        cursor = conn.cursor()
-        if request.method == 'POST':
-            # Obtener datos del formulario
-            id_proveedor = request.form.get('id_proveedor')
-            tipo_movimiento = request.form.get('tipo_movimiento')
-            monto = float(request.form.get('monto'))
-
-            # Obtener los datos actuales de la transacción antes de actualizar
-            cursor.execute('SELECT id_proveedor, tipo_movimiento, monto FROM transacciones WHERE id_transaccion = ?', (id_transaccion,))
-            transaccion_actual = cursor.fetchone()
-
-            if not transaccion_actual:
-                flash("La transacción no existe.", "danger")
-                return redirect('/listar_transacciones')
-
-            id_proveedor_actual, tipo_movimiento_actual, monto_actual = transaccion_actual
-
-            # Revertir el balance del proveedor con la transacción actual
-            if tipo_movimiento_actual == 'DB':
-                balance_ajustado = monto_actual
-            elif tipo_movimiento_actual == 'CR':
-                balance_ajustado = -monto_actual
-
-            cursor.execute('UPDATE proveedores SET balance = balance + ? WHERE id_proveedor = ?',
-                           (balance_ajustado, id_proveedor_actual))
-
-            # Aplicar el nuevo impacto de la transacción editada
-            if tipo_movimiento == 'DB':
-                balance_ajustado = -monto
-            elif tipo_movimiento == 'CR':
-                balance_ajustado = monto
-
-            cursor.execute('UPDATE proveedores SET balance = balance + ? WHERE id_proveedor = ?',
-                           (balance_ajustado, id_proveedor))
-
-            # Actualizar la transacción en la base de datos
-            cursor.execute(
-                '''UPDATE transacciones 
-                   SET id_proveedor = ?, tipo_movimiento = ?, monto = ? 
-                   WHERE id_transaccion = ?''',
-                (id_proveedor, tipo_movimiento, monto, id_transaccion)
-            )
-            conn.commit()
-            flash("Transacción actualizada y balance del proveedor ajustado.", "success")
+    conn = conectar_bd()
+    if request.method == 'POST':
+        # Obtener datos del formulario
+        id_proveedor = request.form.get('id_proveedor')
+        tipo_movimiento = request.form.get('tipo_movimiento')
+        monto = leer_monto(request.form.get('monto'))
+
+        if tipo_movimiento not in ('CR', 'DB'):
+            flash('Tipo de movimiento inválido.', 'danger')
+            return redirect('/listar_transacciones')
+        if monto is None:
+            flash('El monto debe ser un número mayor que cero.', 'danger')
             return redirect('/listar_transacciones')
 
-        # Obtener la transacción actual para mostrar en el formulario de edición
-        cursor.execute('SELECT * FROM transacciones WHERE id_transaccion = ?', (id_transaccion,))
-        transaccion = cursor.fetchone()
+        # La transacción no se modifica: se anula con una contrapartida y se registra
+        # una nueva con los datos corregidos (ver diario.py)
+        try:
+            with transaccion_inmediata(conn):
+                nuevo_id, _ = corregir_transaccion(conn.cursor(), id_transaccion, id_proveedor, tipo_movimiento, monto)
+            flash(f"Transacción {id_transaccion} anulada y registrada de nuevo como {nuevo_id}.", "success")
+        except ValueError as e:
+            flash(str(e), 'danger')
+        except sqlite3.Error as e:
+            flash(f'Error al corregir la transacción: {e}', 'danger')
+        return redirect('/listar_transacciones')
+
+    # Obtener la transacción actual para mostrar en el formulario de edición
+    transaccion = conn.execute('SELECT * FROM transacciones WHERE id_transaccion = ?', (id_transaccion,)).fetchone()
 
     return render_template('editar_transaccion.html', transaccion=transaccion)
 
@@ -341,11 +481,16 @@ def editar_transaccion(id_transaccion):
 @login_required
 @role_required('admin')
 def eliminar_transaccion(id_transaccion):
-    with conectar_bd() as conn:
-        cursor = conn.cursor()
-        # Eliminar la transacción de la base de datos
-        cursor.execute('DELETE FROM transacciones WHERE id_transaccion = ?', (id_transaccion,))
-        conn.commit()
+    conn = conectar_bd()
+    # La transacción queda en el diario y se registra su contrapartida
+    try:
+        with transaccion_inmediata(conn):
+            anular_transaccion(conn.cursor(), id_transaccion)
+        flash(f'Transacción {id_transaccion} anulada.', 'success')
+    except ValueError as e:
+        flash(str(e), 'danger')
+    except sqlite3.Error as e:
+        flash(f'Error al anular la transacción: {e}', 'danger')
     return redirect('/listar_transacciones')
 
 
@@ -365,9 +510,9 @@ def agregar_factura():
             cursor = conn.cursor()
             try:
                 cursor.execute('''
-                    INSERT INTO facturas (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento))
+                    INSERT INTO facturas (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento, saldo)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento, monto))
                 conn.commit()
                 flash('Factura agregada con éxito.', 'success')
             except sqlite3.Error as e:
@@ -376,14 +521,8 @@ def agregar_factura():
 
         return redirect('/listar_facturas')
 
-    # Obtener la lista de proveedores para mostrar en el formulario
-    with conectar_bd() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT id_proveedor, nombre FROM proveedores')
-        proveedores = cursor.fetchall()
-
-    # Pasar los proveedores al renderizado de la plantilla
-    return render_template('agregar_factura.html', proveedores=proveedores)
+    # Proveedores para el formulario (desde el catálogo en memoria)
+    return render_template('agregar_factura.html', proveedores=catalogo_proveedores.obtener(conectar_bd()))
 
 
 
@@ -392,12 +531,8 @@ def agregar_factura():
 @login_required
 @role_required('admin')
 def listar_facturas():
-    with conectar_bd() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT f.id_factura, f.id_proveedor, f.monto, f.descripcion, f.fecha_emision, f.fecha_vencimiento, p.nombre FROM facturas f JOIN proveedores p ON f.id_proveedor = p.id_proveedor')
-        facturas = cursor.fetchall()
-
-    return render_template('listar_facturas.html', facturas=facturas)
+    # Las filas se cargan por páginas desde /api/facturas (static/scripts.js)
+    return render_template('listar_facturas.html')
 
 
 # Ruta para editar factura
@@ -416,11 +551,13 @@ def editar_factura(id_factura):
             fecha_vencimiento = request.form['fecha_vencimiento']
 
             try:
+                # Si cambia el monto, el saldo pendiente cambia en la misma diferencia
                 cursor.execute('''
                     UPDATE facturas
-                    SET id_proveedor = ?, monto = ?, descripcion = ?, fecha_emision = ?, fecha_vencimiento = ?
+                    SET id_proveedor = ?, monto = ?, descripcion = ?, fecha_emision = ?, fecha_vencimiento = ?,
+                        saldo = MAX(ROUND(saldo + ? - monto, 2), 0)
                     WHERE id_factura = ?
-                ''', (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento, id_factura))
+                ''', (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento, monto, id_factura))
                 conn.commit()
                 flash('Factura actualizada con éxito.', 'success')
                 return redirect('/listar_facturas')
@@ -432,11 +569,8 @@ def editar_factura(id_factura):
         cursor.execute('SELECT * FROM facturas WHERE id_factura = ?', (id_factura,))
         factura = cursor.fetchone()
 
-        # Obtener la lista de proveedores para el selector
-        cursor.execute('SELECT id_proveedor, nombre FROM proveedores')
-        proveedores = cursor.fetchall()
-
-    return render_template('editar_factura.html', factura=factura, proveedores=proveedores)
+    # Proveedores para el selector (desde el catálogo en memoria)
+    return render_template('editar_factura.html', factura=factura, proveedores=catalogo_proveedores.obtener(conn))
 
 
 @app.route('/eliminar_factura/<int:id_factura>', methods=['POST'])
@@ -457,7 +591,8 @@ def eliminar_factura(id_factura):
 
             id_proveedor, monto = factura
 
-            # Eliminar la factura
+            # Eliminar la factura y los pagos aplicados a ella
+            cursor.execute('DELETE FROM pagos_facturas WHERE id_factura = ?', (id_factura,))
             cursor.execute('DELETE FROM facturas WHERE id_factura = ?', (id_factura,))
             conn.commit()
 
@@ -468,173 +603,344 @@ def eliminar_factura(id_factura):
 
     return redirect('/listar_facturas')
 
+# Antigüedad de saldos por proveedor a la fecha de corte
+@app.route('/antiguedad_saldos')
+@login_required
+@role_required('admin')
+def antiguedad_saldos():
+    corte = request.args.get('corte') or date.today().isoformat()
+    try:
+        corte = date.fromisoformat(corte).isoformat()
+    except ValueError:
+        flash('Fecha de corte no válida.', 'danger')
+        corte = date.today().isoformat()
+
+    cursor, columnas = consultar_reporte(conectar_lectura(), 'antiguedad', corte)
+    filas = cursor.fetchall()
+    totales = [round(sum(fila[i] for fila in filas), 2) for i in range(2, len(columnas))]
+
+    return render_template('antiguedad_saldos.html', filas=filas, totales=totales, corte=corte)
+
+
+# Propuesta de pagos: facturas vencidas y por vencer agrupadas por proveedor
+@app.route('/propuesta_pagos')
+@login_required
+@role_required('admin')
+def propuesta_pagos():
+    conn = conectar_bd()
+    propuesta = propuesta_actual(conn)
+    facturas = facturas_propuesta(conn, propuesta['id_propuesta']) if propuesta else {}
+    return render_template('propuesta_pagos.html', propuesta=propuesta, facturas=facturas,
+                           programador=programador_pagos.estado())
+
+@app.route('/propuesta_pagos/recalcular', methods=['POST'])
+@login_required
+@role_required('admin')
+def recalcular_propuesta_pagos():
+    try:
+        generar_propuesta(conectar_bd(), dias=programador_pagos.dias)
+    except sqlite3.Error as e:
+        flash(f'Error al generar la propuesta de pagos: {e}', 'danger')
+    return redirect(url_for('propuesta_pagos'))
+
+@app.route('/api/propuesta_pagos')
+@login_required
+@role_required('admin')
+def api_propuesta_pagos():
+    conn = conectar_bd()
+    propuesta = propuesta_actual(conn)
+    if propuesta:
+        facturas = facturas_propuesta(conn, propuesta['id_propuesta'])
+        for proveedor in propuesta['proveedores']:
+            proveedor['detalle'] = facturas.get(proveedor['id_proveedor'], [])
+        propuesta['alertas'] = [proveedor['id_proveedor'] for proveedor in propuesta['proveedores']
+                                if proveedor['vencidas']]
+    return jsonify({'propuesta': propuesta, 'programador': programador_pagos.estado()})
+
+
+# Sugerencias para el campo de proveedor de los formularios: proveedores cuyo nombre
+# empieza por el texto escrito (o con ese id)
+@app.route('/api/proveedores/sugerencias')
+@login_required
+@role_required('admin')
+def sugerencias_proveedores():
+    proveedores = buscar_por_prefijo(conectar_bd(), request.args.get('prefijo', ''))
+    return jsonify([{'id_proveedor': id_proveedor, 'nombre': nombre} for id_proveedor, nombre in proveedores])
+
+
+# API JSON de los listados con paginación por cursor. El ETag es la versión de las
+# tablas del listado, así una revalidación sin cambios responde 304 sin consultar
+# las filas.
+@app.route('/api/<nombre>')
+@login_required
+@role_required('admin')
+def api_listado(nombre):
+    if nombre not in LISTADOS:
+        abort(404)
+
+    conn = conectar_lectura()
+    etag = f'{nombre}-{version_listado(conn, nombre)}'
+    if etag in request.if_none_match:
+        respuesta = Response(status=304)
+    else:
+        parametros = request.args.to_dict()
+        orden = parametros.pop('orden', None)
+        despues = parametros.pop('despues', None)
+        por_pagina = request.args.get('por_pagina', FILAS_POR_PAGINA, type=int)
+        por_pagina = max(1, min(por_pagina, FILAS_MAX_POR_PAGINA))
+        parametros.pop('por_pagina', None)
+        try:
+            filas, siguiente = consultar_pagina(conn, nombre, orden, despues, por_pagina, parametros)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        respuesta = jsonify({'datos': filas, 'siguiente': siguiente})
+
+    # El navegador guarda la respuesta pero la revalida en cada uso
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+
+# Búsqueda de texto completo en nombres de proveedores y descripciones de facturas
+@app.route('/buscar')
+@login_required
+@role_required('admin')
+def buscar_registros():
+    texto = request.args.get('q', '').strip()
+    tipo = request.args.get('tipo', 'facturas')
+    if tipo not in TIPOS_BUSQUEDA:
+        tipo = 'facturas'
+    pagina = max(1, request.args.get('pagina', 1, type=int))
+    por_pagina = request.args.get('por_pagina', RESULTADOS_POR_PAGINA, type=int)
+    por_pagina = max(1, min(por_pagina, RESULTADOS_MAX_POR_PAGINA))
+
+    resultados, hay_siguiente = buscar(conectar_lectura(), tipo, texto, pagina, por_pagina)
+
+    filtros = {'q': texto, 'tipo': tipo, 'por_pagina': por_pagina}
+    siguiente_url = url_for('buscar_registros', pagina=pagina + 1, **filtros) if hay_siguiente else None
+    anterior_url = url_for('buscar_registros', pagina=pagina - 1, **filtros) if pagina > 1 else None
+
+    return render_template('buscar.html', texto=texto, tipo=tipo, tipos=TIPOS_BUSQUEDA, resultados=resultados,
+                           siguiente_url=siguiente_url, anterior_url=anterior_url)
+
+
+# Balance de los proveedores al cierre de una fecha, desde las instantáneas de saldos
+@app.route('/saldos_historicos')
+@login_required
+@role_required('admin')
+def saldos_historicos():
+    fecha = request.args.get('fecha') or date.today().isoformat()
+    try:
+        fecha = date.fromisoformat(fecha)
+    except ValueError:
+        flash('Fecha no válida.', 'danger')
+        fecha = date.today()
+    id_proveedor = request.args.get('id_proveedor', type=int)
+
+    try:
+        saldos = balances_al(conectar_lectura(), fecha, id_proveedor)
+    except ValueError as e:
+        abort(400, str(e))
+    return render_template('saldos_historicos.html', saldos=saldos, fecha=fecha.isoformat(), id_proveedor=id_proveedor)
+
+
+# Estado de cuenta de un proveedor: transacciones y facturas en orden de fecha con el
+# saldo acumulado. Las filas se cargan por páginas desde /api/estado_cuenta.
+@app.route('/estado_cuenta/<int:id_proveedor>')
+@login_required
+@role_required('admin')
+def estado_cuenta(id_proveedor):
+    conn = conectar_lectura()
+    proveedor = conn.execute('SELECT id_proveedor, nombre, balance FROM proveedores WHERE id_proveedor = ?',
+                             (id_proveedor,)).fetchone()
+    if not proveedor:
+        abort(404)
+    return render_template('estado_cuenta.html', proveedor=proveedor, apertura=saldo_apertura(conn, id_proveedor),
+                           columnas=COLUMNAS_ESTADO)
+
+
+# Una página del estado de cuenta en JSON, con el mismo formato y la misma
+# revalidación por ETag que la API de listados
+@app.route('/api/estado_cuenta/<int:id_proveedor>')
+@login_required
+@role_required('admin')
+def api_estado_cuenta(id_proveedor):
+    conn = conectar_lectura()
+    if not conn.execute('SELECT 1 FROM proveedores WHERE id_proveedor = ?', (id_proveedor,)).fetchone():
+        abort(404)
+    etag = f"estado-{id_proveedor}-{version_tablas(conn, ['proveedores', 'transacciones', 'facturas'])}"
+    if etag in request.if_none_match:
+        respuesta = Response(status=304)
+    else:
+        por_pagina = request.args.get('por_pagina', MOVIMIENTOS_POR_PAGINA, type=int)
+        por_pagina = max(1, min(por_pagina, MOVIMIENTOS_MAX_POR_PAGINA))
+        try:
+            filas, siguiente = consultar_estado_cuenta(conn, id_proveedor, app.secret_key,
+                                                      request.args.get('despues'), por_pagina)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        respuesta = jsonify({'datos': filas, 'siguiente': siguiente})
+
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+
+# Estado de cuenta completo en CSV, enviado en streaming por bloques
+@app.route('/estado_cuenta/<int:id_proveedor>/csv')
+@login_required
+@role_required('admin')
+def exportar_estado_cuenta(id_proveedor):
+    conn = conectar_lectura()
+    if saldo_apertura(conn, id_proveedor) is None:
+        abort(404)
+    bloques = recorrer_estado_cuenta(conn, id_proveedor)
+    return Response(stream_with_context(csv_de_bloques(bloques, COLUMNAS_ESTADO)), mimetype=MIMETYPES['csv'],
+                    headers={'Content-Disposition': f'attachment; filename=estado_cuenta_{id_proveedor}.csv'})
+
+
+# Importación masiva de proveedores, facturas o transacciones desde CSV o XLSX
+@app.route('/importar', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def importar_archivo():
+    resultado = None
+    if request.method == 'POST':
+        tipo = request.form.get('tipo')
+        archivo = request.files.get('archivo')
+
+        if tipo not in TIPOS_IMPORTACION:
+            flash('Tipo de importación no válido.', 'danger')
+        elif not archivo or not archivo.filename:
+            flash('Seleccione un archivo.', 'danger')
+        else:
+            try:
+                resultado = importar(conectar_bd(), tipo, leer_filas(archivo.stream, archivo.filename))
+            except Exception as e:
+                app.logger.exception('Error al importar el archivo')
+                flash(f'Error al importar el archivo: {e}', 'danger')
+
+    return render_template('importar.html', tipos=TIPOS_IMPORTACION, resultado=resultado)
+
+
 @app.route('/generar_reporte', methods=['POST'])
+@solo_lectura
 def generar_reporte():
     try:
         tabla = request.form.get('tabla')
         formato = request.form.get('formato')
 
         # Verifica que la tabla seleccionada sea válida
-        if tabla not in ['proveedores', 'transacciones', 'facturas']:
+        if tabla not in TABLAS_REPORTE:
             return "Tabla no válida", 400
 
-        # Conexión a la base de datos y carga de datos en un DataFrame
-        conn = conectar_bd()
-        query = f'SELECT * FROM {tabla}'
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-
-        if formato == 'pdf':
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.set_font('Arial', 'B', 16)
-            pdf.cell(200, 10, txt=f'Reporte de {tabla.capitalize()}', ln=True, align='C')
-
-            # Configurar la fuente para el contenido
-            pdf.set_font('Arial', '', 10)
-
-            # Agregar contenido de la tabla
-            for _, row in df.iterrows():
-                texto = ' - '.join([f'{col}: {str(row[col])}' for col in df.columns])
-                pdf.multi_cell(0, 10, texto)
-
-            buffer = io.BytesIO()
-            pdf_output = pdf.output(dest='S').encode('latin1')
-            buffer.write(pdf_output)
-            buffer.seek(0)
-
-            # Enviar el archivo PDF como respuesta
-            print("PDF generado correctamente")
-            return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name='reporte.pdf')
-
-        elif formato == 'excel':
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df.to_excel(writer, sheet_name='Reporte', index=False)
-                # No se necesita llamar a writer.save(), el archivo se guarda automáticamente al salir del contexto
-            buffer.seek(0)
-
-            # Guarda el archivo temporalmente para depuración
-            with open('reporte_temporal.xlsx', 'wb') as f:
-                f.write(buffer.getvalue())
-
-            print("Excel generado correctamente")
-            # Enviar el archivo Excel como respuesta
-            return send_file(buffer, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                             as_attachment=True, download_name='reporte.xlsx')
-
-        else:
+        if formato not in ESCRITORES:
             return "Formato no válido", 400
 
+        # La versión y las filas se leen en la misma transacción, así el archivo
+        # guardado en caché corresponde exactamente a esa versión
+        conn = conectar_lectura()
+        conn.execute('BEGIN')
+        clave = cola_reportes.cache.clave(tabla, formato, version_tabla(conn, tabla))
+        nombre_archivo = f'reporte.{EXTENSIONES[formato]}'
+
+        # Si los datos no cambiaron desde la última descarga se envía el archivo en caché
+        ruta = cola_reportes.cache.obtener(clave)
+        if ruta is None:
+            # Las filas se leen del cursor por bloques en lugar de cargar un DataFrame
+            cursor, columnas = consultar_reporte(conn, tabla)
+
+            if formato == 'csv':
+                # El CSV se envía en streaming a medida que se leen los bloques y se
+                # guarda en la caché al terminar
+                bloques = cola_reportes.cache.guardar_bloques(clave, generar_csv_en_bloques(cursor, columnas))
+                return Response(stream_with_context(bloques), mimetype=MIMETYPES['csv'],
+                                headers={'Content-Disposition': f'attachment; filename={nombre_archivo}'})
+
+            # Los demás formatos se escriben en disco y se guardan en la caché
+            ruta_temporal = cola_reportes.cache.ruta_temporal()
+            try:
+                with open(ruta_temporal, 'wb') as archivo:
+                    ESCRITORES[formato](cursor, columnas, tabla, archivo)
+            except BaseException:
+                os.remove(ruta_temporal)
+                raise
+            ruta = cola_reportes.cache.guardar(clave, ruta_temporal)
+        conn.rollback()
+
+        # Enviar el archivo como respuesta
+        return send_file(ruta, mimetype=MIMETYPES[formato], as_attachment=True, download_name=nombre_archivo)
+
     except Exception as e:
-        print(f"Error: {str(e)}")
+        app.logger.exception('Error al generar el reporte')
         return f"Se ha producido un error: {str(e)}", 500
 
 
+# Reportes en segundo plano: crea el trabajo y devuelve su estado
+@app.route('/reportes/trabajos', methods=['POST'])
+@login_required
+@solo_lectura
+def enviar_trabajo_reporte():
+    tabla = request.form.get('tabla')
+    formato = request.form.get('formato')
+
+    if tabla not in TABLAS_REPORTE:
+        return jsonify({'error': 'Tabla no válida'}), 400
+    if formato not in ESCRITORES:
+        return jsonify({'error': 'Formato no válido'}), 400
 
+    with conectar_lectura() as conn:
+        version = version_tabla(conn, tabla)
 
+    trabajo = cola_reportes.enviar(tabla, formato, version, replica.ruta_lectura())
+    return jsonify(datos_trabajo(trabajo)), 202
 
+@app.route('/reportes/trabajos/<id_trabajo>')
+@login_required
+def estado_trabajo_reporte(id_trabajo):
+    trabajo = cola_reportes.estado(id_trabajo)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(datos_trabajo(trabajo))
+
+@app.route('/reportes/trabajos/<id_trabajo>/descarga')
+@login_required
+def descargar_trabajo_reporte(id_trabajo):
+    trabajo = cola_reportes.estado(id_trabajo)
+    ruta = cola_reportes.archivo(id_trabajo)
+    if ruta is None:
+        abort(404)
+    return send_file(ruta, mimetype=MIMETYPES[trabajo['formato']], as_attachment=True,
+                     download_name=f"reporte_{trabajo['tabla']}.{EXTENSIONES[trabajo['formato']]}")
 
-# Simulación de una función para obtener los datos de la tabla seleccionada
-def obtener_datos(tabla):
-    # Aquí deberías realizar una consulta a la base de datos para obtener los datos de la tabla
-    # Esta es una simulación con datos de ejemplo.
-    if tabla == 'proveedores':
-        columnas = ['ID', 'Nombre', 'Monto']
-        datos = [
-            [1, 'Proveedor A', 1000],
-            [2, 'Proveedor B', 1500]
-        ]
-    elif tabla == 'transacciones':
-        columnas = ['ID', 'Fecha', 'Monto']
-        datos = [
-            [1, '2024-12-01', 500],
-            [2, '2024-12-02', 300]
-        ]
-    elif tabla == 'facturas':
-        columnas = ['ID', 'Fecha Emisión', 'Monto']
-        datos = [
-            [1, '2024-12-01', 700],
-            [2, '2024-12-02', 800]
-        ]
-    return columnas, datos
-
-# Función para generar un archivo PDF
-def generar_pdf(columnas, datos, nombre_reporte):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font('Arial', 'B', 16)
-    pdf.cell(200, 10, txt=f'Reporte de {nombre_reporte}', ln=True, align='C')
-
-    pdf.set_font('Arial', '', 12)
-    pdf.ln(10)
-
-    # Agregar encabezados
-    pdf.set_font('Arial', 'B', 12)
-    for columna in columnas:
-        pdf.cell(40, 10, columna, 1)
-    pdf.ln()
-
-    # Agregar los datos
-    pdf.set_font('Arial', '', 12)
-    for fila in datos:
-        for dato in fila:
-            pdf.cell(40, 10, str(dato), 1)
-        pdf.ln()
-
-    # Guardar el PDF en un objeto BytesIO
-    buffer = BytesIO()
-    pdf_output = pdf.output(dest='S').encode('latin1')  # Genera la salida PDF como una cadena de bytes
-    buffer.write(pdf_output)
-    buffer.seek(0)  # Mover el puntero al inicio del buffer
-
-    return buffer
-
-# Función para generar un archivo Excel
-def generar_excel(columnas, datos, tabla):
-    df = pd.DataFrame(datos, columns=columnas)
-    excel_output = BytesIO()
-    writer = pd.ExcelWriter(excel_output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Reporte')
-    writer.save()
-    excel_output.seek(0)
-    return excel_output
+def datos_trabajo(trabajo):
+    datos = {
+        'id': trabajo['id'],
+        'tabla': trabajo['tabla'],
+        'formato': trabajo['formato'],
+        'estado': trabajo['estado'],
+        'error': trabajo['error'],
+        'estado_url': url_for('estado_trabajo_reporte', id_trabajo=trabajo['id']),
+    }
+    if trabajo['estado'] == 'listo':
+        datos['descarga_url'] = url_for('descargar_trabajo_reporte', id_trabajo=trabajo['id'])
+    return datos
 
+
+
+
+
+
+# Los reportes se generan con los datos reales de la base de datos, igual que en generar_reporte
 @app.route('/reportes', methods=['GET', 'POST'])
+@solo_lectura
 def reportes():
     if request.method == 'GET':
-        return render_template('reportes.html')
+        return render_template('reportes.html', formatos=ESCRITORES)
 
-    if request.method == 'POST':
-        tabla = request.form.get('tabla')
-        formato = request.form.get('formato')
+    return generar_reporte()
 
-        if tabla not in ['proveedores', 'transacciones', 'facturas']:
-            return "Error: Tabla no válida."
-
-        columnas, datos = obtener_datos(tabla)
-
-        if formato == 'pdf':
-            pdf_output = generar_pdf(columnas, datos, tabla)
-            return send_file(
-                pdf_output, 
-                as_attachment=True, 
-                attachment_filename=f'reporte_{tabla}.pdf', 
-                mimetype='application/pdf'
-            )
-        elif formato == 'excel':
-            excel_output = generar_excel(columnas, datos, tabla)
-            return send_file(
-                excel_output, 
-                as_attachment=True, 
-                attachment_filename=f'reporte_{tabla}.xlsx', 
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-        else:
-            return "Error: Formato no soportado."
-        
 
-# Ejecutar la aplicación
+# Ejecutar la aplicación con el servidor de desarrollo (para producción usar servidor.py)
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=os.environ.get('CXP_DEBUG', '1') == '1')
@@ -0,0 +1,149 @@
+# Mide el arranque en frío de la aplicación: tiempo de `import app` según
+# `python -X importtime`, los módulos que más tardan en importarse y la memoria
+# residente de un proceso recién iniciado, antes y después de cargar los escritores
+# de reportes (fpdf, xlsxwriter). Cada medición se hace en un proceso nuevo.
+#
+# Uso: python benchmarks/bench_arranque.py [--repeticiones 5] [--modulos 15]
+#          [--presupuesto-ms 1500] [--presupuesto-rss-mib 80] [--salida resultados.json]
+#
+# Con --presupuesto-ms o --presupuesto-rss-mib el script termina con código 1 si la
+# mediana supera el presupuesto, para poder usarlo como control en CI.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que solo se necesitan para generar reportes y no deben cargarse al iniciar
+MODULOS_REPORTES = ['escritores_reportes', 'fpdf', 'xlsxwriter', 'pandas', 'pyarrow']
+
+# Se ejecuta en el proceso hijo: importa la aplicación, mide la memoria y luego carga
+# los escritores de reportes para medir cuánto suman
+CODIGO_HIJO = '''
+import json, sys
+import app
+
+def rss_kib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+cargados = [m for m in %r if m in sys.modules]
+rss = rss_kib()
+import escritores_reportes
+print(json.dumps({'rss_kib': rss, 'rss_con_reportes_kib': rss_kib(), 'cargados_al_iniciar': cargados}))
+''' % (MODULOS_REPORTES,)
+
+
+# Convierte la salida de -X importtime en {modulo: (propio_us, acumulado_us, nivel)}
+def leer_importtime(texto):
+    modulos = {}
+    for linea in texto.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        nivel = (len(nombre) - len(nombre.lstrip())) // 2
+        modulos[nombre.strip()] = (int(propio), int(acumulado), nivel)
+    return modulos
+
+
+def medir_una_vez(entorno):
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', CODIGO_HIJO], cwd=RAIZ, env=entorno,
+                             capture_output=True, text=True, check=True)
+    modulos = leer_importtime(proceso.stderr)
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    resultado['importacion_ms'] = modulos['app'][1] / 1000
+    resultado['modulos'] = modulos
+    return resultado
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mide el tiempo de importación y la memoria inicial de la aplicación.')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Procesos que se inician para medir')
+    parser.add_argument('--modulos', type=int, default=15, help='Módulos más lentos que se muestran')
+    parser.add_argument('--presupuesto-ms', type=float, help='Tiempo máximo de importación (mediana)')
+    parser.add_argument('--presupuesto-rss-mib', type=float, help='Memoria residente máxima al iniciar (mediana)')
+    parser.add_argument('--salida', help='Guarda los resultados en este archivo JSON (por defecto en la salida estándar)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        # La aplicación crea el esquema en una base de datos vacía al importarse
+        entorno = dict(os.environ, CXP_DB_PATH=os.path.join(directorio, 'arranque.db'))
+        # La primera ejecución crea la base de datos y calienta la caché de bytecode
+        medir_una_vez(entorno)
+        mediciones = [medir_una_vez(entorno) for _ in range(args.repeticiones)]
+
+    # Módulos con más tiempo acumulado entre los que importa la aplicación directamente
+    # (nivel 1), promediados entre repeticiones
+    directos = {}
+    for medicion in mediciones:
+        for nombre, (_, acumulado, nivel) in medicion['modulos'].items():
+            if nivel == 1:
+                directos.setdefault(nombre, []).append(acumulado / 1000)
+    lentos = sorted(((nombre, statistics.median(tiempos)) for nombre, tiempos in directos.items()),
+                    key=lambda par: par[1], reverse=True)[:args.modulos]
+
+    rss = [m['rss_kib'] for m in mediciones if m['rss_kib'] is not None]
+    rss_reportes = [m['rss_con_reportes_kib'] for m in mediciones if m['rss_con_reportes_kib'] is not None]
+    resultados = {
+        'importacion_ms': round(statistics.median(m['importacion_ms'] for m in mediciones), 1),
+        'importacion_max_ms': round(max(m['importacion_ms'] for m in mediciones), 1),
+        'rss_kib': statistics.median(rss) if rss else None,
+        'rss_con_reportes_kib': statistics.median(rss_reportes) if rss_reportes else None,
+        'cargados_al_iniciar': mediciones[0]['cargados_al_iniciar'],
+        'modulos_lentos_ms': {nombre: round(ms, 1) for nombre, ms in lentos},
+    }
+
+    print(f"import app: {resultados['importacion_ms']} ms (máx. {resultados['importacion_max_ms']} ms)", file=sys.stderr)
+    if resultados['rss_kib'] is not None:
+        print(f"memoria al iniciar: {resultados['rss_kib'] / 1024:.1f} MiB, "
+              f"con reportes: {resultados['rss_con_reportes_kib'] / 1024:.1f} MiB", file=sys.stderr)
+    for nombre, ms in resultados['modulos_lentos_ms'].items():
+        print(f'  {nombre:30} {ms:10.1f} ms', file=sys.stderr)
+
+    excedidos = []
+    if resultados['cargados_al_iniciar']:
+        excedidos.append(f"módulos de reportes cargados al iniciar: {', '.join(resultados['cargados_al_iniciar'])}")
+    if args.presupuesto_ms is not None and resultados['importacion_ms'] > args.presupuesto_ms:
+        excedidos.append(f"importación {resultados['importacion_ms']} ms > {args.presupuesto_ms} ms")
+    if (args.presupuesto_rss_mib is not None and resultados['rss_kib'] is not None
+            and resultados['rss_kib'] / 1024 > args.presupuesto_rss_mib):
+        excedidos.append(f"memoria {resultados['rss_kib'] / 1024:.1f} MiB > {args.presupuesto_rss_mib} MiB")
+    for mensaje in excedidos:
+        print(f'Presupuesto excedido: {mensaje}', file=sys.stderr)
+
+    salida = {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticiones': args.repeticiones,
+        'arranque': resultados,
+    }
+    texto = json.dumps(salida, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto + '\n')
+    else:
+        print(texto)
+    return 1 if excedidos else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+# Compara peticiones por segundo abriendo una conexión nueva en cada llamada a
+# conectar_bd() (comportamiento anterior, sin reutilizarla durante la petición)
+# contra el pool de conexiones de db.py.
+#
+# Uso: python benchmarks/bench_conexiones.py [--peticiones 2000] [--hilos 8]
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Se trabaja sobre una copia de la base de datos para no modificar la original
+DIRECTORIO = tempfile.mkdtemp()
+BD_PRUEBA = os.path.join(DIRECTORIO, 'bench.db')
+shutil.copy(os.path.join(RAIZ, 'cuentas_por_pagar.db'), BD_PRUEBA)
+os.environ['CXP_DB_PATH'] = BD_PRUEBA
+
+import db
+import app as aplicacion
+from app import app
+
+RUTAS = ['/', '/listar_proveedores', '/listar_transacciones', '/listar_facturas']
+
+
+def id_admin(db_path):
+    conn = sqlite3.connect(db_path)
+    fila = conn.execute("SELECT id FROM usuarios WHERE role = 'admin' LIMIT 1").fetchone()
+    conn.close()
+    return str(fila[0])
+
+
+def trabajador(user_id, peticiones, errores):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+        sess['_fresh'] = True
+    for i in range(peticiones):
+        respuesta = client.get(RUTAS[i % len(RUTAS)])
+        if respuesta.status_code != 200:
+            errores.append(respuesta.status_code)
+
+
+# Comportamiento anterior: cada llamada abre una conexión con la configuración por
+# defecto de sqlite3, que se cierra cuando deja de usarse
+def conectar_cada_vez():
+    return sqlite3.connect(db.DB_PATH)
+
+
+def medir(db_path, tamano_pool, peticiones, hilos):
+    db.configurar_bd(db_path=db_path, tamano_pool=tamano_pool)
+    user_id = id_admin(db_path)
+    errores = []
+    por_hilo = peticiones // hilos
+    workers = [threading.Thread(target=trabajador, args=(user_id, por_hilo, errores)) for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    duracion = time.perf_counter() - inicio
+    db.cerrar_pool()
+    return por_hilo * hilos / duracion, len(errores)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--hilos', type=int, default=8)
+    args = parser.parse_args()
+
+    try:
+        # app.py importó conectar_bd con `from db import`; replica.py la usa como db.conectar_bd
+        original = db.conectar_bd
+        db.conectar_bd = aplicacion.conectar_bd = conectar_cada_vez
+        try:
+            sin_pool, err_sin = medir(BD_PRUEBA, 0, args.peticiones, args.hilos)
+        finally:
+            db.conectar_bd = aplicacion.conectar_bd = original
+        con_pool, err_con = medir(BD_PRUEBA, args.hilos, args.peticiones, args.hilos)
+    finally:
+        shutil.rmtree(DIRECTORIO, ignore_errors=True)
+
+    print(f'Sin pool: {sin_pool:8.1f} peticiones/s ({err_sin} errores)')
+    print(f'Con pool: {con_pool:8.1f} peticiones/s ({err_con} errores)')
+    print(f'Mejora:   {con_pool / sin_pool:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
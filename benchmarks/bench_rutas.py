@@ -0,0 +1,250 @@
+# Mide la latencia (p50/p95/p99) y la memoria máxima de las rutas principales
+# sobre una base de datos generada con el esquema de crear_bd.py, y guarda los
+# resultados en JSON para comparar entre commits.
+#
+# Uso: python benchmarks/bench_rutas.py [--transacciones 100000] [--facturas 100000]
+#          [--proveedores 1000] [--repeticiones 200] [--repeticiones-reporte 3]
+#          [--tabla-reporte transacciones] [--salida resultados.json] [--bd archivo.db]
+#
+# La base de datos se crea en un directorio temporal (o en --bd para reutilizarla
+# entre ejecuciones; si ya existe no se vuelve a generar).
+#
+# Los reportes se miden en frío (la caché de artefactos se vacía antes de cada
+# petición, así cada una genera el archivo) y en caliente (escenarios *_cache, que
+# sirven el archivo ya generado).
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Palabras de las descripciones de las facturas generadas
+PALABRAS = ['insumos', 'servicios', 'mantenimiento', 'transporte', 'papelería', 'consultoría', 'limpieza']
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+# Llena la base de datos con datos sintéticos usando consultas recursivas en SQLite
+# (mucho más rápido que insertar fila por fila desde Python)
+def generar_datos(conn, proveedores, transacciones, facturas):
+    from werkzeug.security import generate_password_hash
+
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :filas)
+        INSERT INTO proveedores (id_proveedor, nombre, balance, balance_inicial)
+        SELECT i, 'Proveedor ' || i, 0, 0 FROM n
+    ''', {'filas': proveedores})
+
+    # Con la pausa activa trg_balance_insert no actualiza el balance fila por fila;
+    # el balance se calcula al final con una sola consulta
+    conn.execute("INSERT INTO pausa_triggers (nombre) VALUES ('balance')")
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :filas)
+        INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto, fecha_registro)
+        SELECT 1 + abs(random()) % :proveedores,
+               CASE WHEN abs(random()) % 3 = 0 THEN 'CR' ELSE 'DB' END,
+               round(1 + abs(random()) % 500000 / 100.0, 2),
+               datetime('now', '-' || (abs(random()) % 730) || ' days')
+        FROM n
+    ''', {'filas': transacciones, 'proveedores': proveedores})
+    conn.execute("DELETE FROM pausa_triggers WHERE nombre = 'balance'")
+    conn.execute('''
+        UPDATE proveedores SET balance = t.neto
+        FROM (SELECT id_proveedor,
+                     SUM(CASE WHEN tipo_movimiento = 'CR' THEN monto ELSE -monto END) AS neto
+              FROM transacciones GROUP BY id_proveedor) t
+        WHERE t.id_proveedor = proveedores.id_proveedor
+    ''')
+
+    # Facturas a 30 días, la mitad pendientes
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :filas)
+        INSERT INTO facturas (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento, saldo)
+        SELECT id_proveedor, monto, descripcion, emision, date(emision, '+30 days'),
+               CASE WHEN i % 2 = 0 THEN monto ELSE 0 END
+        FROM (SELECT i, 1 + abs(random()) % :proveedores AS id_proveedor,
+                     round(1 + abs(random()) % 500000 / 100.0, 2) AS monto,
+                     'Factura ' || i || ' de ' || json_extract(:palabras, '$[' || (i % 7) || ']') AS descripcion,
+                     date('now', '-' || (abs(random()) % 365) || ' days') AS emision
+              FROM n)
+    ''', {'filas': facturas, 'proveedores': proveedores, 'palabras': json.dumps(PALABRAS)})
+
+    conn.execute('INSERT OR IGNORE INTO usuarios (username, password, role) VALUES (?, ?, ?)',
+                 ('bench', generate_password_hash('bench'), 'admin'))
+    conn.commit()
+
+
+# Escenarios que se miden con la caché de reportes vacía en cada petición
+SIN_CACHE = {'generar_reporte_pdf', 'generar_reporte_excel'}
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+# Escenarios: nombre -> función(cliente, i) que hace la petición y devuelve la respuesta.
+# Se lee el cuerpo completo para incluir el tiempo de generar la respuesta en streaming.
+def escenarios(proveedores, tabla_reporte):
+    return {
+        'listar_transacciones': lambda c, i: c.get('/listar_transacciones'),
+        'listar_transacciones_filtro': lambda c, i: c.get(
+            '/listar_transacciones', query_string={'proveedor_id': 1 + i % proveedores}),
+        'listar_facturas': lambda c, i: c.get('/listar_facturas'),
+        'api_facturas': lambda c, i: c.get('/api/facturas', query_string={'orden': 'fecha_vencimiento'}),
+        'agregar_transaccion': lambda c, i: c.post('/agregar_transaccion', data={
+            'id_proveedor': 1 + random.randrange(proveedores),
+            'tipo_movimiento': 'CR' if i % 2 else 'DB',
+            'monto': round(random.uniform(1, 5000), 2),
+        }),
+        'generar_reporte_pdf': lambda c, i: c.post(
+            '/generar_reporte', data={'tabla': tabla_reporte, 'formato': 'pdf'}),
+        'generar_reporte_excel': lambda c, i: c.post(
+            '/generar_reporte', data={'tabla': tabla_reporte, 'formato': 'excel'}),
+        'generar_reporte_pdf_cache': lambda c, i: c.post(
+            '/generar_reporte', data={'tabla': tabla_reporte, 'formato': 'pdf'}),
+        'generar_reporte_excel_cache': lambda c, i: c.post(
+            '/generar_reporte', data={'tabla': tabla_reporte, 'formato': 'excel'}),
+    }
+
+
+# `preparar` se llama antes de cada petición, fuera del tiempo medido
+def medir(cliente, peticion, repeticiones, preparar=None):
+    preparar = preparar or (lambda: None)
+
+    # Una petición de calentamiento (cachés de plantillas, páginas de SQLite)
+    preparar()
+    peticion(cliente, 0).get_data()
+
+    tiempos = []
+    errores = 0
+    for i in range(repeticiones):
+        preparar()
+        inicio = time.perf_counter()
+        respuesta = peticion(cliente, i)
+        respuesta.get_data()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if respuesta.status_code >= 400:
+            errores += 1
+
+    # La memoria se mide aparte porque tracemalloc hace más lentas las peticiones
+    preparar()
+    tracemalloc.start()
+    peticion(cliente, repeticiones).get_data()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'repeticiones': repeticiones,
+        'errores': errores,
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+        'media_ms': round(sum(tiempos) / len(tiempos), 3),
+        'max_ms': round(max(tiempos), 3),
+        'pico_memoria_kib': round(pico / 1024, 1),
+    }
+
+
+# Memoria residente máxima del proceso (no disponible en Windows)
+def max_rss_kib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de las rutas principales de la aplicación.')
+    parser.add_argument('--proveedores', type=int, default=1000)
+    parser.add_argument('--transacciones', type=int, default=100000)
+    parser.add_argument('--facturas', type=int, default=100000)
+    parser.add_argument('--repeticiones', type=int, default=200, help='Peticiones por escenario')
+    parser.add_argument('--repeticiones-reporte', type=int, default=3, help='Peticiones por escenario de reporte')
+    parser.add_argument('--tabla-reporte', default='transacciones')
+    parser.add_argument('--escenarios', help='Escenarios a ejecutar separados por comas (por defecto todos)')
+    parser.add_argument('--bd', help='Archivo de base de datos a usar o generar')
+    parser.add_argument('--salida', help='Guarda los resultados en este archivo JSON (por defecto en la salida estándar)')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla de los montos de agregar_transaccion')
+    args = parser.parse_args()
+    random.seed(args.semilla)
+
+    directorio = tempfile.mkdtemp()
+    bd = os.path.abspath(args.bd) if args.bd else os.path.join(directorio, 'bench.db')
+    generar = not os.path.exists(bd)
+
+    # La aplicación lee la ruta de la base de datos al importarse y crea el esquema.
+    # La caché de reportes va a un directorio nuevo para no tocar la de la aplicación.
+    os.environ['CXP_DB_PATH'] = bd
+    os.environ['CXP_REPORTES_DIR'] = os.path.join(directorio, 'reportes')
+    from app import app, cola_reportes
+    from db import crear_conexion
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    try:
+        conn = crear_conexion(bd)
+        if generar:
+            inicio = time.perf_counter()
+            generar_datos(conn, args.proveedores, args.transacciones, args.facturas)
+            print(f'Base de datos generada en {time.perf_counter() - inicio:.1f} s', file=sys.stderr)
+        conteos = {tabla: conn.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]
+                   for tabla in ['proveedores', 'transacciones', 'facturas']}
+        user_id = conn.execute("SELECT id FROM usuarios WHERE role = 'admin' ORDER BY id LIMIT 1").fetchone()[0]
+        conn.close()
+
+        cliente = app.test_client()
+        with cliente.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+
+        todos = escenarios(conteos['proveedores'], args.tabla_reporte)
+        nombres = args.escenarios.split(',') if args.escenarios else list(todos)
+        resultados = {}
+        for nombre in nombres:
+            repeticiones = args.repeticiones_reporte if nombre.startswith('generar_reporte') else args.repeticiones
+            preparar = cola_reportes.cache.vaciar if nombre in SIN_CACHE else None
+            resultados[nombre] = medir(cliente, todos[nombre], repeticiones, preparar)
+            r = resultados[nombre]
+            print(f"{nombre:30} p50 {r['p50_ms']:10.2f} ms  p95 {r['p95_ms']:10.2f} ms  "
+                  f"p99 {r['p99_ms']:10.2f} ms  memoria {r['pico_memoria_kib']:10.1f} KiB", file=sys.stderr)
+    finally:
+        cola_reportes.cerrar()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    salida = {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'datos': conteos,
+        'max_rss_kib': max_rss_kib(),
+        'escenarios': resultados,
+    }
+    texto = json.dumps(salida, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import re
+
+# Resultados por página de la búsqueda
+RESULTADOS_POR_PAGINA = 25
+RESULTADOS_MAX_POR_PAGINA = 200
+
+# Qué se puede buscar: tabla FTS5 y consulta que completa cada resultado. La
+# subconsulta ordena por relevancia (bm25) y pagina dentro del índice de texto,
+# así solo se leen de la tabla original las filas de la página pedida.
+CONSULTAS_BUSQUEDA = {
+    'proveedores': '''
+        SELECT p.id_proveedor, p.nombre, p.balance
+        FROM (SELECT rowid, rank FROM proveedores_fts
+              WHERE proveedores_fts MATCH ?
+              ORDER BY rank LIMIT ? OFFSET ?) r
+        JOIN proveedores p ON p.id_proveedor = r.rowid
+        ORDER BY r.rank
+    ''',
+    'facturas': '''
+        SELECT f.id_factura, f.id_proveedor, p.nombre, f.descripcion, f.monto, f.saldo, f.fecha_vencimiento
+        FROM (SELECT rowid, rank FROM facturas_fts
+              WHERE facturas_fts MATCH ?
+              ORDER BY rank LIMIT ? OFFSET ?) r
+        JOIN facturas f ON f.id_factura = r.rowid
+        JOIN proveedores p ON p.id_proveedor = f.id_proveedor
+        ORDER BY r.rank
+    ''',
+}
+
+TIPOS_BUSQUEDA = list(CONSULTAS_BUSQUEDA)
+
+
+# Convierte el texto escrito por el usuario en una consulta FTS5: cada palabra va
+# entre comillas (sin operadores ni sintaxis de FTS5) y como prefijo, así
+# "insum comp" encuentra "Compra de insumos"
+def consulta_fts(texto):
+    palabras = re.findall(r'\w+', texto or '')
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+# Devuelve una página de resultados ordenados por relevancia y si hay más
+def buscar(conn, tipo, texto, pagina=1, por_pagina=RESULTADOS_POR_PAGINA):
+    if tipo not in CONSULTAS_BUSQUEDA:
+        raise ValueError(f'Tipo de búsqueda no válido: {tipo}')
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return [], False
+    # Se pide una fila extra para saber si hay página siguiente
+    filas = conn.execute(CONSULTAS_BUSQUEDA[tipo],
+                         (consulta, por_pagina + 1, (pagina - 1) * por_pagina)).fetchall()
+    return filas[:por_pagina], len(filas) > por_pagina
@@ -0,0 +1,57 @@
+import os
+import threading
+
+# Hasta esta cantidad de proveedores los formularios muestran una lista desplegable;
+# con más se usa el campo con sugerencias por prefijo
+MAX_PROVEEDORES_LISTA = int(os.environ.get('CXP_MAX_PROVEEDORES_LISTA', '500'))
+
+# Sugerencias que devuelve la búsqueda por prefijo
+MAX_SUGERENCIAS = 20
+
+
+# Lista de proveedores (id, nombre) para los formularios, guardada en memoria. Se
+# vuelve a leer solo cuando cambia la versión 'catalogo_proveedores', que los
+# triggers de crear_bd.py incrementan al agregar, eliminar o renombrar un proveedor
+# (los cambios de balance no la afectan).
+class CatalogoProveedores:
+    def __init__(self, max_lista=MAX_PROVEEDORES_LISTA):
+        self.max_lista = max_lista
+        self._lock = threading.Lock()
+        self._version = None
+        self._proveedores = None
+
+    # Devuelve la lista ordenada por nombre, o None si hay demasiados proveedores
+    # para una lista desplegable
+    def obtener(self, conn):
+        version = conn.execute(
+            "SELECT version FROM versiones_tablas WHERE tabla = 'catalogo_proveedores'").fetchone()[0]
+        with self._lock:
+            if version != self._version:
+                total = conn.execute('SELECT COUNT(*) FROM proveedores').fetchone()[0]
+                if total > self.max_lista:
+                    self._proveedores = None
+                else:
+                    self._proveedores = conn.execute(
+                        'SELECT id_proveedor, nombre FROM proveedores ORDER BY nombre').fetchall()
+                self._version = version
+            return self._proveedores
+
+
+# Proveedores cuyo nombre empieza por `prefijo` (sin distinguir mayúsculas), como
+# rango sobre idx_proveedores_nombre_nocase. Si el texto es un número también
+# incluye el proveedor con ese id.
+def buscar_por_prefijo(conn, prefijo, limite=MAX_SUGERENCIAS):
+    prefijo = prefijo.strip()
+    if not prefijo:
+        return []
+    resultados = []
+    if prefijo.isdigit():
+        resultados = conn.execute('SELECT id_proveedor, nombre FROM proveedores WHERE id_proveedor = ?',
+                                  (int(prefijo),)).fetchall()
+    resultados += [fila for fila in conn.execute('''
+        SELECT id_proveedor, nombre FROM proveedores
+        WHERE nombre COLLATE NOCASE >= ? AND nombre COLLATE NOCASE < ?
+        ORDER BY nombre COLLATE NOCASE
+        LIMIT ?
+    ''', (prefijo, prefijo + '\U0010ffff', limite)) if fila not in resultados]
+    return resultados[:limite]
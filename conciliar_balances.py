@@ -0,0 +1,64 @@
+import argparse
+from crear_bd import crear_bd, conectar_bd, MOVIMIENTO_NETO
+
+# Diferencia mínima que se considera descuadre
+TOLERANCIA = 0.005
+
+# Movimiento neto por proveedor calculado con un solo GROUP BY sobre transacciones
+MOVIMIENTOS_POR_PROVEEDOR = f'''
+    SELECT id_proveedor, SUM({MOVIMIENTO_NETO}) AS neto
+    FROM transacciones
+    GROUP BY id_proveedor
+'''
+
+# Función para comparar el balance guardado con el calculado desde las transacciones
+def buscar_descuadres(conn):
+    cursor = conn.execute(f'''
+        SELECT p.id_proveedor, p.nombre, p.balance,
+               p.balance_inicial + COALESCE(m.neto, 0) AS balance_calculado
+        FROM proveedores p
+        LEFT JOIN ({MOVIMIENTOS_POR_PROVEEDOR}) m ON m.id_proveedor = p.id_proveedor
+        WHERE ABS(p.balance - (p.balance_inicial + COALESCE(m.neto, 0))) > ?
+        ORDER BY p.id_proveedor
+    ''', (TOLERANCIA,))
+    return cursor.fetchall()
+
+# Función para recalcular todos los balances en una sola sentencia
+def corregir_balances(conn):
+    with conn:
+        cursor = conn.execute(f'''
+            UPDATE proveedores
+            SET balance = proveedores.balance_inicial + COALESCE(m.neto, 0)
+            FROM (SELECT p.id_proveedor, m.neto
+                  FROM proveedores p
+                  LEFT JOIN ({MOVIMIENTOS_POR_PROVEEDOR}) m ON m.id_proveedor = p.id_proveedor) AS m
+            WHERE m.id_proveedor = proveedores.id_proveedor
+              AND ABS(proveedores.balance - (proveedores.balance_inicial + COALESCE(m.neto, 0))) > ?
+        ''', (TOLERANCIA,))
+    return cursor.rowcount
+
+def main():
+    parser = argparse.ArgumentParser(description='Concilia proveedores.balance con la tabla de transacciones.')
+    parser.add_argument('--corregir', action='store_true', help='Actualiza los balances descuadrados')
+    args = parser.parse_args()
+
+    # Asegura que la base de datos tenga balance_inicial y los triggers de balance
+    crear_bd()
+
+    conn = conectar_bd()
+    descuadres = buscar_descuadres(conn)
+
+    for id_proveedor, nombre, balance, balance_calculado in descuadres:
+        print(f'Proveedor {id_proveedor} ({nombre}): guardado {balance:.2f}, '
+              f'calculado {balance_calculado:.2f}, diferencia {balance - balance_calculado:.2f}')
+    print(f'{len(descuadres)} proveedores con descuadre.')
+
+    if args.corregir and descuadres:
+        print(f'{corregir_balances(conn)} balances corregidos.')
+
+    conn.close()
+    return 1 if descuadres and not args.corregir else 0
+
+# Ejecuta la conciliación desde la línea de comandos
+if __name__ == "__main__":
+    raise SystemExit(main())
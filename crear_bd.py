@@ -1,23 +1,30 @@
-import sqlite3
-import os
 from werkzeug.security import generate_password_hash
+from db import crear_conexion
+from migraciones import migrar, actualizar_por_lotes
 
-# Función para crear y conectar la base de datos
+# Función para crear y conectar la base de datos (usa la misma ruta que la aplicación)
 def conectar_bd():
-    db_path = os.path.join(os.path.dirname(__file__), 'cuentas_por_pagar.db')
-    return sqlite3.connect(db_path)
+    return crear_conexion()
 
-# Función para crear las tablas en la base de datos
+# Movimiento neto de una transacción sobre el balance del proveedor
+MOVIMIENTO_NETO = "CASE WHEN tipo_movimiento = 'CR' THEN monto ELSE -monto END"
+
+# Función para crear o actualizar el esquema: aplica las migraciones pendientes
 def crear_bd():
     conn = conectar_bd()
-    cursor = conn.cursor()
+    aplicadas = migrar(conn, MIGRACIONES)
+    conn.close()
+    return aplicadas
 
+# Función para crear las tablas en la base de datos
+def crear_tablas(cursor):
     # Crear la tabla de proveedores si no existe
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS proveedores (
             id_proveedor INTEGER PRIMARY KEY AUTOINCREMENT,
             nombre TEXT NOT NULL,
-            balance REAL NOT NULL DEFAULT 0
+            balance REAL NOT NULL DEFAULT 0,
+            balance_inicial REAL NOT NULL DEFAULT 0
         )
     ''')
 
@@ -28,7 +35,10 @@ def crear_bd():
             id_proveedor INTEGER NOT NULL,
             tipo_movimiento TEXT NOT NULL CHECK(tipo_movimiento IN ('CR', 'DB')),
             monto REAL NOT NULL,
-            FOREIGN KEY (id_proveedor) REFERENCES proveedores (id_proveedor)
+            fecha_registro TEXT,
+            id_original INTEGER,
+            FOREIGN KEY (id_proveedor) REFERENCES proveedores (id_proveedor),
+            FOREIGN KEY (id_original) REFERENCES transacciones (id_transaccion)
         )
     ''')
 
@@ -41,10 +51,33 @@ def crear_bd():
             descripcion TEXT,
             fecha_emision DATE NOT NULL,
             fecha_vencimiento DATE NOT NULL,
+            saldo REAL NOT NULL DEFAULT 0,
             FOREIGN KEY (id_proveedor) REFERENCES proveedores (id_proveedor)
         )
     ''')
 
+    # Crear la tabla de pagos aplicados a facturas si no existe
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pagos_facturas (
+            id_pago INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_transaccion INTEGER NOT NULL,
+            id_factura INTEGER NOT NULL,
+            monto_aplicado REAL NOT NULL,
+            FOREIGN KEY (id_transaccion) REFERENCES transacciones (id_transaccion),
+            FOREIGN KEY (id_factura) REFERENCES facturas (id_factura)
+        )
+    ''')
+
+    # Crear la tabla de saldos de proveedores al cierre de cada día (instantáneas)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saldos_proveedores (
+            id_proveedor INTEGER NOT NULL,
+            fecha TEXT NOT NULL,
+            balance REAL NOT NULL,
+            PRIMARY KEY (id_proveedor, fecha)
+        ) WITHOUT ROWID
+    ''')
+
     # Crear la tabla de usuarios (ya que está en el contexto original)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS usuarios (
@@ -55,8 +88,313 @@ def crear_bd():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+
+# Función para agregar a bases de datos anteriores las columnas que no existían
+def agregar_columnas_nuevas(cursor):
+    columnas = [columna[1] for columna in cursor.execute('PRAGMA table_info(proveedores)')]
+    if 'balance_inicial' not in columnas:
+        # Se calcula para que el balance actual quede igual a balance_inicial más los movimientos
+        cursor.execute('ALTER TABLE proveedores ADD COLUMN balance_inicial REAL NOT NULL DEFAULT 0')
+        cursor.execute(f'''
+            UPDATE proveedores SET balance_inicial = balance - COALESCE(
+                (SELECT SUM({MOVIMIENTO_NETO}) FROM transacciones t
+                 WHERE t.id_proveedor = proveedores.id_proveedor), 0)
+        ''')
+
+    columnas = [columna[1] for columna in cursor.execute('PRAGMA table_info(facturas)')]
+    if 'saldo' not in columnas:
+        # Antes las facturas pagadas se eliminaban, así que todas las existentes están pendientes
+        cursor.execute('ALTER TABLE facturas ADD COLUMN saldo REAL NOT NULL DEFAULT 0')
+        cursor.execute('UPDATE facturas SET saldo = monto')
+
+    columnas = [columna[1] for columna in cursor.execute('PRAGMA table_info(transacciones)')]
+    if 'fecha_registro' not in columnas:
+        # Las transacciones anteriores no tienen fecha y quedan en NULL
+        cursor.execute('ALTER TABLE transacciones ADD COLUMN fecha_registro TEXT')
+    if 'id_original' not in columnas:
+        cursor.execute('ALTER TABLE transacciones ADD COLUMN id_original INTEGER REFERENCES transacciones (id_transaccion)')
+
+# Función para crear los índices usados por las consultas de la aplicación
+def crear_indices(cursor):
+    # Listado de transacciones filtrado por proveedor o tipo y paginado por id
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transacciones_proveedor
+        ON transacciones (id_proveedor, id_transaccion)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transacciones_tipo
+        ON transacciones (tipo_movimiento, id_transaccion)
+    ''')
+
+    # Orden por nombre en la API de listados
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_proveedores_nombre
+        ON proveedores (nombre)
+    ''')
+
+    # Sugerencias de proveedores por prefijo del nombre, sin distinguir mayúsculas
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_proveedores_nombre_nocase
+        ON proveedores (nombre COLLATE NOCASE)
+    ''')
+
+    # Volumen mensual del tablero de inicio
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transacciones_fecha
+        ON transacciones (fecha_registro)
+    ''')
+    # Movimientos de un proveedor entre fechas (balance a una fecha desde la última
+    # instantánea); incluye tipo y monto para no leer la tabla
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transacciones_proveedor_fecha
+        ON transacciones (id_proveedor, fecha_registro, tipo_movimiento, monto)
+    ''')
+    # Cada transacción se puede anular una sola vez
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transacciones_original
+        ON transacciones (id_original) WHERE id_original IS NOT NULL
+    ''')
+
+    # Búsqueda de la factura que coincide exactamente con un pago, la más antigua primero
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_facturas_proveedor_monto
+        ON facturas (id_proveedor, monto, fecha_vencimiento)
+    ''')
+    # Facturas con saldo pendiente de un proveedor en orden de vencimiento; con el saldo
+    # cubre la aplicación de pagos y la antigüedad de saldos (ver ampliar_indice_pendientes)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_facturas_pendientes
+        ON facturas (id_proveedor, fecha_vencimiento, saldo) WHERE saldo > 0
+    ''')
+    # Facturas por vencer y propuesta de pagos: rangos de fechas que cubren las facturas con saldo
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_facturas_vencimiento
+        ON facturas (fecha_vencimiento, id_proveedor, saldo) WHERE saldo > 0
+    ''')
+    # Facturas de un proveedor por fecha de emisión (estado de cuenta)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_facturas_proveedor_emision
+        ON facturas (id_proveedor, fecha_emision)
+    ''')
+    # Orden por vencimiento de todas las facturas (pagadas o no) en la API de listados
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_facturas_fecha_vencimiento
+        ON facturas (fecha_vencimiento)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pagos_facturas_transaccion
+        ON pagos_facturas (id_transaccion)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pagos_facturas_factura
+        ON pagos_facturas (id_factura)
+    ''')
+
+# Tablas cuya versión de datos se registra en versiones_tablas
+TABLAS_VERSIONADAS = ['proveedores', 'transacciones', 'facturas']
+
+# Función para crear el contador de cambios por tabla; los triggers lo incrementan
+# en cada INSERT, UPDATE o DELETE y sirve para saber si un reporte en caché sigue vigente
+def crear_versiones(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versiones_tablas (
+            tabla TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for tabla in TABLAS_VERSIONADAS:
+        cursor.execute('INSERT OR IGNORE INTO versiones_tablas (tabla, version) VALUES (?, 0)', (tabla,))
+        for operacion in ['INSERT', 'UPDATE', 'DELETE']:
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_version_{tabla}_{operacion.lower()}
+                AFTER {operacion} ON {tabla}
+                BEGIN
+                    UPDATE versiones_tablas SET version = version + 1 WHERE tabla = '{tabla}';
+                END
+            ''')
+
+    # Versión de la lista de proveedores de los formularios: solo cambia al agregar,
+    # eliminar o renombrar un proveedor, no con cada movimiento de balance
+    cursor.execute("INSERT OR IGNORE INTO versiones_tablas (tabla, version) VALUES ('catalogo_proveedores', 0)")
+    for operacion, evento in [('insert', 'INSERT'), ('delete', 'DELETE'),
+                              ('update', 'UPDATE OF id_proveedor, nombre')]:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_version_catalogo_proveedores_{operacion}
+            AFTER {evento} ON proveedores
+            BEGIN
+                UPDATE versiones_tablas SET version = version + 1 WHERE tabla = 'catalogo_proveedores';
+            END
+        ''')
+
+# Función para mantener proveedores.balance con triggers: cada INSERT en transacciones
+# aplica su movimiento en la misma sentencia
+def crear_triggers_balance(cursor):
+    # Las cargas masivas registran su nombre en pausa_triggers dentro de su propia
+    # transacción y aplican el balance una vez por proveedor; las demás conexiones
+    # nunca ven esa fila
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pausa_triggers (
+            nombre TEXT PRIMARY KEY
+        )
+    ''')
+
+    cursor.execute('DROP TRIGGER IF EXISTS trg_balance_insert')
+    cursor.execute('''
+        CREATE TRIGGER trg_balance_insert
+        AFTER INSERT ON transacciones
+        WHEN NOT EXISTS (SELECT 1 FROM pausa_triggers WHERE nombre = 'balance')
+        BEGIN
+            UPDATE proveedores
+            SET balance = balance + CASE WHEN NEW.tipo_movimiento = 'CR' THEN NEW.monto ELSE -NEW.monto END
+            WHERE id_proveedor = NEW.id_proveedor;
+        END
+    ''')
+
+    # transacciones es un diario de solo inserción: las correcciones y anulaciones se
+    # registran como contrapartidas (ver diario.py), así el historial no se reescribe
+    cursor.execute('DROP TRIGGER IF EXISTS trg_balance_delete')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_balance_update')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transacciones_sin_update
+        BEFORE UPDATE ON transacciones
+        BEGIN
+            SELECT RAISE(ABORT, 'Las transacciones no se modifican; registre una anulación');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transacciones_sin_delete
+        BEFORE DELETE ON transacciones
+        BEGIN
+            SELECT RAISE(ABORT, 'Las transacciones no se eliminan; registre una anulación');
+        END
+    ''')
+
+    # Un movimiento con fecha anterior a una instantánea de saldos (o sin fecha) la deja
+    # desactualizada: se borran las instantáneas del proveedor desde ese día
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_saldos_proveedores_invalidar
+        AFTER INSERT ON transacciones
+        BEGIN
+            DELETE FROM saldos_proveedores
+            WHERE id_proveedor = NEW.id_proveedor AND fecha >= COALESCE(date(NEW.fecha_registro), '');
+        END
+    ''')
+
+# Columnas de texto que se indexan para la búsqueda: tabla -> (columna, clave)
+COLUMNAS_BUSQUEDA = {
+    'proveedores': ('nombre', 'id_proveedor'),
+    'facturas': ('descripcion', 'id_factura'),
+}
+
+# Función para crear los índices de búsqueda de texto completo (FTS5). Son tablas
+# de contenido externo: guardan solo el índice y leen el texto de la tabla original.
+# Los triggers las mantienen al día; solo reaccionan a cambios en la columna indexada,
+# así las actualizaciones de balance o saldo no tocan el índice.
+def crear_busqueda(cursor):
+    for tabla, (columna, clave) in COLUMNAS_BUSQUEDA.items():
+        existe = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f'{tabla}_fts',)).fetchone()
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {tabla}_fts USING fts5(
+                {columna},
+                content='{tabla}',
+                content_rowid='{clave}',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabla}_fts_insert
+            AFTER INSERT ON {tabla}
+            BEGIN
+                INSERT INTO {tabla}_fts (rowid, {columna}) VALUES (NEW.{clave}, NEW.{columna});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabla}_fts_delete
+            AFTER DELETE ON {tabla}
+            BEGIN
+                INSERT INTO {tabla}_fts ({tabla}_fts, rowid, {columna}) VALUES ('delete', OLD.{clave}, OLD.{columna});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabla}_fts_update
+            AFTER UPDATE OF {clave}, {columna} ON {tabla}
+            BEGIN
+                INSERT INTO {tabla}_fts ({tabla}_fts, rowid, {columna}) VALUES ('delete', OLD.{clave}, OLD.{columna});
+                INSERT INTO {tabla}_fts (rowid, {columna}) VALUES (NEW.{clave}, NEW.{columna});
+            END
+        ''')
+        if not existe:
+            # Indexa las filas que ya había antes de crear la tabla de búsqueda
+            cursor.execute(f"INSERT INTO {tabla}_fts ({tabla}_fts) VALUES ('rebuild')")
+
+# Función para guardar las fechas de las facturas como AAAA-MM-DD: el índice de
+# vencimientos compara texto, así que una fecha con hora o en otro formato queda
+# fuera de los rangos de fechas. Se recorre la tabla por lotes.
+def normalizar_fechas_facturas(cursor):
+    for columna in ['fecha_emision', 'fecha_vencimiento']:
+        actualizar_por_lotes(cursor, 'facturas', f'{columna} = date({columna})',
+                             f'date({columna}) IS NOT NULL AND {columna} <> date({columna})')
+
+# Función para crear las tablas de las propuestas de pago (programador_pagos.py). Son
+# una foto de las facturas al generar la propuesta, sin claves foráneas, para que
+# eliminar una factura no dependa de las propuestas anteriores.
+def crear_propuestas_pago(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS propuestas_pago (
+            id_propuesta INTEGER PRIMARY KEY,
+            fecha TEXT NOT NULL,
+            hasta TEXT NOT NULL,
+            version_facturas INTEGER NOT NULL,
+            generada TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS propuestas_pago_proveedores (
+            id_propuesta INTEGER NOT NULL,
+            id_proveedor INTEGER NOT NULL,
+            facturas INTEGER NOT NULL,
+            vencidas INTEGER NOT NULL,
+            monto_vencido REAL NOT NULL,
+            monto_por_vencer REAL NOT NULL,
+            total REAL NOT NULL,
+            primer_vencimiento TEXT NOT NULL,
+            PRIMARY KEY (id_propuesta, id_proveedor)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS propuestas_pago_facturas (
+            id_propuesta INTEGER NOT NULL,
+            id_factura INTEGER NOT NULL,
+            id_proveedor INTEGER NOT NULL,
+            fecha_vencimiento TEXT NOT NULL,
+            saldo REAL NOT NULL,
+            PRIMARY KEY (id_propuesta, id_factura)
+        ) WITHOUT ROWID
+    ''')
+
+# Función para agregar el saldo a idx_facturas_pendientes en las bases de datos que
+# lo tienen sin él: así el índice cubre las consultas por proveedor de las facturas con
+# saldo (aplicación de pagos, antigüedad de saldos) sin leer cada fila de la tabla
+def ampliar_indice_pendientes(cursor):
+    columnas = [fila[2] for fila in cursor.execute('PRAGMA index_info(idx_facturas_pendientes)')]
+    if columnas == ['id_proveedor', 'fecha_vencimiento', 'saldo']:
+        return
+    cursor.execute('DROP INDEX IF EXISTS idx_facturas_pendientes')
+    cursor.execute('''
+        CREATE INDEX idx_facturas_pendientes
+        ON facturas (id_proveedor, fecha_vencimiento, saldo) WHERE saldo > 0
+    ''')
+
+# Migraciones del esquema: (versión, descripción, pasos). La versión 1 lleva una base
+# de datos de cualquier estado anterior (sin versión) al esquema completo; los pasos
+# son idempotentes. Los cambios nuevos se agregan al final con la siguiente versión.
+MIGRACIONES = [
+    (1, 'Esquema base: tablas, columnas, índices, versiones, triggers y búsqueda',
+     [crear_tablas, agregar_columnas_nuevas, crear_indices, crear_versiones, crear_triggers_balance, crear_busqueda]),
+    (2, 'Fechas de facturas en formato AAAA-MM-DD', [normalizar_fechas_facturas]),
+    (3, 'Propuestas de pago por vencimiento', [crear_propuestas_pago]),
+    (4, 'Saldo en el índice de facturas pendientes', [ampliar_indice_pendientes]),
+]
 
 # Función para insertar registros iniciales
 def insertar_registros_iniciales():
@@ -70,9 +408,9 @@ def insertar_registros_iniciales():
     ]
     
     cursor.executemany('''
-        INSERT OR IGNORE INTO proveedores (id_proveedor, nombre, balance) 
-        VALUES (?, ?, ?)
-    ''', proveedores)
+        INSERT OR IGNORE INTO proveedores (id_proveedor, nombre, balance, balance_inicial) 
+        VALUES (?, ?, ?, ?)
+    ''', [(id_proveedor, nombre, balance, balance) for id_proveedor, nombre, balance in proveedores])
     
     # Insertar transacciones iniciales
     transacciones = [
@@ -81,8 +419,8 @@ def insertar_registros_iniciales():
     ]
     
     cursor.executemany('''
-        INSERT INTO transacciones (id_transaccion, id_proveedor, tipo_movimiento, monto)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO transacciones (id_transaccion, id_proveedor, tipo_movimiento, monto, fecha_registro)
+        VALUES (?, ?, ?, ?, datetime('now', 'localtime'))
     ''', transacciones)
 
     # Insertar usuarios iniciales
@@ -106,13 +444,13 @@ def insertar_registros_iniciales():
 
     # Insertar facturas iniciales
     facturas = [
-        (1, 1, 1000.00, "Compra de insumos", "2024-01-01", "2024-01-15"),
-        (2, 2, 2000.00, "Servicios contratados", "2024-01-10", "2024-01-20")
+        (1, 1, 1000.00, "Compra de insumos", "2024-01-01", "2024-01-15", 1000.00),
+        (2, 2, 2000.00, "Servicios contratados", "2024-01-10", "2024-01-20", 2000.00)
     ]
 
     cursor.executemany('''
-        INSERT OR IGNORE INTO facturas (id_factura, id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento)
-        VALUES (?, ?, ?, ?, ?, ?)
+        INSERT OR IGNORE INTO facturas (id_factura, id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento, saldo)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
     ''', facturas)
 
     conn.commit()
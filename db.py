@@ -0,0 +1,170 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from flask import g, has_app_context
+
+# Ruta de la base de datos (se puede cambiar con la variable de entorno CXP_DB_PATH)
+DB_PATH = os.environ.get('CXP_DB_PATH', os.path.join(os.path.dirname(__file__), 'cuentas_por_pagar.db'))
+
+# Número máximo de conexiones abiertas a la vez (0 desactiva el pool)
+POOL_TAMANO = int(os.environ.get('CXP_DB_POOL', '8'))
+
+# Milisegundos que espera una conexión antes de fallar con "database is locked"
+BUSY_TIMEOUT_MS = int(os.environ.get('CXP_DB_BUSY_TIMEOUT', '5000'))
+
+# Tamaño de la caché de páginas por conexión en KiB
+CACHE_KIB = int(os.environ.get('CXP_DB_CACHE_KIB', '8192'))
+
+# Clase de las conexiones (instrumentacion.py la cambia para medir las consultas)
+FABRICA_CONEXION = sqlite3.Connection
+
+
+# Abre una conexión nueva y aplica la configuración una sola vez
+def crear_conexion(db_path=None):
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                           factory=FABRICA_CONEXION)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_KIB}')
+    return conn
+
+
+# Pool acotado de conexiones reutilizables entre hilos (`abrir` crea cada conexión)
+class PoolConexiones:
+    def __init__(self, db_path, tamano, espera=30, abrir=None):
+        self.db_path = db_path
+        self.tamano = tamano
+        self.espera = espera
+        self.abrir = abrir or crear_conexion
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(tamano)
+        self._cerrado = False
+
+    def obtener(self):
+        if not self._cupos.acquire(timeout=self.espera):
+            raise sqlite3.OperationalError('No hay conexiones disponibles en el pool')
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self.abrir(self.db_path)
+        except Exception:
+            self._cupos.release()
+            raise
+
+    def devolver(self, conn):
+        # Descarta cualquier transacción que haya quedado abierta
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._descartar(conn)
+        else:
+            if self._cerrado:
+                self._descartar(conn)
+            else:
+                self._libres.put(conn)
+        self._cupos.release()
+
+    def _descartar(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def cerrar(self):
+        self._cerrado = True
+        while True:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexiones(DB_PATH, POOL_TAMANO)
+    return _pool
+
+
+# Cambia la ruta, el tamaño del pool o la clase de las conexiones (por ejemplo para
+# pruebas de rendimiento)
+def configurar_bd(db_path=None, tamano_pool=None, fabrica=None):
+    global DB_PATH, POOL_TAMANO, FABRICA_CONEXION
+    cerrar_pool()
+    if db_path is not None:
+        DB_PATH = db_path
+    if tamano_pool is not None:
+        POOL_TAMANO = tamano_pool
+    if fabrica is not None:
+        FABRICA_CONEXION = fabrica
+
+
+def cerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+            _pool = None
+
+
+# Conexión de la petición actual: se toma del pool la primera vez y se reutiliza
+# hasta que termina el contexto de la aplicación
+def conectar_bd():
+    if not has_app_context():
+        return crear_conexion()
+    if 'db_conn' not in g:
+        if POOL_TAMANO > 0:
+            g.db_pool = obtener_pool()
+            g.db_conn = g.db_pool.obtener()
+        else:
+            g.db_pool = None
+            g.db_conn = crear_conexion()
+    return g.db_conn
+
+
+# Devuelve la conexión al pool al terminar la petición
+def liberar_conexion(exception=None):
+    conn = g.pop('db_conn', None)
+    pool = g.pop('db_pool', None)
+    if conn is None:
+        return
+    if pool is not None:
+        pool.devolver(conn)
+    else:
+        conn.close()
+
+
+# Transacción que toma el bloqueo de escritura desde el inicio (BEGIN IMMEDIATE),
+# así dos escrituras concurrentes esperan su turno en lugar de pisarse
+@contextmanager
+def transaccion_inmediata(conn):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def init_app(app):
+    app.teardown_appcontext(liberar_conexion)
+
+
+atexit.register(cerrar_pool)
@@ -0,0 +1,162 @@
+import argparse
+from datetime import date, timedelta
+from crear_bd import crear_bd, conectar_bd
+from db import transaccion_inmediata
+from pagos import aplicar_pago, revertir_pago
+
+# La tabla transacciones es un diario de solo inserción (los triggers de crear_bd.py
+# rechazan UPDATE y DELETE). Anular una transacción registra su contrapartida, con el
+# tipo contrario y el mismo monto, que apunta a la original con id_original; corregirla
+# es anularla y registrar la transacción nueva. Así el balance de cualquier fecha se
+# puede reconstruir con los movimientos registrados hasta ese momento.
+
+TIPO_CONTRARIO = {'CR': 'DB', 'DB': 'CR'}
+
+
+# Registra la contrapartida de una transacción y devuelve a las facturas lo que había
+# cubierto. No hace commit. Devuelve (id_proveedor, tipo_movimiento, monto) de la original.
+def anular_transaccion(cursor, id_transaccion):
+    cursor.execute('''
+        SELECT id_proveedor, tipo_movimiento, monto, id_original,
+               EXISTS (SELECT 1 FROM transacciones a WHERE a.id_original = t.id_transaccion)
+        FROM transacciones t
+        WHERE id_transaccion = ?
+    ''', (id_transaccion,))
+    fila = cursor.fetchone()
+    if not fila:
+        raise ValueError('La transacción no existe.')
+    id_proveedor, tipo_movimiento, monto, id_original, anulada = fila
+    if id_original is not None:
+        raise ValueError('La transacción es una anulación y no se puede modificar.')
+    if anulada:
+        raise ValueError('La transacción ya fue anulada.')
+
+    revertir_pago(cursor, id_transaccion)
+    cursor.execute('''
+        INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto, fecha_registro, id_original)
+        VALUES (?, ?, ?, datetime('now', 'localtime'), ?)
+    ''', (id_proveedor, TIPO_CONTRARIO[tipo_movimiento], monto, id_transaccion))
+    return id_proveedor, tipo_movimiento, monto
+
+
+# Anula la transacción y registra en su lugar una nueva con los datos corregidos.
+# Devuelve el id de la nueva y las facturas a las que se aplicó si es un pago.
+def corregir_transaccion(cursor, id_transaccion, id_proveedor, tipo_movimiento, monto):
+    if not monto > 0:
+        raise ValueError('El monto debe ser mayor que cero.')
+    anular_transaccion(cursor, id_transaccion)
+    cursor.execute('''
+        INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto, fecha_registro)
+        VALUES (?, ?, ?, datetime('now', 'localtime'))
+    ''', (id_proveedor, tipo_movimiento, monto))
+    nuevo_id = cursor.lastrowid
+    aplicaciones = aplicar_pago(cursor, nuevo_id, id_proveedor, monto) if tipo_movimiento == 'CR' else []
+    return nuevo_id, aplicaciones
+
+
+# Lleva el balance del proveedor a `balance` registrando la diferencia como un
+# movimiento de hoy (CR si aumenta, DB si disminuye), sin tocar balance_inicial: los
+# balances de días anteriores y sus instantáneas no cambian. El ajuste no se aplica a
+# facturas. No hace commit. Devuelve el id del movimiento o None si no hay diferencia.
+def ajustar_balance(cursor, id_proveedor, balance):
+    cursor.execute('SELECT balance FROM proveedores WHERE id_proveedor = ?', (id_proveedor,))
+    fila = cursor.fetchone()
+    if not fila:
+        raise ValueError('El proveedor no existe.')
+    diferencia = round(balance - fila[0], 2)
+    if diferencia == 0:
+        return None
+    cursor.execute('''
+        INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto, fecha_registro)
+        VALUES (?, ?, ?, datetime('now', 'localtime'))
+    ''', (id_proveedor, 'CR' if diferencia > 0 else 'DB', abs(diferencia)))
+    return cursor.lastrowid
+
+
+# Balance de los proveedores al cierre de :fecha: la última instantánea hasta esa
+# fecha más los movimientos registrados después de ella y antes de :hasta (el día
+# siguiente). Sin instantánea se parte de balance_inicial e incluye los movimientos
+# sin fecha, que son anteriores a que existiera fecha_registro. Las sumas recorren
+# un rango de idx_transacciones_proveedor_fecha.
+CONSULTA_BALANCES = '''
+    SELECT p.id_proveedor, p.nombre, s.fecha AS instantanea,
+           ROUND(COALESCE(s.balance, p.balance_inicial)
+                 + COALESCE((SELECT SUM(CASE WHEN t.tipo_movimiento = 'CR' THEN t.monto ELSE -t.monto END)
+                             FROM transacciones t
+                             WHERE t.id_proveedor = p.id_proveedor
+                               AND t.fecha_registro >= COALESCE(date(s.fecha, '+1 day'), '')
+                               AND t.fecha_registro < :hasta), 0)
+                 + CASE WHEN s.fecha IS NULL THEN
+                       COALESCE((SELECT SUM(CASE WHEN t.tipo_movimiento = 'CR' THEN t.monto ELSE -t.monto END)
+                                 FROM transacciones t
+                                 WHERE t.id_proveedor = p.id_proveedor AND t.fecha_registro IS NULL), 0)
+                   ELSE 0 END, 2) AS balance
+    FROM proveedores p
+    LEFT JOIN saldos_proveedores s
+           ON s.id_proveedor = p.id_proveedor
+          AND s.fecha = (SELECT MAX(fecha) FROM saldos_proveedores
+                         WHERE id_proveedor = p.id_proveedor AND fecha <= :fecha)
+'''
+
+
+# Devuelve (id_proveedor, nombre, fecha de la instantánea usada, balance) al cierre de `fecha`
+def balances_al(conn, fecha, id_proveedor=None):
+    # El límite del rango es el día siguiente, que no existe para date.max
+    if fecha >= date.max:
+        raise ValueError('Fecha fuera de rango.')
+    consulta = CONSULTA_BALANCES
+    params = {'fecha': fecha.isoformat(), 'hasta': (fecha + timedelta(days=1)).isoformat()}
+    if id_proveedor is not None:
+        consulta += ' WHERE p.id_proveedor = :id_proveedor'
+        params['id_proveedor'] = id_proveedor
+    return conn.execute(consulta + ' ORDER BY p.id_proveedor', params).fetchall()
+
+
+# Guarda el balance de cada proveedor al cierre de `fecha` (un día ya terminado, para
+# que ningún movimiento nuevo caiga dentro). Se calcula desde la instantánea anterior.
+def tomar_instantanea(conn, fecha):
+    if fecha >= date.today():
+        raise ValueError('Solo se pueden tomar instantáneas de días ya cerrados')
+    params = {'fecha': fecha.isoformat(), 'hasta': (fecha + timedelta(days=1)).isoformat()}
+    with transaccion_inmediata(conn):
+        cursor = conn.execute(f'''
+            INSERT OR REPLACE INTO saldos_proveedores (id_proveedor, fecha, balance)
+            SELECT id_proveedor, :fecha, balance FROM ({CONSULTA_BALANCES})
+        ''', params)
+        return cursor.rowcount
+
+
+# Toma la instantánea de ayer si falta para algún proveedor (no existe todavía o un
+# movimiento con fecha anterior la borró). La ejecuta cada proceso de la aplicación
+# desde el hilo de programador_pagos.py; sin ese hilo (CXP_PAGOS_PROGRAMADOR=0) hay
+# que ejecutar diario.py una vez al día, por ejemplo desde cron.
+def tomar_instantanea_pendiente(conn):
+    ayer = date.today() - timedelta(days=1)
+    if not conn.execute('''
+        SELECT 1 FROM proveedores p
+        WHERE NOT EXISTS (SELECT 1 FROM saldos_proveedores s WHERE s.id_proveedor = p.id_proveedor AND s.fecha = ?)
+        LIMIT 1
+    ''', (ayer.isoformat(),)).fetchone():
+        return 0
+    return tomar_instantanea(conn, ayer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Instantáneas de saldos de proveedores.')
+    parser.add_argument('--fecha', type=date.fromisoformat,
+                        help='Día (AAAA-MM-DD) de la instantánea; por defecto ayer, si no existe')
+    args = parser.parse_args()
+
+    crear_bd()
+    conn = conectar_bd()
+    if args.fecha:
+        filas = tomar_instantanea(conn, args.fecha)
+    else:
+        filas = tomar_instantanea_pendiente(conn)
+    conn.close()
+    print(f'{filas} saldos guardados.')
+
+# Ejecuta la instantánea desde la línea de comandos (por ejemplo desde cron, una vez al
+# día, si la aplicación corre con CXP_PAGOS_PROGRAMADOR=0)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+from fpdf import FPDF
+import xlsxwriter
+
+from generador_reportes import leer_en_bloques
+
+# Tipos de las columnas de los reportes que no son una tabla (las demás toman el
+# tipo declarado en el esquema); las columnas que no aparecen son reales
+TIPOS_REPORTE = {'antiguedad': {'id_proveedor': 'entero', 'nombre': 'texto'}}
+
+
+# Filas que se miden para calcular el ancho de las columnas del PDF
+FILAS_MUESTRA_PDF = 200
+
+# Alto de cada fila de la tabla del PDF en mm
+ALTO_FILA_PDF = 6
+
+# Ancho útil de la página A4 en mm (sin márgenes) según la orientación
+ANCHO_UTIL_PDF = {'P': 190, 'L': 277}
+
+
+# Convierte un valor de la base de datos al texto que se muestra en el PDF
+def texto_celda(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float):
+        return f'{valor:.2f}'
+    if isinstance(valor, str):
+        # Las fuentes estándar de FPDF solo admiten latin-1
+        return valor.encode('latin-1', 'replace').decode('latin-1')
+    return str(valor)
+
+
+# Búfer de salida de FPDF. FPDF 1.7 concatena todo el documento en un str con
+# `self.buffer += ...`, que es cuadrático en el tamaño del PDF; este objeto acepta
+# la misma operación pero guarda las partes en una lista.
+class BufferPDF:
+    def __init__(self):
+        self.partes = []
+        self.longitud = 0
+
+    def __iadd__(self, texto):
+        self.partes.append(texto)
+        self.longitud += len(texto)
+        return self
+
+    def __len__(self):
+        return self.longitud
+
+    def escribir(self, archivo):
+        for parte in self.partes:
+            archivo.write(parte.encode('latin1'))
+
+
+# PDF con una tabla: el título y los encabezados de columna se dibujan en header(),
+# que FPDF llama en cada salto de página, así que se repiten en todas las páginas
+class PDFTabla(FPDF):
+    def __init__(self, titulo, columnas):
+        super().__init__()
+        self.buffer = BufferPDF()
+        self.titulo = texto_celda(titulo)
+        self.columnas = [texto_celda(columna) for columna in columnas]
+        self.anchos = []
+        self.max_caracteres = []
+        self.set_auto_page_break(auto=True, margin=15)
+
+    # Calcula orientación y anchos de columna a partir de una muestra de filas,
+    # para no medir cada celda del reporte completo
+    def preparar(self, muestra):
+        self.set_font('Arial', 'B', 9)
+        naturales = [self.get_string_width(columna) for columna in self.columnas]
+        self.set_font('Arial', '', 9)
+        for fila in muestra:
+            for i, valor in enumerate(fila):
+                naturales[i] = max(naturales[i], self.get_string_width(texto_celda(valor)))
+        naturales = [ancho + 3 for ancho in naturales]
+
+        orientacion = 'P' if sum(naturales) <= ANCHO_UTIL_PDF['P'] else 'L'
+        escala = ANCHO_UTIL_PDF[orientacion] / sum(naturales)
+        self.anchos = [ancho * escala for ancho in naturales]
+
+        # Texto que cabe en cada columna, usando el ancho promedio de un carácter
+        ancho_caracter = self.get_string_width('abcdefghijklmnopqrstuvwxyz0123456789') / 36
+        self.max_caracteres = [max(1, int((ancho - 2) / ancho_caracter)) for ancho in self.anchos]
+        return orientacion
+
+    def header(self):
+        if self.page_no() == 1:
+            self.set_font('Arial', 'B', 16)
+            self.cell(0, 10, self.titulo, ln=True, align='C')
+        self.set_font('Arial', 'B', 9)
+        self.set_fill_color(220, 220, 220)
+        for columna, ancho in zip(self.columnas, self.anchos):
+            self.cell(ancho, ALTO_FILA_PDF + 1, columna, border=1, align='C', fill=True)
+        self.ln()
+        self.set_font('Arial', '', 9)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 8, f'Página {self.page_no()}', align='C')
+        self.set_font('Arial', '', 9)
+
+    def fila(self, valores):
+        for valor, ancho, maximo in zip(valores, self.anchos, self.max_caracteres):
+            texto = texto_celda(valor)
+            if len(texto) > maximo:
+                texto = texto[:max(1, maximo - 3)] + '...'
+            self.cell(ancho, ALTO_FILA_PDF, texto, border=1, align='R' if isinstance(valor, (int, float)) else 'L')
+        self.ln()
+
+
+def escribir_pdf(cursor, columnas, tabla, archivo):
+    muestra = cursor.fetchmany(FILAS_MUESTRA_PDF)
+    pdf = PDFTabla(f'Reporte de {tabla.capitalize()}', columnas)
+    pdf.add_page(orientation=pdf.preparar(muestra))
+
+    # Las filas llegan como tuplas del cursor, sin pasar por pandas
+    for fila in muestra:
+        pdf.fila(fila)
+    for filas in leer_en_bloques(cursor):
+        for fila in filas:
+            pdf.fila(fila)
+
+    pdf.close()
+    pdf.buffer.escribir(archivo)
+
+
+# Tipo de cada columna del reporte: 'entero', 'real', 'fecha' o 'texto'
+def tipos_columnas(cursor, tabla, columnas):
+    if tabla in TIPOS_REPORTE:
+        return [TIPOS_REPORTE[tabla].get(columna, 'real') for columna in columnas]
+    declarados = {fila[1]: (fila[2] or '').upper() for fila in cursor.connection.execute(f'PRAGMA table_info({tabla})')}
+    tipos = []
+    for columna in columnas:
+        declarado = declarados.get(columna, '')
+        if 'INT' in declarado:
+            tipos.append('entero')
+        elif 'REAL' in declarado or 'NUM' in declarado:
+            tipos.append('real')
+        elif 'DATE' in declarado:
+            tipos.append('fecha')
+        else:
+            tipos.append('texto')
+    return tipos
+
+
+# En modo constant_memory xlsxwriter escribe cada fila a disco al pasar a la siguiente.
+# El formato numérico se asigna por columna y no por celda, y se desactiva la
+# conversión de textos a fórmulas o enlaces, que revisa cada celda de texto.
+def escribir_excel(cursor, columnas, tabla, archivo):
+    libro = xlsxwriter.Workbook(archivo, {'constant_memory': True, 'strings_to_formulas': False,
+                                          'strings_to_urls': False})
+    hoja = libro.add_worksheet('Reporte')
+    formato_real = libro.add_format({'num_format': '#,##0.00'})
+    for i, tipo in enumerate(tipos_columnas(cursor, tabla, columnas)):
+        if tipo == 'real':
+            hoja.set_column(i, i, 14, formato_real)
+    hoja.write_row(0, 0, columnas, libro.add_format({'bold': True}))
+    hoja.freeze_panes(1, 0)
+    numero_fila = 1
+    for filas in leer_en_bloques(cursor):
+        for fila in filas:
+            hoja.write_row(numero_fila, 0, fila)
+            numero_fila += 1
+    libro.close()
+
+
+# Parquet con el tipo de cada columna; cada bloque del cursor se escribe como un
+# grupo de filas, así que solo se tiene un bloque en memoria
+def escribir_parquet(cursor, columnas, tabla, archivo):
+    # pyarrow solo se necesita para exportar en Parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos_arrow = {'entero': pa.int64(), 'real': pa.float64(), 'fecha': pa.string(), 'texto': pa.string()}
+    esquema = pa.schema([(columna, tipos_arrow[tipo])
+                         for columna, tipo in zip(columnas, tipos_columnas(cursor, tabla, columnas))])
+    with pq.ParquetWriter(archivo, esquema, compression='zstd') as escritor:
+        for filas in leer_en_bloques(cursor):
+            valores = list(zip(*filas))
+            escritor.write_table(pa.table([pa.array(valores[i], type=campo.type) for i, campo in enumerate(esquema)],
+                                          schema=esquema))
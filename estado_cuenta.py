@@ -0,0 +1,128 @@
+import hashlib
+import hmac
+import json
+from listados import codificar_cursor, decodificar_cursor
+
+# Tamaño de página del estado de cuenta
+MOVIMIENTOS_POR_PAGINA = 100
+MOVIMIENTOS_MAX_POR_PAGINA = 1000
+
+# Movimientos por bloque al exportar el estado de cuenta completo
+MOVIMIENTOS_POR_BLOQUE = 1000
+
+COLUMNAS_ESTADO = ['fecha', 'movimiento', 'numero', 'detalle', 'monto', 'efecto', 'saldo']
+
+# Saldo de apertura: balance_inicial más los movimientos sin fecha, que son anteriores
+# a que existiera fecha_registro (igual que balances_al en diario.py)
+CONSULTA_APERTURA = '''
+    SELECT p.balance_inicial
+           + COALESCE((SELECT SUM(CASE WHEN t.tipo_movimiento = 'CR' THEN t.monto ELSE -t.monto END)
+                       FROM transacciones t
+                       WHERE t.id_proveedor = p.id_proveedor AND t.fecha_registro IS NULL), 0)
+    FROM proveedores p
+    WHERE p.id_proveedor = ?
+'''
+
+# Una página del estado de cuenta: transacciones y facturas del proveedor en orden de
+# fecha a partir del cursor (fecha, clase, id). Cada rama recorre un rango de su índice
+# (idx_transacciones_proveedor_fecha e idx_facturas_proveedor_emision) y SQLite las
+# mezcla ya ordenadas, así que una página no lee los movimientos anteriores. El saldo
+# acumulado se calcula con SUM() OVER sobre la página, partiendo del saldo con que
+# terminó la página anterior (viaja en el cursor, firmado). Las facturas no mueven el balance
+# del proveedor: aparecen con efecto 0.
+CONSULTA_MOVIMIENTOS = '''
+    WITH pagina AS (
+        SELECT t.fecha_registro AS fecha, 1 AS clase, t.id_transaccion AS numero,
+               t.tipo_movimiento AS movimiento,
+               CASE WHEN t.id_original IS NOT NULL THEN 'Anula la ' || t.id_original END AS detalle,
+               t.monto, CASE WHEN t.tipo_movimiento = 'CR' THEN t.monto ELSE -t.monto END AS efecto
+        FROM transacciones t
+        WHERE t.id_proveedor = :id_proveedor AND t.fecha_registro >= :fecha
+          AND (t.fecha_registro, 1, t.id_transaccion) > (:fecha, :clase, :numero)
+        UNION ALL
+        SELECT f.fecha_emision, 0, f.id_factura, 'FACTURA', f.descripcion, f.monto, 0
+        FROM facturas f
+        WHERE f.id_proveedor = :id_proveedor AND f.fecha_emision >= :fecha
+          AND (f.fecha_emision, 0, f.id_factura) > (:fecha, :clase, :numero)
+        ORDER BY fecha, clase, numero
+        LIMIT :limite
+    )
+    SELECT fecha, clase, movimiento, numero, detalle, monto, efecto,
+           ROUND(:saldo + SUM(efecto) OVER (ORDER BY fecha, clase, numero ROWS UNBOUNDED PRECEDING), 2) AS saldo
+    FROM pagina
+    ORDER BY fecha, clase, numero
+'''
+
+
+# Devuelve el saldo de apertura del proveedor, o None si no existe
+def saldo_apertura(conn, id_proveedor):
+    fila = conn.execute(CONSULTA_APERTURA, (id_proveedor,)).fetchone()
+    return round(fila[0], 2) if fila else None
+
+
+def _leer_pagina(conn, id_proveedor, posicion, por_pagina):
+    fecha, clase, numero, saldo = posicion
+    cursor = conn.execute(CONSULTA_MOVIMIENTOS, {
+        'id_proveedor': id_proveedor, 'fecha': fecha, 'clase': clase, 'numero': numero,
+        'saldo': saldo, 'limite': por_pagina,
+    })
+    filas = cursor.fetchall()
+    if len(filas) < por_pagina:
+        return filas, None
+    ultima = filas[-1]
+    return filas, [ultima[0], ultima[1], ultima[3], ultima[7]]
+
+
+# El cursor lleva el saldo acumulado, así que se firma con la clave de la aplicación
+# (HMAC) junto con el proveedor: un cliente no puede cambiar el saldo ni usar el
+# cursor en el estado de cuenta de otro proveedor
+def _firmar(clave, id_proveedor, posicion):
+    if isinstance(clave, str):
+        clave = clave.encode('utf-8')
+    mensaje = json.dumps([id_proveedor] + posicion).encode('utf-8')
+    return hmac.new(clave, mensaje, hashlib.sha256).hexdigest()
+
+
+def _codificar_posicion(clave, id_proveedor, posicion):
+    return codificar_cursor(posicion + [_firmar(clave, id_proveedor, posicion)])
+
+
+def _decodificar_posicion(clave, id_proveedor, cursor):
+    *posicion, firma = decodificar_cursor(cursor, longitud=5)
+    fecha, clase, numero, saldo = posicion
+    if (not isinstance(fecha, str) or clase not in (0, 1) or isinstance(clase, bool)
+            or not isinstance(numero, int) or isinstance(numero, bool)
+            or not isinstance(saldo, (int, float)) or isinstance(saldo, bool) or not isinstance(firma, str)):
+        raise ValueError('Cursor no válido')
+    if not hmac.compare_digest(firma, _firmar(clave, id_proveedor, posicion)):
+        raise ValueError('Cursor no válido')
+    return posicion
+
+
+# Devuelve una página del estado de cuenta como lista de diccionarios y el cursor de la
+# página siguiente (None si es la última). `clave` firma los cursores.
+def consultar_estado_cuenta(conn, id_proveedor, clave, despues=None, por_pagina=MOVIMIENTOS_POR_PAGINA):
+    if despues:
+        posicion = _decodificar_posicion(clave, id_proveedor, despues)
+    else:
+        posicion = ['', -1, 0, saldo_apertura(conn, id_proveedor) or 0]
+    filas, siguiente = _leer_pagina(conn, id_proveedor, posicion, por_pagina)
+    datos = [dict(zip(COLUMNAS_ESTADO, fila[:1] + fila[2:])) for fila in filas]
+    return datos, siguiente and _codificar_posicion(clave, id_proveedor, siguiente)
+
+
+# Recorre el estado de cuenta completo por bloques de tuplas con COLUMNAS_ESTADO, dentro
+# de una transacción de lectura para que todas las páginas vean los mismos datos
+def recorrer_estado_cuenta(conn, id_proveedor, tamano=MOVIMIENTOS_POR_BLOQUE):
+    propia = not conn.in_transaction
+    if propia:
+        conn.execute('BEGIN')
+    try:
+        posicion = ['', -1, 0, saldo_apertura(conn, id_proveedor) or 0]
+        while posicion:
+            filas, posicion = _leer_pagina(conn, id_proveedor, posicion, tamano)
+            if filas:
+                yield [fila[:1] + fila[2:] for fila in filas]
+    finally:
+        if propia:
+            conn.rollback()
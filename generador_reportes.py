@@ -0,0 +1,144 @@
+import csv
+import io
+import sqlite3
+from datetime import date
+from importlib.util import find_spec
+
+# Antigüedad de saldos: saldo pendiente de las facturas por proveedor según los
+# días vencidos a la fecha de corte, calculado en una sola consulta agregada. Por
+# cada proveedor busca sus facturas con saldo en idx_facturas_pendientes, que las
+# cubre (proveedor, vencimiento y saldo), sin leer las filas de la tabla.
+CONSULTA_ANTIGUEDAD = '''
+    SELECT p.id_proveedor, p.nombre,
+           ROUND(SUM(CASE WHEN a.dias <= 0 THEN a.saldo ELSE 0 END), 2) AS corriente,
+           ROUND(SUM(CASE WHEN a.dias BETWEEN 1 AND 30 THEN a.saldo ELSE 0 END), 2) AS dias_1_30,
+           ROUND(SUM(CASE WHEN a.dias BETWEEN 31 AND 60 THEN a.saldo ELSE 0 END), 2) AS dias_31_60,
+           ROUND(SUM(CASE WHEN a.dias BETWEEN 61 AND 90 THEN a.saldo ELSE 0 END), 2) AS dias_61_90,
+           ROUND(SUM(CASE WHEN a.dias > 90 THEN a.saldo ELSE 0 END), 2) AS mas_de_90,
+           ROUND(SUM(a.saldo), 2) AS total
+    FROM (SELECT id_proveedor, saldo, julianday(:corte) - julianday(fecha_vencimiento) AS dias
+          FROM facturas
+          WHERE saldo > 0) a
+    JOIN proveedores p ON p.id_proveedor = a.id_proveedor
+    GROUP BY p.id_proveedor, p.nombre
+    ORDER BY total DESC
+'''
+
+# Consulta de cada reporte; las tablas se exportan completas
+CONSULTAS_REPORTE = {
+    'proveedores': 'SELECT * FROM proveedores',
+    'transacciones': 'SELECT * FROM transacciones',
+    'facturas': 'SELECT * FROM facturas',
+    'antiguedad': CONSULTA_ANTIGUEDAD,
+}
+
+# Tablas de las que depende cada reporte (para saber si un archivo en caché sigue vigente)
+TABLAS_ORIGEN = {'antiguedad': ['facturas', 'proveedores']}
+
+# Reportes que se pueden exportar
+TABLAS_REPORTE = list(CONSULTAS_REPORTE)
+
+# Formatos de exportación: función que escribe el archivo desde el cursor, extensión
+# y tipo MIME de cada uno (se llenan con registrar_formato al final del módulo)
+ESCRITORES = {}
+EXTENSIONES = {}
+MIMETYPES = {}
+
+# Filas que se leen de la base de datos en cada bloque al exportar reportes
+FILAS_POR_BLOQUE = 1000
+
+
+# Lee el cursor por bloques para no cargar toda la tabla en memoria
+def leer_en_bloques(cursor, tamano=FILAS_POR_BLOQUE):
+    while True:
+        filas = cursor.fetchmany(tamano)
+        if not filas:
+            break
+        yield filas
+
+
+# Genera el CSV por bloques para enviarlo como respuesta en streaming
+def generar_csv_en_bloques(cursor, columnas):
+    return csv_de_bloques(leer_en_bloques(cursor), columnas)
+
+
+# Convierte bloques de filas en texto CSV, un fragmento por bloque
+def csv_de_bloques(bloques, columnas):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    for filas in bloques:
+        writer.writerows(filas)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def escribir_csv(cursor, columnas, tabla, archivo):
+    for bloque in generar_csv_en_bloques(cursor, columnas):
+        archivo.write(bloque.encode('utf-8'))
+
+
+# Los escritores de PDF, Excel y Parquet están en escritores_reportes.py, que importa
+# fpdf y xlsxwriter; ese módulo se carga la primera vez que se genera uno de esos
+# reportes, así los procesos que nunca los generan no pagan la importación
+def escritor_diferido(nombre):
+    def escribir(cursor, columnas, tabla, archivo):
+        import escritores_reportes
+        return getattr(escritores_reportes, nombre)(cursor, columnas, tabla, archivo)
+    return escribir
+
+
+def registrar_formato(formato, escritor, extension, mimetype):
+    ESCRITORES[formato] = escritor
+    EXTENSIONES[formato] = extension
+    MIMETYPES[formato] = mimetype
+
+
+registrar_formato('pdf', escritor_diferido('escribir_pdf'), 'pdf', 'application/pdf')
+registrar_formato('excel', escritor_diferido('escribir_excel'), 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+registrar_formato('csv', escribir_csv, 'csv', 'text/csv')
+# Parquet se ofrece solo si pyarrow está instalado
+if find_spec('pyarrow') is not None:
+    registrar_formato('parquet', escritor_diferido('escribir_parquet'), 'parquet', 'application/vnd.apache.parquet')
+
+
+# Ejecuta la consulta del reporte y devuelve el cursor y los nombres de columna
+def consultar_reporte(conn, tabla, corte=None):
+    if tabla not in CONSULTAS_REPORTE:
+        raise ValueError(f'Tabla no válida: {tabla}')
+    cursor = conn.execute(CONSULTAS_REPORTE[tabla], {'corte': corte or date.today().isoformat()})
+    columnas = [descripcion[0] for descripcion in cursor.description]
+    return cursor, columnas
+
+
+def escribir_reporte(conn, tabla, formato, archivo):
+    cursor, columnas = consultar_reporte(conn, tabla)
+    ESCRITORES[formato](cursor, columnas, tabla, archivo)
+
+
+# Versión de los datos de un reporte (la mantienen los triggers de crear_bd.py). Los
+# reportes que dependen de varias tablas o de la fecha combinan esas versiones.
+def version_tabla(conn, tabla):
+    if tabla in TABLAS_ORIGEN:
+        versiones = [str(version_tabla(conn, origen)) for origen in TABLAS_ORIGEN[tabla]]
+        return '-'.join(versiones + [date.today().isoformat()])
+    fila = conn.execute('SELECT version FROM versiones_tablas WHERE tabla = ?', (tabla,)).fetchone()
+    return fila[0] if fila else 0
+
+
+# Punto de entrada de los procesos del pool: genera el reporte en `destino` y
+# devuelve la versión de los datos leídos (versión y filas salen de la misma lectura)
+def generar_archivo(db_path, tabla, formato, destino):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('BEGIN')
+        version = version_tabla(conn, tabla)
+        with open(destino, 'wb') as archivo:
+            escribir_reporte(conn, tabla, formato, archivo)
+        conn.rollback()
+    finally:
+        conn.close()
+    return version
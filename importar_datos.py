@@ -0,0 +1,242 @@
+import argparse
+import csv
+import io
+import json
+import math
+import os
+from datetime import date
+from crear_bd import crear_bd, conectar_bd
+from db import transaccion_inmediata
+from movimientos import registrar_movimientos
+
+# Tipos de registros que se pueden importar
+TIPOS_IMPORTACION = ['proveedores', 'facturas', 'transacciones']
+
+# Filas válidas que se insertan en cada transacción
+FILAS_POR_LOTE = 20000
+
+# Errores por fila que se guardan en el reporte (el total se cuenta siempre)
+MAX_ERRORES = 1000
+
+# Movimientos que se aceptan en un solo lote de la API
+MAX_MOVIMIENTOS_LOTE = int(os.environ.get('CXP_MAX_MOVIMIENTOS_LOTE', '50000'))
+
+
+# Lee las filas del archivo como diccionarios sin cargarlo completo en memoria
+def leer_filas(archivo, nombre_archivo):
+    if nombre_archivo.lower().endswith('.xlsx'):
+        # openpyxl solo se necesita para importar Excel
+        from openpyxl import load_workbook
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = [str(valor).strip() if valor is not None else '' for valor in next(filas, [])]
+        for valores in filas:
+            yield dict(zip(encabezados, valores))
+        libro.close()
+    else:
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+        for fila in csv.DictReader(texto):
+            yield fila
+
+
+def _texto(fila, columna, obligatorio=True):
+    valor = fila.get(columna)
+    valor = '' if valor is None else str(valor).strip()
+    if obligatorio and not valor:
+        raise ValueError(f'Falta {columna}')
+    return valor
+
+
+def _numero(fila, columna, obligatorio=True):
+    valor = _texto(fila, columna, obligatorio)
+    if not valor:
+        return None
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise ValueError(f'{columna} no es un número: {valor}')
+    # float() acepta 'nan' e 'inf', que no son importes válidos
+    if not math.isfinite(numero):
+        raise ValueError(f'{columna} no es un número: {valor}')
+    return numero
+
+
+def _entero(fila, columna, obligatorio=True):
+    numero = _numero(fila, columna, obligatorio)
+    if numero is None:
+        return None
+    if not numero.is_integer():
+        raise ValueError(f'{columna} no es un entero: {numero}')
+    return int(numero)
+
+
+def _fecha(fila, columna):
+    valor = fila.get(columna)
+    if isinstance(valor, date):
+        return valor.isoformat()[:10]
+    valor = _texto(fila, columna)
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except ValueError:
+        raise ValueError(f'{columna} no es una fecha AAAA-MM-DD: {valor}')
+
+
+def validar_proveedor(fila, proveedores):
+    id_proveedor = _entero(fila, 'id_proveedor', obligatorio=False)
+    if id_proveedor is not None:
+        if id_proveedor in proveedores:
+            raise ValueError(f'El proveedor {id_proveedor} ya existe')
+        proveedores.add(id_proveedor)
+    balance = _numero(fila, 'balance', obligatorio=False) or 0
+    return (id_proveedor, _texto(fila, 'nombre'), balance, balance)
+
+
+def validar_factura(fila, proveedores):
+    id_proveedor = _entero(fila, 'id_proveedor')
+    if id_proveedor not in proveedores:
+        raise ValueError(f'El proveedor {id_proveedor} no existe')
+    monto = _numero(fila, 'monto')
+    if monto <= 0:
+        raise ValueError('El monto debe ser positivo')
+    fecha_emision = _fecha(fila, 'fecha_emision')
+    fecha_vencimiento = _fecha(fila, 'fecha_vencimiento')
+    if fecha_emision > fecha_vencimiento:
+        raise ValueError('La fecha de emisión es posterior a la de vencimiento')
+    return (id_proveedor, monto, _texto(fila, 'descripcion', obligatorio=False),
+            fecha_emision, fecha_vencimiento, monto)
+
+
+def validar_transaccion(fila, proveedores):
+    id_proveedor = _entero(fila, 'id_proveedor')
+    if id_proveedor not in proveedores:
+        raise ValueError(f'El proveedor {id_proveedor} no existe')
+    tipo_movimiento = _texto(fila, 'tipo_movimiento').upper()
+    if tipo_movimiento not in ('CR', 'DB'):
+        raise ValueError(f'Tipo de movimiento inválido: {tipo_movimiento}')
+    monto = _numero(fila, 'monto')
+    if monto <= 0:
+        raise ValueError('El monto debe ser positivo')
+    return (id_proveedor, tipo_movimiento, monto)
+
+
+def insertar_proveedores(cursor, lote):
+    cursor.executemany('''
+        INSERT INTO proveedores (id_proveedor, nombre, balance, balance_inicial)
+        VALUES (?, ?, ?, ?)
+    ''', lote)
+
+
+def insertar_facturas(cursor, lote):
+    cursor.executemany('''
+        INSERT INTO facturas (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento, saldo)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', lote)
+
+
+VALIDADORES = {'proveedores': validar_proveedor, 'facturas': validar_factura, 'transacciones': validar_transaccion}
+INSERTORES = {'proveedores': insertar_proveedores, 'facturas': insertar_facturas, 'transacciones': registrar_movimientos}
+
+
+# Importa las filas por lotes; cada lote es una transacción. Las filas inválidas
+# se saltan y se informan con su número de línea (la línea 1 es el encabezado).
+def importar(conn, tipo, filas, filas_por_lote=FILAS_POR_LOTE):
+    validar = VALIDADORES[tipo]
+    insertar = INSERTORES[tipo]
+    proveedores = {fila[0] for fila in conn.execute('SELECT id_proveedor FROM proveedores')}
+    resultado = {'tipo': tipo, 'importadas': 0, 'total_errores': 0, 'errores': []}
+
+    def guardar(lote):
+        with transaccion_inmediata(conn):
+            insertar(conn.cursor(), lote)
+        resultado['importadas'] += len(lote)
+
+    lote = []
+    for numero_linea, fila in enumerate(filas, start=2):
+        try:
+            lote.append(validar(fila, proveedores))
+        except ValueError as e:
+            resultado['total_errores'] += 1
+            if len(resultado['errores']) < MAX_ERRORES:
+                resultado['errores'].append({'linea': numero_linea, 'error': str(e)})
+            continue
+        if len(lote) >= filas_por_lote:
+            guardar(lote)
+            lote = []
+    if lote:
+        guardar(lote)
+
+    return resultado
+
+
+# Registra un lote de movimientos (diccionarios con id_proveedor, tipo_movimiento y
+# monto) en una sola transacción BEGIN IMMEDIATE: los proveedores se validan con una
+# consulta, las filas se insertan con executemany y los balances y pagos se aplican
+# agregados (ver registrar_movimientos). Si hay movimientos inválidos no se registra
+# ninguno, salvo con parcial=True, que registra los válidos. Devuelve el resultado de
+# cada movimiento en el mismo orden y si se registraron.
+def registrar_lote(conn, filas, parcial=False):
+    resultados = [None] * len(filas)
+    validos = []
+    with transaccion_inmediata(conn):
+        cursor = conn.cursor()
+        candidatos = [fila.get('id_proveedor') for fila in filas if isinstance(fila, dict)]
+        cursor.execute('''
+            SELECT id_proveedor FROM proveedores
+            WHERE id_proveedor IN (SELECT CAST(value AS INTEGER) FROM json_each(?))
+        ''', (json.dumps(candidatos, default=str),))
+        proveedores = {fila[0] for fila in cursor.fetchall()}
+
+        for indice, fila in enumerate(filas):
+            try:
+                if not isinstance(fila, dict):
+                    raise ValueError('El movimiento debe ser un objeto')
+                validos.append((indice, validar_transaccion(fila, proveedores)))
+            except ValueError as e:
+                resultados[indice] = {'indice': indice, 'estado': 'error', 'error': str(e)}
+
+        if validos and (parcial or len(validos) == len(filas)):
+            ids, aplicaciones = registrar_movimientos(cursor, [movimiento for _, movimiento in validos])
+            for (indice, _), id_transaccion in zip(validos, ids):
+                resultados[indice] = {
+                    'indice': indice,
+                    'estado': 'registrado',
+                    'id_transaccion': id_transaccion,
+                    'facturas': [{'id_factura': id_factura, 'monto_aplicado': monto}
+                                 for id_factura, monto in aplicaciones.get(id_transaccion, [])],
+                }
+            return resultados, True
+
+    for indice, _ in validos:
+        resultados[indice] = {'indice': indice, 'estado': 'no_registrado'}
+    return resultados, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa proveedores, facturas o transacciones desde CSV o XLSX.')
+    parser.add_argument('tipo', choices=TIPOS_IMPORTACION)
+    parser.add_argument('archivo')
+    parser.add_argument('--lote', type=int, default=FILAS_POR_LOTE, help='Filas por transacción')
+    parser.add_argument('--errores', help='Guarda el reporte de errores en este archivo CSV')
+    args = parser.parse_args()
+
+    crear_bd()
+    conn = conectar_bd()
+    with open(args.archivo, 'rb') as archivo:
+        resultado = importar(conn, args.tipo, leer_filas(archivo, os.path.basename(args.archivo)), args.lote)
+    conn.close()
+
+    print(f"{resultado['importadas']} filas importadas, {resultado['total_errores']} con errores.")
+    for error in resultado['errores'][:20]:
+        print(f"  línea {error['linea']}: {error['error']}")
+
+    if args.errores:
+        with open(args.errores, 'w', newline='', encoding='utf-8') as salida:
+            writer = csv.DictWriter(salida, fieldnames=['linea', 'error'])
+            writer.writeheader()
+            writer.writerows(resultado['errores'])
+
+    return 1 if resultado['total_errores'] else 0
+
+# Ejecuta la importación desde la línea de comandos
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+import cProfile
+import hmac
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from flask import g, has_app_context, request, current_app, Response, before_render_template, template_rendered
+import db
+
+# La instrumentación es opcional: se activa con CXP_INSTRUMENTACION=1
+HABILITADA = os.environ.get('CXP_INSTRUMENTACION', '0') == '1'
+
+# Sentencias SQL más lentas que esto se registran en el log con su texto
+SQL_LENTA_MS = float(os.environ.get('CXP_SQL_LENTA_MS', '100'))
+
+# Fracción de peticiones que se perfilan con cProfile (0 lo desactiva) y duración a
+# partir de la cual se guarda el perfil en instance/perfiles
+PERFIL_MUESTREO = float(os.environ.get('CXP_PERFIL_MUESTREO', '0'))
+PERFIL_LENTO_MS = float(os.environ.get('CXP_PERFIL_LENTO_MS', '500'))
+
+# Token que debe enviar quien lee /metrics (Authorization: Bearer <token>). Sin token
+# la ruta no se registra: las métricas muestran tiempos y volúmenes internos.
+METRICAS_TOKEN = os.environ.get('CXP_METRICAS_TOKEN', '')
+
+# Límites de los histogramas de /metrics
+LIMITES_SEGUNDOS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+LIMITES_CONSULTAS = [1, 2, 5, 10, 20, 50, 100, 500]
+
+
+# Suma el tiempo de una sentencia (o de leer sus filas) a la petición actual
+def _registrar_sql(duracion, sql=None):
+    if not has_app_context():
+        return
+    medicion = g.get('medicion')
+    if medicion is None:
+        return
+    medicion['sql'] += duracion
+    if sql is not None:
+        medicion['consultas'] += 1
+        if duracion * 1000 >= SQL_LENTA_MS:
+            medicion['lentas'].append((round(duracion * 1000, 1), ' '.join(sql.split())))
+
+
+# Cursor que mide cada sentencia y el tiempo de leer sus filas
+class CursorMedido(sqlite3.Cursor):
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            _registrar_sql(time.perf_counter() - inicio, sql)
+
+    def executemany(self, sql, parametros):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            _registrar_sql(time.perf_counter() - inicio, sql)
+
+    def executescript(self, script):
+        inicio = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            _registrar_sql(time.perf_counter() - inicio, script)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _registrar_sql(time.perf_counter() - inicio)
+
+    def fetchmany(self, *args):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchmany(*args)
+        finally:
+            _registrar_sql(time.perf_counter() - inicio)
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _registrar_sql(time.perf_counter() - inicio)
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            return super().__next__()
+        finally:
+            _registrar_sql(time.perf_counter() - inicio)
+
+
+# Conexión cuyos cursores (incluidos los de conn.execute) son CursorMedido
+class ConexionMedida(sqlite3.Connection):
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+# Contadores e histogramas por endpoint que se exponen en /metrics
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = {}
+        self.contadores = {'sql_consultas': {}, 'sql_segundos': {}, 'plantilla_segundos': {}, 'respuesta_bytes': {}}
+        self.histogramas = {
+            'peticion_segundos': (LIMITES_SEGUNDOS, {}),
+            'consultas_por_peticion': (LIMITES_CONSULTAS, {}),
+        }
+        self.perfiles_guardados = 0
+
+    def _observar(self, nombre, endpoint, valor):
+        limites, series = self.histogramas[nombre]
+        serie = series.setdefault(endpoint, {'cubetas': [0] * len(limites), 'suma': 0.0, 'cuenta': 0})
+        for i, limite in enumerate(limites):
+            if valor <= limite:
+                serie['cubetas'][i] += 1
+        serie['suma'] += valor
+        serie['cuenta'] += 1
+
+    def registrar(self, endpoint, metodo, estado, duracion, medicion, tamano):
+        with self._lock:
+            clave = (endpoint, metodo, str(estado))
+            self.peticiones[clave] = self.peticiones.get(clave, 0) + 1
+            for nombre, valor in [('sql_consultas', medicion['consultas']), ('sql_segundos', medicion['sql']),
+                                  ('plantilla_segundos', medicion['plantillas']), ('respuesta_bytes', tamano)]:
+                self.contadores[nombre][endpoint] = self.contadores[nombre].get(endpoint, 0) + valor
+            self._observar('peticion_segundos', endpoint, duracion)
+            self._observar('consultas_por_peticion', endpoint, medicion['consultas'])
+
+    # Texto en el formato de exposición de Prometheus
+    def exportar(self):
+        lineas = []
+        with self._lock:
+            lineas.append('# HELP cxp_peticiones_total Peticiones atendidas.')
+            lineas.append('# TYPE cxp_peticiones_total counter')
+            for (endpoint, metodo, estado), valor in sorted(self.peticiones.items()):
+                lineas.append(f'cxp_peticiones_total{{endpoint="{endpoint}",metodo="{metodo}",estado="{estado}"}} {valor}')
+
+            descripciones = {
+                'sql_consultas': 'Sentencias SQL ejecutadas.',
+                'sql_segundos': 'Tiempo en SQLite (ejecutar y leer filas).',
+                'plantilla_segundos': 'Tiempo renderizando plantillas.',
+                'respuesta_bytes': 'Bytes de las respuestas con tamaño conocido.',
+            }
+            for nombre, series in self.contadores.items():
+                lineas.append(f'# HELP cxp_{nombre}_total {descripciones[nombre]}')
+                lineas.append(f'# TYPE cxp_{nombre}_total counter')
+                for endpoint, valor in sorted(series.items()):
+                    lineas.append(f'cxp_{nombre}_total{{endpoint="{endpoint}"}} {valor:g}')
+
+            for nombre, (limites, series) in self.histogramas.items():
+                lineas.append(f'# TYPE cxp_{nombre} histogram')
+                for endpoint, serie in sorted(series.items()):
+                    for limite, cuenta in zip(limites, serie['cubetas']):
+                        lineas.append(f'cxp_{nombre}_bucket{{endpoint="{endpoint}",le="{limite:g}"}} {cuenta}')
+                    lineas.append(f'cxp_{nombre}_bucket{{endpoint="{endpoint}",le="+Inf"}} {serie["cuenta"]}')
+                    lineas.append(f'cxp_{nombre}_sum{{endpoint="{endpoint}"}} {serie["suma"]:g}')
+                    lineas.append(f'cxp_{nombre}_count{{endpoint="{endpoint}"}} {serie["cuenta"]}')
+
+            lineas.append('# TYPE cxp_perfiles_guardados_total counter')
+            lineas.append(f'cxp_perfiles_guardados_total {self.perfiles_guardados}')
+        return '\n'.join(lineas) + '\n'
+
+
+metricas = Metricas()
+
+# cProfile no admite dos perfiles activos a la vez, así que se perfila una petición por vez
+_perfil_lock = threading.Lock()
+
+
+def _iniciar_peticion():
+    g.medicion = {'inicio': time.perf_counter(), 'consultas': 0, 'sql': 0.0, 'plantillas': 0.0, 'lentas': []}
+    if PERFIL_MUESTREO > 0 and random.random() < PERFIL_MUESTREO and _perfil_lock.acquire(blocking=False):
+        g.perfil = cProfile.Profile()
+        g.perfil.enable()
+
+
+def _inicio_plantilla(app, template, context, **extra):
+    if 'medicion' in g:
+        g.inicio_plantilla = time.perf_counter()
+
+
+def _fin_plantilla(app, template, context, **extra):
+    inicio = g.pop('inicio_plantilla', None)
+    if inicio is not None and 'medicion' in g:
+        g.medicion['plantillas'] += time.perf_counter() - inicio
+
+
+def _terminar_peticion(respuesta):
+    medicion = g.get('medicion')
+    if medicion is None:
+        return respuesta
+    duracion = time.perf_counter() - medicion['inicio']
+
+    respuesta.headers['Server-Timing'] = ', '.join([
+        f'sql;dur={medicion["sql"] * 1000:.2f};desc="{medicion["consultas"]} consultas"',
+        f'tpl;dur={medicion["plantillas"] * 1000:.2f}',
+        f'total;dur={duracion * 1000:.2f}',
+    ])
+
+    # Las respuestas en streaming no tienen tamaño conocido al salir de la vista
+    tamano = 0 if respuesta.is_streamed else respuesta.calculate_content_length() or 0
+    endpoint = request.endpoint or 'sin_ruta'
+    metricas.registrar(endpoint, request.method, respuesta.status_code, duracion, medicion, tamano)
+
+    for ms, sql in medicion['lentas']:
+        current_app.logger.warning('SQL lenta (%.1f ms) en %s: %s', ms, endpoint, sql)
+    return respuesta
+
+
+def _cerrar_perfil(exception=None):
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return
+    try:
+        perfil.disable()
+        medicion = g.get('medicion')
+        duracion = time.perf_counter() - medicion['inicio'] if medicion else 0
+        if duracion * 1000 >= PERFIL_LENTO_MS:
+            directorio = os.path.join(current_app.instance_path, 'perfiles')
+            os.makedirs(directorio, exist_ok=True)
+            nombre = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{request.endpoint or 'sin_ruta'}.prof"
+            perfil.dump_stats(os.path.join(directorio, nombre))
+            metricas.perfiles_guardados += 1
+    finally:
+        _perfil_lock.release()
+
+
+def ver_metricas():
+    autorizacion = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(autorizacion, f'Bearer {METRICAS_TOKEN}'.encode('utf-8')):
+        return Response('No autorizado', status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
+
+# Activa la instrumentación si CXP_INSTRUMENTACION=1: las conexiones de db.py pasan
+# a medir cada sentencia y cada respuesta lleva el encabezado Server-Timing
+def init_app(app):
+    if not HABILITADA:
+        return
+    db.configurar_bd(fabrica=ConexionMedida)
+    app.before_request(_iniciar_peticion)
+    app.after_request(_terminar_peticion)
+    app.teardown_request(_cerrar_perfil)
+    before_render_template.connect(_inicio_plantilla, app)
+    template_rendered.connect(_fin_plantilla, app)
+    if METRICAS_TOKEN:
+        app.add_url_rule('/metrics', 'metricas', ver_metricas)
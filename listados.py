@@ -0,0 +1,129 @@
+import base64
+import json
+
+# Tamaño de página de la API de listados
+FILAS_POR_PAGINA = 50
+FILAS_MAX_POR_PAGINA = 500
+
+# Definición de cada listado de la API:
+#   consulta: SELECT sin WHERE ni ORDER BY; las columnas se nombran con alias
+#   clave: columna única que desempata el orden (va al final del cursor)
+#   orden: columnas por las que se puede ordenar -> expresión SQL. Solo se admiten
+#          columnas NOT NULL con un índice que empieza por ellas (SQLite agrega la
+#          clave primaria al final de cada índice), así cada página es un rango
+#          del índice y no un ordenamiento de toda la tabla
+#   filtros: parámetro -> (expresión SQL, tipo)
+#   tablas: tablas cuya versión (versiones_tablas) identifica los datos del listado
+LISTADOS = {
+    'proveedores': {
+        'consulta': 'SELECT p.id_proveedor, p.nombre, p.balance FROM proveedores p',
+        'clave': 'p.id_proveedor',
+        'orden': {'id_proveedor': 'p.id_proveedor', 'nombre': 'p.nombre'},
+        'filtros': {},
+        'tablas': ['proveedores'],
+    },
+    'facturas': {
+        'consulta': '''
+            SELECT f.id_factura, f.id_proveedor, p.nombre AS proveedor, f.monto, f.descripcion,
+                   f.fecha_emision, f.fecha_vencimiento, f.saldo
+            FROM facturas f JOIN proveedores p ON p.id_proveedor = f.id_proveedor
+        ''',
+        'clave': 'f.id_factura',
+        'orden': {'id_factura': 'f.id_factura', 'fecha_vencimiento': 'f.fecha_vencimiento'},
+        'filtros': {'id_proveedor': ('f.id_proveedor', int)},
+        'tablas': ['facturas', 'proveedores'],
+    },
+    'transacciones': {
+        'consulta': '''
+            SELECT t.id_transaccion, t.id_proveedor, t.tipo_movimiento, t.monto, t.fecha_registro, t.id_original
+            FROM transacciones t
+        ''',
+        'clave': 't.id_transaccion',
+        'orden': {
+            'id_transaccion': 't.id_transaccion',
+            'id_proveedor': 't.id_proveedor',
+            'tipo_movimiento': 't.tipo_movimiento',
+        },
+        'filtros': {'id_proveedor': ('t.id_proveedor', int), 'tipo_movimiento': ('t.tipo_movimiento', str)},
+        'tablas': ['transacciones'],
+    },
+}
+
+
+# El cursor de paginación es el valor de orden y la clave de la última fila,
+# codificados para que el cliente lo devuelva tal cual
+def codificar_cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(valores).encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor, longitud=2):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except ValueError:
+        raise ValueError('Cursor no válido')
+    if not isinstance(valores, list) or len(valores) != longitud:
+        raise ValueError('Cursor no válido')
+    # Solo valores escalares: una lista u objeto llegaría a SQLite como parámetro
+    if not all(valor is None or isinstance(valor, (int, float, str)) for valor in valores):
+        raise ValueError('Cursor no válido')
+    return valores
+
+
+# Firma de los datos de un conjunto de tablas: cambia con cualquier escritura en ellas
+def version_tablas(conn, tablas):
+    versiones = dict(conn.execute(
+        f"SELECT tabla, version FROM versiones_tablas WHERE tabla IN ({', '.join('?' * len(tablas))})",
+        tablas).fetchall())
+    return '-'.join(str(versiones.get(tabla, 0)) for tabla in tablas)
+
+
+def version_listado(conn, nombre):
+    return version_tablas(conn, LISTADOS[nombre]['tablas'])
+
+
+# Devuelve una página del listado como lista de diccionarios y el cursor de la
+# página siguiente (None si es la última). `orden` es el nombre de una columna
+# admitida, con '-' delante para orden descendente.
+def consultar_pagina(conn, nombre, orden=None, despues=None, por_pagina=FILAS_POR_PAGINA, filtros=None):
+    listado = LISTADOS[nombre]
+    clave = listado['clave']
+
+    descendente = bool(orden) and orden.startswith('-')
+    columna = (orden or '').lstrip('-') or clave.split('.')[1]
+    if columna not in listado['orden']:
+        raise ValueError(f"No se puede ordenar por {columna}; columnas admitidas: {', '.join(listado['orden'])}")
+    expresion = listado['orden'][columna]
+
+    condiciones = []
+    params = []
+    for parametro, valor in (filtros or {}).items():
+        if parametro not in listado['filtros']:
+            raise ValueError(f'Filtro no válido: {parametro}')
+        filtro, tipo = listado['filtros'][parametro]
+        try:
+            params.append(tipo(valor))
+        except ValueError:
+            raise ValueError(f'Valor no válido para {parametro}: {valor}')
+        condiciones.append(f'{filtro} = ?')
+
+    operador, direccion = ('<', 'DESC') if descendente else ('>', 'ASC')
+    if despues:
+        condiciones.append(f'({expresion}, {clave}) {operador} (?, ?)')
+        params.extend(decodificar_cursor(despues))
+
+    consulta = listado['consulta']
+    if condiciones:
+        consulta += ' WHERE ' + ' AND '.join(condiciones)
+    consulta += f' ORDER BY {expresion} {direccion}, {clave} {direccion} LIMIT ?'
+    params.append(por_pagina + 1)
+
+    cursor = conn.execute(consulta, params)
+    columnas = [descripcion[0] for descripcion in cursor.description]
+    filas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    siguiente = None
+    if len(filas) > por_pagina:
+        filas = filas[:por_pagina]
+        ultima = filas[-1]
+        siguiente = codificar_cursor([ultima[columna], ultima[clave.split('.')[1]]])
+    return filas, siguiente
@@ -0,0 +1,112 @@
+import argparse
+import os
+import time
+from db import transaccion_inmediata
+
+# Versión del esquema guardada en PRAGMA user_version. Cada migración es una lista de
+# pasos idempotentes (CREATE ... IF NOT EXISTS, comprobaciones de columnas, rellenos
+# que solo tocan las filas pendientes); cada paso se confirma por separado, así las
+# demás conexiones pueden escribir entre un paso y otro, y una migración interrumpida
+# se retoma desde el principio sin repetir trabajo. La versión se actualiza solo
+# cuando terminan todos los pasos.
+
+# Filas que se actualizan en cada transacción al rellenar columnas de tablas existentes
+FILAS_POR_LOTE = int(os.environ.get('CXP_MIGRACION_LOTE', '5000'))
+
+# Filas que ANALYZE examina por índice (0 = todas); acota el tiempo en tablas grandes
+LIMITE_ANALISIS = int(os.environ.get('CXP_MIGRACION_ANALISIS', '1000'))
+
+
+def version_actual(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+# Actualiza una tabla por rangos de rowid, una transacción corta por lote, para no
+# bloquear a los escritores mientras se recorre toda la tabla. `condicion` debe
+# excluir las filas ya actualizadas para que el paso sea idempotente.
+def actualizar_por_lotes(cursor, tabla, asignacion, condicion, lote=None):
+    conn = cursor.connection
+    conn.commit()
+    lote = lote or FILAS_POR_LOTE
+    maximo = conn.execute(f'SELECT MAX(rowid) FROM {tabla}').fetchone()[0] or 0
+    actualizadas = 0
+    desde = 0
+    while desde < maximo:
+        with transaccion_inmediata(conn):
+            actualizadas += conn.execute(f'''
+                UPDATE {tabla} SET {asignacion}
+                WHERE rowid > ? AND rowid <= ? AND ({condicion})
+            ''', (desde, desde + lote)).rowcount
+        desde += lote
+    return actualizadas
+
+
+# Aplica las migraciones pendientes de `migraciones`, una lista de
+# (version, descripcion, pasos) en orden creciente, y devuelve las aplicadas como
+# (version, descripcion, segundos). Al terminar actualiza las estadísticas del
+# planificador de consultas.
+def migrar(conn, migraciones, hasta=None, informar=None):
+    aplicadas = []
+    actual = version_actual(conn)
+    for version, descripcion, pasos in migraciones:
+        if version <= actual or (hasta is not None and version > hasta):
+            continue
+        inicio = time.perf_counter()
+        for paso in pasos:
+            paso(conn.cursor())
+            conn.commit()
+        conn.execute(f'PRAGMA user_version = {int(version)}')
+        conn.commit()
+        aplicadas.append((version, descripcion, round(time.perf_counter() - inicio, 3)))
+        if informar:
+            informar(*aplicadas[-1])
+
+    # ANALYZE completo solo cuando cambió el esquema (índices nuevos sin estadísticas);
+    # PRAGMA optimize es barato y solo vuelve a analizar las tablas que lo necesitan
+    if aplicadas:
+        conn.execute(f'PRAGMA analysis_limit = {LIMITE_ANALISIS}')
+        conn.execute('ANALYZE')
+    conn.execute('PRAGMA optimize')
+    conn.commit()
+    return aplicadas
+
+
+# Filas que no cumplen las claves foráneas: (tabla, rowid, tabla_referenciada)
+def verificar_claves_foraneas(conn):
+    return [(tabla, rowid, referida) for tabla, rowid, referida, _ in conn.execute('PRAGMA foreign_key_check')]
+
+
+def main():
+    from crear_bd import MIGRACIONES, conectar_bd
+
+    parser = argparse.ArgumentParser(description='Aplica las migraciones pendientes del esquema de la base de datos.')
+    parser.add_argument('--hasta', type=int, help='Última versión que se aplica')
+    parser.add_argument('--estado', action='store_true', help='Solo muestra la versión actual y las pendientes')
+    args = parser.parse_args()
+
+    conn = conectar_bd()
+    actual = version_actual(conn)
+    pendientes = [(version, descripcion) for version, descripcion, _ in MIGRACIONES if version > actual]
+    print(f'Versión del esquema: {actual}')
+    if args.estado:
+        for version, descripcion in pendientes:
+            print(f'  pendiente {version}: {descripcion}')
+        conn.close()
+        return 1 if pendientes else 0
+
+    aplicadas = migrar(conn, MIGRACIONES, args.hasta,
+                       lambda version, descripcion, segundos: print(f'  {version}: {descripcion} ({segundos} s)'))
+    print(f'{len(aplicadas)} migraciones aplicadas, versión {version_actual(conn)}.')
+
+    violaciones = verificar_claves_foraneas(conn)
+    for tabla, rowid, referida in violaciones[:100]:
+        print(f'Clave foránea inválida: {tabla} fila {rowid} -> {referida}')
+    if violaciones:
+        print(f'{len(violaciones)} filas con claves foráneas inválidas.')
+
+    conn.close()
+    return 1 if violaciones else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
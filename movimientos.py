@@ -0,0 +1,43 @@
+import sqlite3
+from pagos import aplicar_pagos
+
+
+# Registra muchas transacciones a la vez: un executemany para las filas, una
+# actualización de balance por proveedor y la aplicación de los pagos CR a las
+# facturas. Los movimientos son (id_proveedor, tipo_movimiento, monto) ya validados.
+# No hace commit; devuelve los id_transaccion asignados en el mismo orden y las
+# facturas a las que se aplicó cada pago ({id_transaccion: [(id_factura, monto)]}).
+def registrar_movimientos(cursor, movimientos):
+    if not movimientos:
+        return []
+
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transacciones'")
+    fila = cursor.fetchone()
+    ultimo_id = fila[0] if fila else 0
+
+    # Con la pausa activa trg_balance_insert no actualiza el balance fila por fila
+    cursor.execute("INSERT INTO pausa_triggers (nombre) VALUES ('balance')")
+    try:
+        cursor.executemany('''
+            INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto, fecha_registro)
+            VALUES (?, ?, ?, datetime('now', 'localtime'))
+        ''', movimientos)
+    finally:
+        cursor.execute("DELETE FROM pausa_triggers WHERE nombre = 'balance'")
+
+    # Dentro de la transacción de escritura AUTOINCREMENT asigna ids consecutivos
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transacciones'")
+    if cursor.fetchone()[0] != ultimo_id + len(movimientos):
+        raise sqlite3.IntegrityError('Los ids de las transacciones insertadas no son consecutivos')
+    ids = list(range(ultimo_id + 1, ultimo_id + 1 + len(movimientos)))
+
+    deltas = {}
+    for id_proveedor, tipo_movimiento, monto in movimientos:
+        deltas[id_proveedor] = deltas.get(id_proveedor, 0) + (monto if tipo_movimiento == 'CR' else -monto)
+    cursor.executemany('UPDATE proveedores SET balance = balance + ? WHERE id_proveedor = ?',
+                       [(delta, id_proveedor) for id_proveedor, delta in deltas.items()])
+
+    aplicaciones = aplicar_pagos(cursor, [(id_transaccion, id_proveedor, monto)
+                                          for id_transaccion, (id_proveedor, tipo_movimiento, monto)
+                                          in zip(ids, movimientos) if tipo_movimiento == 'CR'])
+    return ids, aplicaciones
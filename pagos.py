@@ -0,0 +1,136 @@
+from collections import deque
+
+# Aplicación de pagos (transacciones CR) a las facturas pendientes del proveedor.
+# Las facturas no se eliminan: cada aplicación queda en pagos_facturas y reduce
+# facturas.saldo. Estas funciones no hacen commit, se ejecutan dentro de la
+# transacción de quien las llama.
+
+
+# Aplica un pago y devuelve la lista de (id_factura, monto_aplicado). Un monto que no
+# es positivo no se aplica a ninguna factura.
+def aplicar_pago(cursor, id_transaccion, id_proveedor, monto):
+    if not monto > 0:
+        return []
+
+    # Primero una factura sin abonos por el monto exacto, la de vencimiento más antiguo
+    # (usa idx_facturas_proveedor_monto)
+    cursor.execute('''
+        SELECT id_factura FROM facturas
+        WHERE id_proveedor = ? AND monto = ? AND saldo = monto
+        ORDER BY fecha_vencimiento
+        LIMIT 1
+    ''', (id_proveedor, monto))
+    factura = cursor.fetchone()
+
+    if factura:
+        aplicaciones = [(factura[0], monto)]
+    else:
+        # Si no, el pago se reparte entre las facturas pendientes empezando por la que
+        # vence primero (usa idx_facturas_pendientes)
+        aplicaciones = []
+        restante = round(monto, 2)
+        cursor.execute('''
+            SELECT id_factura, saldo FROM facturas
+            WHERE id_proveedor = ? AND saldo > 0
+            ORDER BY fecha_vencimiento, id_factura
+        ''', (id_proveedor,))
+        for id_factura, saldo in cursor:
+            aplicado = round(min(saldo, restante), 2)
+            aplicaciones.append((id_factura, aplicado))
+            restante = round(restante - aplicado, 2)
+            if restante <= 0:
+                break
+
+    if aplicaciones:
+        cursor.executemany('UPDATE facturas SET saldo = ROUND(saldo - ?, 2) WHERE id_factura = ?',
+                           [(aplicado, id_factura) for id_factura, aplicado in aplicaciones])
+        cursor.executemany('''
+            INSERT INTO pagos_facturas (id_transaccion, id_factura, monto_aplicado)
+            VALUES (?, ?, ?)
+        ''', [(id_transaccion, id_factura, aplicado) for id_factura, aplicado in aplicaciones])
+    return aplicaciones
+
+
+# Aplica muchos pagos a la vez con el mismo criterio que aplicar_pago, en orden: lee
+# una sola vez las facturas pendientes de cada proveedor, reparte los pagos en memoria
+# y escribe un saldo final por factura. `pagos` son (id_transaccion, id_proveedor, monto);
+# los de monto no positivo no se aplican.
+# Devuelve {id_transaccion: [(id_factura, monto_aplicado), ...]}.
+def aplicar_pagos(cursor, pagos):
+    por_proveedor = {}
+    for id_transaccion, id_proveedor, monto in pagos:
+        por_proveedor.setdefault(id_proveedor, []).append((id_transaccion, monto))
+
+    resultado = {}
+    saldos_finales = {}
+    vinculos = []
+    for id_proveedor, pagos_proveedor in por_proveedor.items():
+        # Facturas pendientes en orden de vencimiento (usa idx_facturas_pendientes)
+        cursor.execute('''
+            SELECT id_factura, monto, saldo FROM facturas
+            WHERE id_proveedor = ? AND saldo > 0
+            ORDER BY fecha_vencimiento, id_factura
+        ''', (id_proveedor,))
+        facturas = [list(fila) for fila in cursor.fetchall()]
+
+        # Facturas sin abonos por monto, para encontrar la coincidencia exacta sin recorrer
+        # la lista; las que reciben un abono después se descartan al consultarlas
+        exactas = {}
+        for factura in facturas:
+            if factura[2] == factura[1]:
+                exactas.setdefault(factura[1], deque()).append(factura)
+        # Primera factura con saldo: las anteriores ya están pagadas
+        inicio = 0
+
+        for id_transaccion, monto in pagos_proveedor:
+            if not monto > 0:
+                resultado[id_transaccion] = []
+                continue
+            candidatas = exactas.get(monto)
+            while candidatas and candidatas[0][2] != candidatas[0][1]:
+                candidatas.popleft()
+            if candidatas:
+                exacta = candidatas.popleft()
+                aplicaciones = [(exacta[0], monto)]
+                exacta[2] = round(exacta[2] - monto, 2)
+            else:
+                aplicaciones = []
+                restante = round(monto, 2)
+                while inicio < len(facturas) and facturas[inicio][2] <= 0:
+                    inicio += 1
+                for i in range(inicio, len(facturas)):
+                    factura = facturas[i]
+                    if factura[2] <= 0:
+                        continue
+                    aplicado = round(min(factura[2], restante), 2)
+                    aplicaciones.append((factura[0], aplicado))
+                    factura[2] = round(factura[2] - aplicado, 2)
+                    restante = round(restante - aplicado, 2)
+                    if restante <= 0:
+                        break
+            for id_factura, aplicado in aplicaciones:
+                vinculos.append((id_transaccion, id_factura, aplicado))
+            resultado[id_transaccion] = aplicaciones
+
+        saldos_finales.update((factura[0], factura[2]) for factura in facturas)
+
+    if vinculos:
+        afectadas = {id_factura for _, id_factura, _ in vinculos}
+        cursor.executemany('UPDATE facturas SET saldo = ? WHERE id_factura = ?',
+                           [(saldos_finales[id_factura], id_factura) for id_factura in afectadas])
+        cursor.executemany('''
+            INSERT INTO pagos_facturas (id_transaccion, id_factura, monto_aplicado)
+            VALUES (?, ?, ?)
+        ''', vinculos)
+    return resultado
+
+
+# Devuelve a las facturas el saldo que había cubierto un pago y borra sus aplicaciones
+def revertir_pago(cursor, id_transaccion):
+    cursor.execute('''
+        UPDATE facturas
+        SET saldo = ROUND(saldo + (SELECT SUM(monto_aplicado) FROM pagos_facturas pf
+                                   WHERE pf.id_transaccion = ? AND pf.id_factura = facturas.id_factura), 2)
+        WHERE id_factura IN (SELECT id_factura FROM pagos_facturas WHERE id_transaccion = ?)
+    ''', (id_transaccion, id_transaccion))
+    cursor.execute('DELETE FROM pagos_facturas WHERE id_transaccion = ?', (id_transaccion,))
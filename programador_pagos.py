@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+import db
+from db import transaccion_inmediata
+from diario import tomar_instantanea_pendiente
+
+# Días hacia adelante que cubre la propuesta de pagos (las vencidas se incluyen siempre)
+DIAS_PROPUESTA = int(os.environ.get('CXP_PAGOS_DIAS', '14'))
+
+# Segundos entre dos cálculos de la propuesta en segundo plano
+INTERVALO_SEGUNDOS = int(os.environ.get('CXP_PAGOS_INTERVALO', '3600'))
+
+# Propuestas anteriores que se conservan
+MAX_PROPUESTAS = 30
+
+
+# Guarda una propuesta de pagos con las facturas con saldo que vencen hasta
+# hoy + dias, agrupadas por proveedor. Las facturas salen de un rango sobre
+# idx_facturas_vencimiento (cubre fecha, proveedor y saldo de las que tienen saldo)
+# y el resumen por proveedor se calcula en SQL. Si ya hay una propuesta del mismo día
+# y ventana y las facturas no cambiaron desde entonces, no se recalcula.
+# Devuelve el id de la propuesta vigente.
+def generar_propuesta(conn, hoy=None, dias=DIAS_PROPUESTA):
+    hoy = hoy or date.today()
+    hasta = (hoy + timedelta(days=dias)).isoformat()
+    with transaccion_inmediata(conn):
+        version = conn.execute("SELECT version FROM versiones_tablas WHERE tabla = 'facturas'").fetchone()[0]
+        vigente = conn.execute('''
+            SELECT id_propuesta FROM propuestas_pago
+            WHERE fecha = ? AND hasta = ? AND version_facturas = ?
+            ORDER BY id_propuesta DESC LIMIT 1
+        ''', (hoy.isoformat(), hasta, version)).fetchone()
+        if vigente:
+            return vigente[0]
+
+        id_propuesta = conn.execute('''
+            INSERT INTO propuestas_pago (fecha, hasta, version_facturas, generada)
+            VALUES (?, ?, ?, datetime('now', 'localtime'))
+        ''', (hoy.isoformat(), hasta, version)).lastrowid
+        conn.execute('''
+            INSERT INTO propuestas_pago_facturas (id_propuesta, id_factura, id_proveedor, fecha_vencimiento, saldo)
+            SELECT ?, id_factura, id_proveedor, fecha_vencimiento, saldo
+            FROM facturas
+            WHERE saldo > 0 AND fecha_vencimiento <= ?
+        ''', (id_propuesta, hasta))
+        conn.execute('''
+            INSERT INTO propuestas_pago_proveedores
+                (id_propuesta, id_proveedor, facturas, vencidas, monto_vencido, monto_por_vencer, total,
+                 primer_vencimiento)
+            SELECT :id, id_proveedor, COUNT(*),
+                   SUM(fecha_vencimiento < :hoy),
+                   ROUND(SUM(CASE WHEN fecha_vencimiento < :hoy THEN saldo ELSE 0 END), 2),
+                   ROUND(SUM(CASE WHEN fecha_vencimiento >= :hoy THEN saldo ELSE 0 END), 2),
+                   ROUND(SUM(saldo), 2),
+                   MIN(fecha_vencimiento)
+            FROM propuestas_pago_facturas
+            WHERE id_propuesta = :id
+            GROUP BY id_proveedor
+        ''', {'id': id_propuesta, 'hoy': hoy.isoformat()})
+
+        # Borra las propuestas más antiguas
+        limite = id_propuesta - MAX_PROPUESTAS
+        for tabla in ['propuestas_pago_facturas', 'propuestas_pago_proveedores', 'propuestas_pago']:
+            conn.execute(f'DELETE FROM {tabla} WHERE id_propuesta <= ?', (limite,))
+    return id_propuesta
+
+
+# Última propuesta guardada con sus proveedores (los que tienen facturas vencidas
+# primero) o None si todavía no se ha generado ninguna
+def propuesta_actual(conn):
+    fila = conn.execute('''
+        SELECT id_propuesta, fecha, hasta, generada FROM propuestas_pago
+        ORDER BY id_propuesta DESC LIMIT 1
+    ''').fetchone()
+    if not fila:
+        return None
+    propuesta = {'id_propuesta': fila[0], 'fecha': fila[1], 'hasta': fila[2], 'generada': fila[3]}
+    columnas = ['id_proveedor', 'nombre', 'facturas', 'vencidas', 'monto_vencido', 'monto_por_vencer', 'total',
+                'primer_vencimiento']
+    filas = conn.execute('''
+        SELECT pp.id_proveedor, p.nombre, pp.facturas, pp.vencidas, pp.monto_vencido, pp.monto_por_vencer,
+               pp.total, pp.primer_vencimiento
+        FROM propuestas_pago_proveedores pp
+        LEFT JOIN proveedores p ON p.id_proveedor = pp.id_proveedor
+        WHERE pp.id_propuesta = ?
+        ORDER BY pp.vencidas > 0 DESC, pp.primer_vencimiento, pp.total DESC
+    ''', (propuesta['id_propuesta'],)).fetchall()
+    propuesta['proveedores'] = [dict(zip(columnas, fila)) for fila in filas]
+    propuesta['total'] = round(sum(proveedor['total'] for proveedor in propuesta['proveedores']), 2)
+    propuesta['total_vencido'] = round(sum(proveedor['monto_vencido'] for proveedor in propuesta['proveedores']), 2)
+    return propuesta
+
+
+# Facturas de una propuesta por proveedor: {id_proveedor: [factura, ...]}
+def facturas_propuesta(conn, id_propuesta):
+    facturas = {}
+    for id_factura, id_proveedor, fecha_vencimiento, saldo in conn.execute('''
+        SELECT id_factura, id_proveedor, fecha_vencimiento, saldo
+        FROM propuestas_pago_facturas
+        WHERE id_propuesta = ?
+        ORDER BY id_proveedor, fecha_vencimiento
+    ''', (id_propuesta,)):
+        facturas.setdefault(id_proveedor, []).append(
+            {'id_factura': id_factura, 'fecha_vencimiento': fecha_vencimiento, 'saldo': saldo})
+    return facturas
+
+
+# Hilo que recalcula la propuesta de pagos cada `intervalo` segundos con su propia
+# conexión. Se inicia en cada proceso con la primera petición (no al importar, para
+# que gunicorn lo cree después del fork); si hay varios procesos, el que llega
+# segundo encuentra la propuesta vigente y no la recalcula. En cada vuelta también
+# toma la instantánea de saldos del día anterior si falta (ver diario.py), así
+# balances_al no tiene que sumar todo el diario aunque no se ejecute diario.py desde cron.
+class ProgramadorPagos:
+    def __init__(self, logger, dias=DIAS_PROPUESTA, intervalo=INTERVALO_SEGUNDOS):
+        self.logger = logger
+        self.dias = dias
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._detenido = False
+        self.ultima_ejecucion = None
+        self.ultima_duracion = None
+        self.ultimo_error = None
+        self.ultima_instantanea = None
+
+    def iniciar(self):
+        if self._hilo is not None:
+            return
+        with self._lock:
+            if self._hilo is None and not self._detenido:
+                self._hilo = threading.Thread(target=self._ejecutar, name='programador-pagos', daemon=True)
+                self._hilo.start()
+
+    def detener(self):
+        self._detenido = True
+        self._despertar.set()
+
+    def generar(self):
+        inicio = time.perf_counter()
+        conn = db.crear_conexion()
+        try:
+            id_propuesta = generar_propuesta(conn, date.today(), self.dias)
+        finally:
+            conn.close()
+        self.ultima_ejecucion = datetime.now().isoformat(timespec='seconds')
+        self.ultima_duracion = round(time.perf_counter() - inicio, 3)
+        self.ultimo_error = None
+        return id_propuesta
+
+    # Devuelve los saldos guardados (0 si la instantánea de ayer ya estaba completa)
+    def tomar_instantanea(self):
+        conn = db.crear_conexion()
+        try:
+            filas = tomar_instantanea_pendiente(conn)
+        finally:
+            conn.close()
+        self.ultima_instantanea = datetime.now().isoformat(timespec='seconds')
+        return filas
+
+    def _ejecutar(self):
+        while not self._detenido:
+            try:
+                self.generar()
+            except Exception as e:
+                self.ultimo_error = str(e)
+                self.logger.exception('Error al generar la propuesta de pagos')
+            try:
+                self.tomar_instantanea()
+            except Exception as e:
+                self.ultimo_error = str(e)
+                self.logger.exception('Error al tomar la instantánea de saldos')
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def estado(self):
+        return {
+            'activo': self._hilo is not None and self._hilo.is_alive(),
+            'dias': self.dias,
+            'intervalo_segundos': self.intervalo,
+            'ultima_ejecucion': self.ultima_ejecucion,
+            'ultima_duracion_segundos': self.ultima_duracion,
+            'ultimo_error': self.ultimo_error,
+            'ultima_instantanea': self.ultima_instantanea,
+        }
@@ -0,0 +1,265 @@
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import uuid
+from flask import g, has_app_context, has_request_context, request, session
+import db
+
+# Réplica de lectura opcional (CXP_REPLICA=1): una copia de la base de datos hecha con
+# la API de backup de SQLite que se renueva cada CXP_REPLICA_SEGUNDOS. Los reportes y
+# los listados leen de la copia, así las lecturas largas no compiten con las
+# escrituras, que siguen yendo a la base de datos principal.
+HABILITADA = os.environ.get('CXP_REPLICA', '0') == '1'
+
+# Segundos entre dos copias (el retraso máximo esperado de los datos de la réplica)
+INTERVALO_SEGUNDOS = float(os.environ.get('CXP_REPLICA_SEGUNDOS', '60'))
+
+# Con un retraso mayor que este (por ejemplo si la copia falla) se lee de la principal
+RETRASO_MAX_SEGUNDOS = float(os.environ.get('CXP_REPLICA_RETRASO_MAX', str(INTERVALO_SEGUNDOS * 3)))
+
+# Conexiones abiertas a la vez sobre cada copia
+POOL_TAMANO = int(os.environ.get('CXP_REPLICA_POOL', str(db.POOL_TAMANO or 8)))
+
+
+# Las copias no se modifican nunca después de crearse, así que se abren como
+# inmutables: solo lectura y sin bloqueos de archivo
+def abrir_copia(ruta):
+    conn = sqlite3.connect(pathlib.Path(ruta).resolve().as_uri() + '?immutable=1', uri=True,
+                           check_same_thread=False, factory=db.FABRICA_CONEXION)
+    conn.execute(f'PRAGMA cache_size = -{db.CACHE_KIB}')
+    return conn
+
+
+# Copias de la base de datos en `directorio`, cada una con su pool de conexiones. El
+# nombre de cada archivo lleva el momento de la copia en milisegundos, así varios
+# procesos comparten las copias: un proceso solo copia si la más reciente del
+# directorio es más antigua que el intervalo.
+class Replica:
+    def __init__(self, db_path, directorio, intervalo=INTERVALO_SEGUNDOS, logger=None):
+        self.db_path = db_path
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._actual = None  # (ruta, momento, pool)
+        self._hilo = None
+        self._detenido = False
+        self._despertar = threading.Event()
+        self.ultima_duracion = None
+        self.ultimo_error = None
+        os.makedirs(directorio, exist_ok=True)
+
+    def _copias(self):
+        copias = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith('replica-') and nombre.endswith('.db'):
+                try:
+                    copias.append((int(nombre[len('replica-'):-len('.db')]) / 1000, os.path.join(self.directorio, nombre)))
+                except ValueError:
+                    pass
+        return sorted(copias)
+
+    # Copia la base de datos principal en un archivo nuevo. Con WAL la copia se hace
+    # en una sola transacción de lectura y no bloquea a los escritores.
+    def copiar(self):
+        inicio = time.perf_counter()
+        momento = time.time()
+        temporal = os.path.join(self.directorio, f'{uuid.uuid4().hex}.tmp')
+        origen = db.crear_conexion(self.db_path)
+        destino = sqlite3.connect(temporal)
+        try:
+            origen.backup(destino)
+            # La copia hereda el modo WAL; en modo DELETE se puede abrir como inmutable
+            destino.execute('PRAGMA journal_mode = DELETE')
+        except BaseException:
+            destino.close()
+            os.remove(temporal)
+            raise
+        finally:
+            origen.close()
+        destino.close()
+        ruta = os.path.join(self.directorio, f'replica-{int(momento * 1000)}.db')
+        os.replace(temporal, ruta)
+        self.ultima_duracion = round(time.perf_counter() - inicio, 3)
+        return momento, ruta
+
+    # Usa la copia más reciente del directorio o hace una nueva si ya pasó el intervalo
+    def refrescar(self):
+        copias = self._copias()
+        if copias and time.time() - copias[-1][0] < self.intervalo:
+            momento, ruta = copias[-1]
+        else:
+            momento, ruta = self.copiar()
+        with self._lock:
+            anterior = self._actual
+            if anterior is None or anterior[0] != ruta:
+                self._actual = (ruta, momento, db.PoolConexiones(ruta, POOL_TAMANO, abrir=abrir_copia))
+        if anterior is not None and anterior[0] != ruta:
+            # Las conexiones en uso se cierran al devolverlas al pool
+            anterior[2].cerrar()
+        self._limpiar()
+
+    # Borra las copias viejas; en Windows una copia con conexiones abiertas no se
+    # puede borrar y se intenta de nuevo en la siguiente vuelta
+    def _limpiar(self):
+        limite = time.time() - max(self.intervalo * 3, RETRASO_MAX_SEGUNDOS)
+        actual = self._actual[0] if self._actual else None
+        for momento, ruta in self._copias():
+            if momento < limite and ruta != actual:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if nombre.endswith('.tmp') and os.path.getmtime(ruta) < limite:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    def retraso(self):
+        actual = self._actual
+        return None if actual is None else time.time() - actual[1]
+
+    # (ruta, momento, pool) de la copia vigente o None si no hay copia o es demasiado antigua
+    def vigente(self):
+        actual = self._actual
+        if actual is None or time.time() - actual[1] > RETRASO_MAX_SEGUNDOS:
+            return None
+        return actual
+
+    # El hilo se inicia con la primera petición de cada proceso, después del fork
+    def iniciar(self):
+        if self._hilo is not None:
+            return
+        with self._lock:
+            if self._hilo is None and not self._detenido:
+                self._hilo = threading.Thread(target=self._ejecutar, name='replica-lectura', daemon=True)
+                self._hilo.start()
+
+    def _ejecutar(self):
+        while not self._detenido:
+            try:
+                self.refrescar()
+                self.ultimo_error = None
+            except Exception as e:
+                self.ultimo_error = str(e)
+                if self.logger:
+                    self.logger.exception('Error al copiar la réplica de lectura')
+            # Se revisa dos veces por intervalo para tomar a tiempo las copias de otros procesos
+            self._despertar.wait(self.intervalo / 2)
+
+    def detener(self):
+        self._detenido = True
+        self._despertar.set()
+        with self._lock:
+            actual, self._actual = self._actual, None
+        if actual is not None:
+            actual[2].cerrar()
+
+    def estado(self):
+        retraso = self.retraso()
+        return {
+            'habilitada': True,
+            'activa': self.vigente() is not None,
+            'archivo': os.path.basename(self._actual[0]) if self._actual else None,
+            'retraso_segundos': None if retraso is None else round(retraso, 1),
+            'intervalo_segundos': self.intervalo,
+            'retraso_max_segundos': RETRASO_MAX_SEGUNDOS,
+            'ultima_copia_segundos': self.ultima_duracion,
+            'ultimo_error': self.ultimo_error,
+        }
+
+
+_replica = None
+
+# Vistas que reciben POST pero solo leen (no cuentan como escritura de la sesión).
+# Cualquier otra vista con POST se toma como escritura y manda a la sesión a leer de
+# la base de datos principal durante un intervalo, así que las vistas nuevas que solo
+# leen deben marcarse con @solo_lectura.
+_solo_lectura = set()
+
+
+def solo_lectura(vista):
+    _solo_lectura.add(vista.__name__)
+    return vista
+
+
+# Copia vigente que puede usar la petición actual o None para leer de la principal.
+# Una sesión que escribió hace poco lee de la principal, así quien acaba de registrar
+# algo lo ve en los listados aunque la réplica todavía no lo tenga.
+def _copia_para_peticion():
+    actual = _replica.vigente() if _replica is not None else None
+    if actual is None:
+        return None
+    if has_request_context() and time.time() - session.get('ultima_escritura', 0) < INTERVALO_SEGUNDOS:
+        return None
+    return actual
+
+
+# Conexión de solo lectura para reportes y listados: de la réplica si está activa, si
+# no de la base de datos principal. Se reutiliza durante la petición.
+def conectar_lectura():
+    if not has_app_context():
+        return db.conectar_bd()
+    if 'lectura_conn' in g:
+        return g.lectura_conn
+    actual = _copia_para_peticion()
+    if actual is None:
+        return db.conectar_bd()
+    ruta, momento, pool = actual
+    g.lectura_pool = pool
+    g.lectura_conn = pool.obtener()
+    g.lectura_retraso = time.time() - momento
+    return g.lectura_conn
+
+
+# Archivo del que leen los procesos de reportes en segundo plano
+def ruta_lectura():
+    actual = _copia_para_peticion()
+    return actual[0] if actual is not None else db.DB_PATH
+
+
+def _iniciar_peticion():
+    _replica.iniciar()
+
+
+# Marca las peticiones que pueden escribir y avisa del retraso de los datos servidos
+def _terminar_peticion(respuesta):
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and request.endpoint not in _solo_lectura:
+        session['ultima_escritura'] = time.time()
+    retraso = g.get('lectura_retraso')
+    if retraso is not None:
+        respuesta.headers['X-Replica-Retraso'] = f'{retraso:.1f}'
+    return respuesta
+
+
+def _liberar_conexion(exception=None):
+    conn = g.pop('lectura_conn', None)
+    pool = g.pop('lectura_pool', None)
+    g.pop('lectura_retraso', None)
+    if conn is not None:
+        pool.devolver(conn)
+
+
+def estado():
+    return _replica.estado() if _replica is not None else {'habilitada': False}
+
+
+def detener():
+    if _replica is not None:
+        _replica.detener()
+
+
+def init_app(app):
+    global _replica
+    if not HABILITADA:
+        return
+    directorio = os.environ.get('CXP_REPLICA_DIR', os.path.join(app.instance_path, 'replica'))
+    _replica = Replica(db.DB_PATH, directorio, logger=app.logger)
+    app.before_request(_iniciar_peticion)
+    app.after_request(_terminar_peticion)
+    app.teardown_appcontext(_liberar_conexion)
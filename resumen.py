@@ -0,0 +1,74 @@
+import threading
+from datetime import date, timedelta
+
+# Días hacia adelante que cuentan como "vence esta semana"
+DIAS_POR_VENCER = 7
+
+# Meses que muestra el volumen mensual de transacciones
+MESES_VOLUMEN = 12
+
+
+def _por_pagar(conn, hoy):
+    fila = conn.execute('SELECT COUNT(*), COALESCE(SUM(saldo), 0) FROM facturas WHERE saldo > 0').fetchone()
+    return {'facturas': fila[0], 'total': round(fila[1], 2)}
+
+
+def _por_vencer(conn, hoy):
+    # Rango sobre idx_facturas_vencimiento
+    fila = conn.execute('''
+        SELECT COUNT(*), COALESCE(SUM(saldo), 0) FROM facturas
+        WHERE saldo > 0 AND fecha_vencimiento BETWEEN ? AND ?
+    ''', (hoy.isoformat(), (hoy + timedelta(days=DIAS_POR_VENCER)).isoformat())).fetchone()
+    return {'facturas': fila[0], 'total': round(fila[1], 2)}
+
+
+def _top_proveedores(conn, hoy):
+    return conn.execute('''
+        SELECT id_proveedor, nombre, balance FROM proveedores
+        ORDER BY balance DESC
+        LIMIT 10
+    ''').fetchall()
+
+
+def _volumen_mensual(conn, hoy):
+    meses = hoy.year * 12 + hoy.month - MESES_VOLUMEN
+    inicio = date(meses // 12, meses % 12 + 1, 1)
+    return conn.execute('''
+        SELECT substr(fecha_registro, 1, 7) AS mes,
+               ROUND(SUM(CASE WHEN tipo_movimiento = 'CR' THEN monto ELSE 0 END), 2) AS cr,
+               ROUND(SUM(CASE WHEN tipo_movimiento = 'DB' THEN monto ELSE 0 END), 2) AS db
+        FROM transacciones
+        WHERE fecha_registro >= ?
+        GROUP BY mes
+        ORDER BY mes
+    ''', (inicio.isoformat(),)).fetchall()
+
+
+# Cada parte del resumen, las tablas de las que depende y si depende de la fecha
+PARTES = {
+    'por_pagar': (_por_pagar, ['facturas'], False),
+    'por_vencer': (_por_vencer, ['facturas'], True),
+    'top_proveedores': (_top_proveedores, ['proveedores'], False),
+    'volumen_mensual': (_volumen_mensual, ['transacciones'], True),
+}
+
+
+# Resumen del tablero de inicio guardado en memoria. Cada parte se vuelve a calcular
+# solo cuando cambia la versión de sus tablas (versiones_tablas, que mantienen los
+# triggers en cada escritura) o el día; ver la página no recalcula nada.
+class ResumenTablero:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datos = {}
+        self._firmas = {}
+
+    def obtener(self, conn):
+        hoy = date.today()
+        versiones = dict(conn.execute('SELECT tabla, version FROM versiones_tablas').fetchall())
+        with self._lock:
+            for nombre, (calcular, tablas, usa_fecha) in PARTES.items():
+                firma = tuple(versiones.get(tabla) for tabla in tablas) + ((hoy,) if usa_fecha else ())
+                if self._firmas.get(nombre) != firma:
+                    self._datos[nombre] = calcular(conn, hoy)
+                    self._firmas[nombre] = firma
+            return dict(self._datos)
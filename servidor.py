@@ -0,0 +1,108 @@
+import argparse
+import os
+import sys
+
+# Modo de producción de la aplicación. Con gunicorn (Linux/macOS) se levantan varios
+# procesos que comparten la aplicación ya cargada en el proceso principal (preload),
+# así los módulos y las plantillas se importan una sola vez antes del fork. En Windows,
+# donde gunicorn no funciona, se usa waitress con un solo proceso y varios hilos.
+#
+# Uso: python servidor.py [--host 0.0.0.0] [--puerto 8000] [--procesos 4] [--hilos 4]
+#
+# La configuración se toma de variables de entorno (los argumentos tienen prioridad):
+#   CXP_SECRET_KEY        clave de las sesiones (obligatoria)
+#   CXP_HOST, CXP_PUERTO  dirección en la que se escucha
+#   CXP_PROCESOS          procesos de gunicorn (por defecto uno por núcleo)
+#   CXP_HILOS             hilos por proceso
+#   CXP_TIMEOUT           segundos que puede tardar una petición antes de reiniciar el proceso
+#   CXP_APAGADO_SEGUNDOS  segundos que se esperan las peticiones en curso al apagar
+#   CXP_PRECARGAR_REPORTES  1 para importar fpdf y xlsxwriter en el proceso principal
+#                         (los procesos comparten esas páginas de memoria); con 0 cada
+#                         proceso los importa la primera vez que genera un reporte
+# Además de las que ya lee cada módulo (CXP_DB_PATH, CXP_DB_POOL, ...).
+#
+# Los trabajos de reportes y el índice de su caché se guardan en
+# instance/reportes/estado.db, así la consulta de un trabajo puede llegar a cualquier
+# proceso. El directorio instance debe ser el mismo para todos los procesos.
+
+HOST = os.environ.get('CXP_HOST', '127.0.0.1')
+PUERTO = int(os.environ.get('CXP_PUERTO', '8000'))
+PROCESOS = int(os.environ.get('CXP_PROCESOS', str(os.cpu_count() or 1)))
+HILOS = int(os.environ.get('CXP_HILOS', '4'))
+TIMEOUT = int(os.environ.get('CXP_TIMEOUT', '120'))
+APAGADO_SEGUNDOS = int(os.environ.get('CXP_APAGADO_SEGUNDOS', '30'))
+PRECARGAR_REPORTES = os.environ.get('CXP_PRECARGAR_REPORTES', '1') == '1'
+
+
+# Carga la aplicación y la deja lista para hacer fork: las conexiones que se hayan
+# abierto al importar se cierran, así cada proceso abre las suyas después del fork
+# (una conexión SQLite no se debe usar en un proceso distinto al que la abrió)
+def crear_app():
+    if not os.environ.get('CXP_SECRET_KEY'):
+        raise RuntimeError('Defina CXP_SECRET_KEY antes de iniciar el servidor')
+    import db
+    from app import app
+    if PRECARGAR_REPORTES:
+        import escritores_reportes  # noqa: F401
+    db.cerrar_pool()
+    return app
+
+
+# Libera los recursos de un proceso al apagarse
+def cerrar_proceso():
+    import db
+    import replica
+    from app import cola_reportes, programador_pagos
+    programador_pagos.detener()
+    replica.detener()
+    cola_reportes.cerrar()
+    db.cerrar_pool()
+
+
+def servir_gunicorn(host, puerto, procesos, hilos):
+    from gunicorn.app.base import BaseApplication
+
+    class Aplicacion(BaseApplication):
+        def load_config(self):
+            opciones = {
+                'bind': f'{host}:{puerto}',
+                'workers': procesos,
+                'threads': hilos,
+                'preload_app': True,
+                'timeout': TIMEOUT,
+                'graceful_timeout': APAGADO_SEGUNDOS,
+                'worker_exit': lambda servidor, proceso: cerrar_proceso(),
+            }
+            for clave, valor in opciones.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            return crear_app()
+
+    Aplicacion().run()
+
+
+def servir_waitress(host, puerto, hilos):
+    from waitress import serve
+    try:
+        serve(crear_app(), host=host, port=puerto, threads=hilos)
+    finally:
+        cerrar_proceso()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inicia la aplicación en modo de producción.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    parser.add_argument('--procesos', type=int, default=PROCESOS, help='Procesos de gunicorn')
+    parser.add_argument('--hilos', type=int, default=HILOS, help='Hilos por proceso')
+    args = parser.parse_args()
+
+    if sys.platform != 'win32':
+        servir_gunicorn(args.host, args.puerto, args.procesos, args.hilos)
+    else:
+        servir_waitress(args.host, args.puerto, args.hilos)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,180 @@
 document.addEventListener("DOMContentLoaded", function() {
     console.log("JavaScript cargado y listo para usarse.");
-    
+
+    document.querySelectorAll("table[data-api]").forEach(iniciarTablaPaginada);
+    document.querySelectorAll("input[data-sugerencias]").forEach(iniciarSugerencias);
 });
+
+// Campo con sugerencias: al escribir pide a data-sugerencias los proveedores que
+// empiezan por el texto y llena el datalist del campo (valor = id, etiqueta = nombre)
+function iniciarSugerencias(campo) {
+    const lista = document.getElementById(campo.getAttribute("list"));
+    let espera = null;
+    let ultimo = "";
+
+    campo.addEventListener("input", function() {
+        clearTimeout(espera);
+        espera = setTimeout(function() {
+            const texto = campo.value.trim();
+            if (!texto || texto === ultimo) {
+                return;
+            }
+            ultimo = texto;
+            fetch(campo.dataset.sugerencias + "?prefijo=" + encodeURIComponent(texto))
+                .then(function(respuesta) {
+                    return respuesta.json();
+                })
+                .then(function(proveedores) {
+                    if (texto !== ultimo) {
+                        return;
+                    }
+                    lista.innerHTML = "";
+                    proveedores.forEach(function(proveedor) {
+                        const opcion = document.createElement("option");
+                        opcion.value = proveedor.id_proveedor;
+                        opcion.label = proveedor.nombre;
+                        lista.appendChild(opcion);
+                    });
+                })
+                .catch(function(error) {
+                    console.error("No se pudieron cargar las sugerencias:", error);
+                });
+        }, 200);
+    });
+}
+
+// Tabla que carga sus filas por páginas desde la API JSON de listados.
+// Atributos de la tabla:
+//   data-api: URL del listado (/api/facturas)
+//   data-columnas: campos de cada fila que se muestran, separados por comas
+//   data-editar / data-eliminar: prefijo de las URL de las acciones (se agrega la clave)
+//   data-confirmar: mensaje de confirmación antes de eliminar
+// Los encabezados con data-orden permiten ordenar por esa columna.
+// La siguiente página se pide al llegar al final de la tabla o con el botón "Cargar más".
+function iniciarTablaPaginada(tabla) {
+    const columnas = tabla.dataset.columnas.split(",");
+    const cuerpo = tabla.querySelector("tbody");
+    const boton = document.createElement("button");
+    boton.type = "button";
+    boton.className = "menu-button";
+    boton.textContent = "Cargar más";
+    tabla.after(boton);
+
+    let orden = "";
+    let siguiente = null;
+    let cargando = false;
+    let terminado = false;
+    // Cambia al reordenar para descartar respuestas de peticiones anteriores
+    let generacion = 0;
+
+    function cargar() {
+        if (cargando || terminado) {
+            return;
+        }
+        cargando = true;
+        const actual = generacion;
+        const parametros = new URLSearchParams();
+        if (orden) {
+            parametros.set("orden", orden);
+        }
+        if (siguiente) {
+            parametros.set("despues", siguiente);
+        }
+        // El navegador revalida con If-None-Match y reutiliza la respuesta si recibe 304
+        fetch(tabla.dataset.api + "?" + parametros.toString(), {headers: {"Accept": "application/json"}})
+            .then(function(respuesta) {
+                if (!respuesta.ok) {
+                    throw new Error("Error " + respuesta.status);
+                }
+                return respuesta.json();
+            })
+            .then(function(pagina) {
+                if (actual !== generacion) {
+                    return;
+                }
+                pagina.datos.forEach(function(dato) {
+                    cuerpo.appendChild(crearFila(dato));
+                });
+                siguiente = pagina.siguiente;
+                terminado = !siguiente;
+                boton.style.display = terminado ? "none" : "";
+            })
+            .catch(function(error) {
+                console.error("No se pudo cargar la tabla:", error);
+            })
+            .finally(function() {
+                if (actual === generacion) {
+                    cargando = false;
+                }
+            });
+    }
+
+    function crearFila(dato) {
+        const fila = document.createElement("tr");
+        columnas.forEach(function(columna) {
+            const celda = document.createElement("td");
+            celda.textContent = dato[columna] === null ? "" : dato[columna];
+            fila.appendChild(celda);
+        });
+
+        if (tabla.dataset.editar || tabla.dataset.eliminar) {
+            const clave = dato[columnas[0]];
+            const acciones = document.createElement("td");
+            if (tabla.dataset.editar) {
+                const enlace = document.createElement("a");
+                enlace.href = tabla.dataset.editar + clave;
+                enlace.className = "menu-button";
+                enlace.textContent = "Editar";
+                acciones.appendChild(enlace);
+            }
+            if (tabla.dataset.eliminar) {
+                const formulario = document.createElement("form");
+                formulario.action = tabla.dataset.eliminar + clave;
+                formulario.method = "POST";
+                formulario.style.display = "inline";
+                const eliminar = document.createElement("button");
+                eliminar.type = "submit";
+                eliminar.className = "menu-button-eliminar";
+                eliminar.textContent = "Eliminar";
+                eliminar.addEventListener("click", function(evento) {
+                    if (!confirm(tabla.dataset.confirmar || "¿Estás seguro?")) {
+                        evento.preventDefault();
+                    }
+                });
+                formulario.appendChild(eliminar);
+                acciones.appendChild(formulario);
+            }
+            fila.appendChild(acciones);
+        }
+        return fila;
+    }
+
+    function reiniciar() {
+        generacion += 1;
+        cargando = false;
+        cuerpo.innerHTML = "";
+        siguiente = null;
+        terminado = false;
+        cargar();
+    }
+
+    tabla.querySelectorAll("th[data-orden]").forEach(function(encabezado) {
+        encabezado.style.cursor = "pointer";
+        encabezado.addEventListener("click", function() {
+            const columna = encabezado.dataset.orden;
+            orden = orden === columna ? "-" + columna : columna;
+            reiniciar();
+        });
+    });
+
+    boton.addEventListener("click", cargar);
+    if ("IntersectionObserver" in window) {
+        new IntersectionObserver(function(entradas) {
+            if (entradas[0].isIntersecting) {
+                cargar();
+            }
+        }).observe(boton);
+    }
+
+    cargar();
+}
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from crear_bd import crear_bd
+
+
+# Base de datos nueva con el esquema completo para cada prueba
+@pytest.fixture
+def conn(tmp_path):
+    ruta_original = db.DB_PATH
+    db.configurar_bd(str(tmp_path / 'pruebas.db'))
+    crear_bd()
+    conexion = db.crear_conexion()
+    yield conexion
+    conexion.close()
+    db.configurar_bd(ruta_original)
+
+
+def agregar_proveedor(conn, id_proveedor, balance_inicial=0):
+    conn.execute('INSERT INTO proveedores (id_proveedor, nombre, balance, balance_inicial) VALUES (?, ?, ?, ?)',
+                 (id_proveedor, f'Proveedor {id_proveedor}', balance_inicial, balance_inicial))
+    conn.commit()
+
+
+def agregar_factura(conn, id_proveedor, monto, fecha_vencimiento, fecha_emision='2024-01-01'):
+    id_factura = conn.execute('''
+        INSERT INTO facturas (id_proveedor, monto, descripcion, fecha_emision, fecha_vencimiento, saldo)
+        VALUES (?, ?, '', ?, ?, ?)
+    ''', (id_proveedor, monto, fecha_emision, fecha_vencimiento, monto)).lastrowid
+    conn.commit()
+    return id_factura
+
+
+def saldos_facturas(conn):
+    return conn.execute('SELECT id_factura, saldo FROM facturas ORDER BY id_factura').fetchall()
+
+
+def balance_proveedor(conn, id_proveedor):
+    return conn.execute('SELECT balance FROM proveedores WHERE id_proveedor = ?', (id_proveedor,)).fetchone()[0]
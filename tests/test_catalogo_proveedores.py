@@ -0,0 +1,40 @@
+from catalogo_proveedores import CatalogoProveedores, buscar_por_prefijo
+from conftest import agregar_proveedor
+
+
+def test_catalogo_se_relee_solo_cuando_cambian_los_proveedores(conn):
+    agregar_proveedor(conn, 1)
+    catalogo = CatalogoProveedores()
+    lista = catalogo.obtener(conn)
+    assert lista == [(1, 'Proveedor 1')]
+
+    # Un cambio de balance no cambia la lista
+    conn.execute('UPDATE proveedores SET balance = balance + 10 WHERE id_proveedor = 1')
+    conn.commit()
+    assert catalogo.obtener(conn) is lista
+
+    conn.execute("UPDATE proveedores SET nombre = 'Acme' WHERE id_proveedor = 1")
+    conn.commit()
+    assert catalogo.obtener(conn) == [(1, 'Acme')]
+
+    agregar_proveedor(conn, 2)
+    assert catalogo.obtener(conn) == [(1, 'Acme'), (2, 'Proveedor 2')]
+
+    conn.execute('DELETE FROM proveedores WHERE id_proveedor = 2')
+    conn.commit()
+    assert catalogo.obtener(conn) == [(1, 'Acme')]
+
+
+def test_catalogo_sin_lista_con_demasiados_proveedores(conn):
+    for id_proveedor in range(1, 4):
+        agregar_proveedor(conn, id_proveedor)
+    assert CatalogoProveedores(max_lista=2).obtener(conn) is None
+
+
+def test_buscar_por_prefijo(conn):
+    for id_proveedor in range(1, 13):
+        agregar_proveedor(conn, id_proveedor)
+    assert buscar_por_prefijo(conn, 'proveedor 1', limite=3) == [
+        (1, 'Proveedor 1'), (10, 'Proveedor 10'), (11, 'Proveedor 11')]
+    assert buscar_por_prefijo(conn, '7') == [(7, 'Proveedor 7')]
+    assert buscar_por_prefijo(conn, '  ') == []
@@ -0,0 +1,102 @@
+from datetime import date
+
+import pytest
+
+from conftest import agregar_factura, agregar_proveedor, balance_proveedor, saldos_facturas
+from diario import ajustar_balance, anular_transaccion, balances_al, corregir_transaccion, tomar_instantanea
+from pagos import aplicar_pago
+
+
+def _registrar(conn, id_proveedor, tipo_movimiento, monto, fecha):
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto, fecha_registro)
+        VALUES (?, ?, ?, ?)
+    ''', (id_proveedor, tipo_movimiento, monto, fecha))
+    id_transaccion = cursor.lastrowid
+    if tipo_movimiento == 'CR':
+        aplicar_pago(cursor, id_transaccion, id_proveedor, monto)
+    conn.commit()
+    return id_transaccion
+
+
+def _balance_al(conn, fecha, id_proveedor):
+    return balances_al(conn, fecha, id_proveedor)[0][3]
+
+
+def test_anular_transaccion_devuelve_balance_y_saldos(conn):
+    agregar_proveedor(conn, 1, balance_inicial=500)
+    agregar_factura(conn, 1, 300, '2024-02-01')
+    antes = saldos_facturas(conn)
+    id_transaccion = _registrar(conn, 1, 'CR', 200, '2024-03-01 10:00:00')
+    assert balance_proveedor(conn, 1) == 700
+
+    anular_transaccion(conn.cursor(), id_transaccion)
+    conn.commit()
+
+    assert balance_proveedor(conn, 1) == 500
+    assert saldos_facturas(conn) == antes
+    with pytest.raises(ValueError):
+        anular_transaccion(conn.cursor(), id_transaccion)
+
+
+def test_corregir_transaccion_reemplaza_el_movimiento(conn):
+    agregar_proveedor(conn, 1)
+    agregar_factura(conn, 1, 300, '2024-02-01')
+    id_transaccion = _registrar(conn, 1, 'CR', 200, '2024-03-01 10:00:00')
+
+    nuevo_id, aplicaciones = corregir_transaccion(conn.cursor(), id_transaccion, 1, 'CR', 50)
+    conn.commit()
+
+    assert balance_proveedor(conn, 1) == 50
+    assert aplicaciones == [(1, 50)]
+    assert saldos_facturas(conn) == [(1, 250)]
+    # La original y su anulación quedan en el diario
+    assert conn.execute('SELECT COUNT(*) FROM transacciones').fetchone()[0] == 3
+    with pytest.raises(ValueError):
+        corregir_transaccion(conn.cursor(), nuevo_id, 1, 'CR', 0)
+
+
+def test_balances_al_con_movimiento_anterior_a_la_instantanea(conn):
+    agregar_proveedor(conn, 1, balance_inicial=100)
+    _registrar(conn, 1, 'DB', 30, '2024-01-05 09:00:00')
+    _registrar(conn, 1, 'CR', 10, '2024-01-20 09:00:00')
+    tomar_instantanea(conn, date(2024, 1, 10))
+    tomar_instantanea(conn, date(2024, 1, 31))
+    assert _balance_al(conn, date(2024, 1, 31), 1) == 80
+
+    # Un movimiento con fecha anterior invalida las instantáneas desde ese día
+    _registrar(conn, 1, 'DB', 25, '2024-01-08 12:00:00')
+
+    assert _balance_al(conn, date(2024, 1, 7), 1) == 70
+    assert _balance_al(conn, date(2024, 1, 10), 1) == 45
+    assert _balance_al(conn, date(2024, 1, 31), 1) == 55
+    assert _balance_al(conn, date(2024, 1, 31), 1) == balance_proveedor(conn, 1)
+
+
+def test_ajustar_balance_no_cambia_los_balances_anteriores(conn):
+    agregar_proveedor(conn, 1, balance_inicial=100)
+    _registrar(conn, 1, 'CR', 50, '2024-01-05 09:00:00')
+    tomar_instantanea(conn, date(2024, 1, 10))
+
+    ajustar_balance(conn.cursor(), 1, 500)
+    conn.commit()
+
+    assert balance_proveedor(conn, 1) == 500
+    assert _balance_al(conn, date.today(), 1) == 500
+    assert _balance_al(conn, date(2024, 1, 1), 1) == 100
+    assert _balance_al(conn, date(2024, 1, 10), 1) == 150
+    assert conn.execute('SELECT balance_inicial FROM proveedores WHERE id_proveedor = 1').fetchone()[0] == 100
+
+    ajustar_balance(conn.cursor(), 1, 420)
+    conn.commit()
+    assert _balance_al(conn, date.today(), 1) == 420
+    assert ajustar_balance(conn.cursor(), 1, 420) is None
+
+
+def test_balances_al_rechaza_la_fecha_maxima(conn):
+    agregar_proveedor(conn, 1)
+    with pytest.raises(ValueError):
+        balances_al(conn, date.max)
+    with pytest.raises(ValueError):
+        tomar_instantanea(conn, date.max)
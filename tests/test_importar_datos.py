@@ -0,0 +1,47 @@
+from conftest import agregar_proveedor, balance_proveedor
+from importar_datos import importar, registrar_lote
+
+
+def _factura(monto):
+    return {'id_proveedor': '1', 'monto': monto, 'descripcion': 'Factura',
+            'fecha_emision': '2024-01-01', 'fecha_vencimiento': '2024-01-31'}
+
+
+def test_importar_facturas_con_montos_no_finitos(conn):
+    agregar_proveedor(conn, 1)
+    filas = [_factura('100'), _factura('nan'), _factura('inf'), _factura('-Infinity'), _factura('50.5')]
+
+    resultado = importar(conn, 'facturas', filas)
+
+    assert resultado['importadas'] == 2
+    assert [error['linea'] for error in resultado['errores']] == [3, 4, 5]
+    assert conn.execute('SELECT monto FROM facturas ORDER BY id_factura').fetchall() == [(100,), (50.5,)]
+
+
+def test_importar_transacciones_con_montos_no_finitos(conn):
+    agregar_proveedor(conn, 1)
+    filas = [{'id_proveedor': '1', 'tipo_movimiento': 'DB', 'monto': monto} for monto in ['nan', '20', 'inf']]
+
+    resultado = importar(conn, 'transacciones', filas)
+
+    assert resultado['importadas'] == 1
+    assert resultado['total_errores'] == 2
+    assert balance_proveedor(conn, 1) == -20
+
+
+def test_lote_con_infinity_o_nan_no_se_registra(conn):
+    agregar_proveedor(conn, 1)
+    # El parser JSON de Flask convierte Infinity y NaN en float
+    filas = [{'id_proveedor': 1, 'tipo_movimiento': 'CR', 'monto': 10},
+             {'id_proveedor': 1, 'tipo_movimiento': 'CR', 'monto': float('inf')},
+             {'id_proveedor': 1, 'tipo_movimiento': 'DB', 'monto': float('nan')}]
+
+    resultados, registrado = registrar_lote(conn, filas)
+    assert not registrado
+    assert [resultado['estado'] for resultado in resultados] == ['no_registrado', 'error', 'error']
+    assert balance_proveedor(conn, 1) == 0
+
+    resultados, registrado = registrar_lote(conn, filas, parcial=True)
+    assert registrado
+    assert [resultado['estado'] for resultado in resultados] == ['registrado', 'error', 'error']
+    assert balance_proveedor(conn, 1) == 10
@@ -0,0 +1,68 @@
+from conftest import agregar_factura, agregar_proveedor, saldos_facturas
+from pagos import aplicar_pago, aplicar_pagos, revertir_pago
+
+PAGOS = [(1, 100), (1, 300), (2, 40), (1, 100), (2, 75.5), (1, 1000), (2, 10)]
+
+
+def _preparar(conn):
+    agregar_proveedor(conn, 1)
+    agregar_proveedor(conn, 2)
+    for id_proveedor, monto, vencimiento in [
+        (1, 100, '2024-02-01'), (1, 250, '2024-01-15'), (1, 100, '2024-03-01'), (1, 80, '2024-02-10'),
+        (2, 40, '2024-01-20'), (2, 60, '2024-01-10'),
+    ]:
+        agregar_factura(conn, id_proveedor, monto, vencimiento)
+
+
+def _registrar_pago(cursor, id_proveedor, monto):
+    cursor.execute('''
+        INSERT INTO transacciones (id_proveedor, tipo_movimiento, monto, fecha_registro)
+        VALUES (?, 'CR', ?, '2024-04-01')
+    ''', (id_proveedor, monto))
+    return cursor.lastrowid
+
+
+def _vinculos(conn):
+    return conn.execute('''
+        SELECT id_transaccion, id_factura, monto_aplicado FROM pagos_facturas
+        ORDER BY id_transaccion, id_factura
+    ''').fetchall()
+
+
+def test_aplicar_pagos_igual_que_aplicar_pago_uno_por_uno(conn):
+    _preparar(conn)
+    cursor = conn.cursor()
+    esperado = {}
+    for id_proveedor, monto in PAGOS:
+        id_transaccion = _registrar_pago(cursor, id_proveedor, monto)
+        esperado[id_transaccion] = aplicar_pago(cursor, id_transaccion, id_proveedor, monto)
+    saldos_esperados = saldos_facturas(conn)
+    vinculos_esperados = _vinculos(conn)
+    conn.rollback()
+
+    pagos = [(_registrar_pago(cursor, id_proveedor, monto), id_proveedor, monto) for id_proveedor, monto in PAGOS]
+    assert aplicar_pagos(cursor, pagos) == esperado
+    assert saldos_facturas(conn) == saldos_esperados
+    assert _vinculos(conn) == vinculos_esperados
+
+
+def test_monto_no_positivo_no_se_aplica(conn):
+    _preparar(conn)
+    cursor = conn.cursor()
+    antes = saldos_facturas(conn)
+    assert aplicar_pago(cursor, 1, 1, 0) == []
+    assert aplicar_pago(cursor, 2, 1, -100) == []
+    assert aplicar_pagos(cursor, [(3, 1, -100), (4, 2, 0)]) == {3: [], 4: []}
+    assert saldos_facturas(conn) == antes
+    assert _vinculos(conn) == []
+
+
+def test_revertir_pago_devuelve_los_saldos(conn):
+    _preparar(conn)
+    antes = saldos_facturas(conn)
+    cursor = conn.cursor()
+    id_transaccion = _registrar_pago(cursor, 1, 300)
+    assert aplicar_pago(cursor, id_transaccion, 1, 300)
+    revertir_pago(cursor, id_transaccion)
+    assert saldos_facturas(conn) == antes
+    assert _vinculos(conn) == []
@@ -0,0 +1,48 @@
+import time
+
+import trabajos_reportes
+from trabajos_reportes import CacheArtefactos, ColaReportes, transaccion_estado
+
+
+def _guardar(cache, clave, tamano):
+    ruta = cache.ruta_temporal()
+    with open(ruta, 'wb') as archivo:
+        archivo.write(b'x' * tamano)
+    return cache.guardar(clave, ruta)
+
+
+def test_cache_compartida_respeta_el_limite_de_bytes(tmp_path):
+    directorio = str(tmp_path / 'reportes')
+    cache = CacheArtefactos(directorio, max_bytes=100)
+    # Otra instancia sobre el mismo directorio, como otro proceso de la aplicación
+    otra = CacheArtefactos(directorio, max_bytes=100)
+
+    _guardar(cache, 'a.csv', 40)
+    _guardar(otra, 'b.csv', 40)
+    assert otra.obtener('a.csv') is not None
+    _guardar(cache, 'c.csv', 40)
+
+    # Se expulsa b.csv, el usado hace más tiempo
+    assert cache.total_bytes == otra.total_bytes == 80
+    assert otra.obtener('b.csv') is None
+    assert cache.obtener('a.csv') is not None
+    assert cache.obtener('c.csv') is not None
+
+
+def test_recortar_conserva_los_trabajos_pendientes(tmp_path, monkeypatch):
+    monkeypatch.setattr(trabajos_reportes, 'MAX_TRABAJOS', 2)
+    cache = CacheArtefactos(str(tmp_path / 'reportes'), max_bytes=1000)
+    cola = ColaReportes('no-existe.db', cache)
+    ahora = time.time()
+    with transaccion_estado(cache.directorio) as conn:
+        conn.executemany('''
+            INSERT INTO trabajos (id, tabla, formato, estado, clave, error, creado)
+            VALUES (?, 'facturas', 'csv', ?, ?, NULL, ?)
+        ''', [('p1', 'pendiente', 'p1.csv', ahora - 40), ('l1', 'listo', 'l1.csv', ahora - 30),
+              ('p2', 'pendiente', 'p2.csv', ahora - 20), ('l2', 'listo', 'l2.csv', ahora - 10)])
+        cola._recortar(conn)
+
+    assert cola.estado('p1')['estado'] == 'pendiente'
+    assert cola.estado('p2')['estado'] == 'pendiente'
+    assert cola.estado('l1') is None
+    assert cola.estado('l2') is None
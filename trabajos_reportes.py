@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager
+
+from generador_reportes import EXTENSIONES, generar_archivo
+
+# Trabajos que se recuerdan para consultar su estado
+MAX_TRABAJOS = 1000
+
+# Segundos tras los que un trabajo pendiente se da por perdido (por ejemplo si el
+# proceso que lo generaba se reinició)
+TRABAJO_MAX_SEGUNDOS = int(os.environ.get('CXP_REPORTES_TRABAJO_MAX', '3600'))
+
+# Base de datos con el estado compartido por todos los procesos de la aplicación
+# (trabajos y el índice de la caché); vive en el mismo directorio que los archivos
+ARCHIVO_ESTADO = 'estado.db'
+
+
+# El índice de la caché y los trabajos se guardan en SQLite y no en memoria, así
+# cualquier proceso de gunicorn puede responder por un trabajo que encoló otro y
+# todos respetan el mismo límite de bytes. Cada operación abre su propia conexión,
+# que nunca se comparte entre procesos.
+@contextmanager
+def conectar_estado(directorio):
+    conn = sqlite3.connect(os.path.join(directorio, ARCHIVO_ESTADO), timeout=30, isolation_level=None)
+    with closing(conn):
+        yield conn
+
+
+# Transacción de escritura sobre el estado compartido
+@contextmanager
+def transaccion_estado(directorio):
+    with conectar_estado(directorio) as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+
+def crear_estado(directorio):
+    with conectar_estado(directorio) as conn:
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS artefactos (
+                clave TEXT PRIMARY KEY,
+                tamano INTEGER NOT NULL,
+                usado REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_artefactos_usado ON artefactos (usado)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id TEXT PRIMARY KEY,
+                tabla TEXT NOT NULL,
+                formato TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                error TEXT,
+                creado REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_trabajos_pendientes ON trabajos (clave) WHERE estado = \'pendiente\'')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_trabajos_creado ON trabajos (creado)')
+
+
+# Caché en disco de reportes generados con expulsión LRU por tamaño total. El
+# índice (tamaño y último uso de cada archivo) está en la base de datos de estado.
+class CacheArtefactos:
+    def __init__(self, directorio, max_bytes):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        os.makedirs(directorio, exist_ok=True)
+        crear_estado(directorio)
+
+        # Sincroniza el índice con los archivos del directorio: agrega los que falten
+        # (de versiones anteriores sin índice) y olvida los que ya no existen. Los
+        # temporales abandonados se borran; los recientes pueden ser de otro proceso.
+        archivos = {}
+        for nombre in os.listdir(directorio):
+            ruta = os.path.join(directorio, nombre)
+            if nombre.startswith(ARCHIVO_ESTADO) or not os.path.isfile(ruta):
+                continue
+            if nombre.endswith('.tmp'):
+                if os.path.getmtime(ruta) < time.time() - TRABAJO_MAX_SEGUNDOS:
+                    os.remove(ruta)
+            else:
+                archivos[nombre] = (os.path.getsize(ruta), os.path.getmtime(ruta))
+        with transaccion_estado(directorio) as conn:
+            indexados = {clave for clave, in conn.execute('SELECT clave FROM artefactos')}
+            conn.executemany('DELETE FROM artefactos WHERE clave = ?', [(clave,) for clave in indexados - set(archivos)])
+            conn.executemany('INSERT INTO artefactos (clave, tamano, usado) VALUES (?, ?, ?)',
+                             [(clave, *archivos[clave]) for clave in set(archivos) - indexados])
+            self._expulsar(conn)
+
+    @staticmethod
+    def clave(tabla, formato, version):
+        return f'{tabla}-v{version}.{EXTENSIONES[formato]}'
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    def ruta_temporal(self):
+        return os.path.join(self.directorio, f'{uuid.uuid4().hex}.tmp')
+
+    @property
+    def total_bytes(self):
+        with conectar_estado(self.directorio) as conn:
+            return conn.execute('SELECT COALESCE(SUM(tamano), 0) FROM artefactos').fetchone()[0]
+
+    # Devuelve la ruta del archivo si está en caché y lo marca como usado
+    def obtener(self, clave):
+        ruta = self.ruta(clave)
+        with transaccion_estado(self.directorio) as conn:
+            if not conn.execute('UPDATE artefactos SET usado = ? WHERE clave = ?', (time.time(), clave)).rowcount:
+                return None
+            if not os.path.exists(ruta):
+                conn.execute('DELETE FROM artefactos WHERE clave = ?', (clave,))
+                return None
+        return ruta
+
+    # Mueve un archivo generado a la caché con su clave definitiva
+    def guardar(self, clave, ruta_temporal):
+        tamano = os.path.getsize(ruta_temporal)
+        with transaccion_estado(self.directorio) as conn:
+            os.replace(ruta_temporal, self.ruta(clave))
+            conn.execute('INSERT OR REPLACE INTO artefactos (clave, tamano, usado) VALUES (?, ?, ?)',
+                         (clave, tamano, time.time()))
+            self._expulsar(conn, conservar=clave)
+        return self.ruta(clave)
+
+    # Escribe los bloques de texto en la caché a medida que se envían; si el envío se
+    # interrumpe el archivo incompleto se descarta
+    def guardar_bloques(self, clave, bloques):
+        ruta_temporal = self.ruta_temporal()
+        try:
+            with open(ruta_temporal, 'wb') as archivo:
+                for bloque in bloques:
+                    archivo.write(bloque.encode('utf-8'))
+                    yield bloque
+        except BaseException:
+            os.remove(ruta_temporal)
+            raise
+        self.guardar(clave, ruta_temporal)
+
+    # Borra todos los archivos de la caché
+    def vaciar(self):
+        with transaccion_estado(self.directorio) as conn:
+            for clave, in conn.execute('SELECT clave FROM artefactos').fetchall():
+                try:
+                    os.remove(self.ruta(clave))
+                except OSError:
+                    pass
+            conn.execute('DELETE FROM artefactos')
+
+    # Borra los archivos usados hace más tiempo hasta quedar bajo el límite de bytes
+    def _expulsar(self, conn, conservar=None):
+        total = conn.execute('SELECT COALESCE(SUM(tamano), 0) FROM artefactos').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for clave, tamano in conn.execute('SELECT clave, tamano FROM artefactos WHERE clave IS NOT ? ORDER BY usado',
+                                          (conservar,)).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM artefactos WHERE clave = ?', (clave,))
+            total -= tamano
+            try:
+                os.remove(self.ruta(clave))
+            except OSError:
+                pass
+
+
+def _como_trabajo(fila):
+    return dict(zip(['id', 'tabla', 'formato', 'estado', 'clave', 'error'], fila)) if fila else None
+
+
+# Cola de reportes que se generan en un pool de procesos locales. El estado de los
+# trabajos se guarda junto a la caché, así cualquier proceso responde a las consultas
+# y un trabajo en curso en otro proceso se reutiliza en lugar de repetirse.
+class ColaReportes:
+    def __init__(self, db_path, cache, procesos=2):
+        self.db_path = db_path
+        self.cache = cache
+        self.procesos = procesos
+        self._executor = None
+
+    def _obtener_executor(self):
+        # Los procesos se crean al enviar el primer trabajo, no al importar la aplicación
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.procesos)
+        return self._executor
+
+    # Crea un trabajo o reutiliza el artefacto en caché si los datos no han cambiado.
+    # `db_path` cambia la base de datos de la que se lee (por ejemplo una réplica).
+    def enviar(self, tabla, formato, version, db_path=None):
+        clave = self.cache.clave(tabla, formato, version)
+        with transaccion_estado(self.cache.directorio) as conn:
+            en_curso = conn.execute('''
+                SELECT id, tabla, formato, estado, clave, error FROM trabajos
+                WHERE clave = ? AND estado = 'pendiente' AND creado >= ?
+            ''', (clave, time.time() - TRABAJO_MAX_SEGUNDOS)).fetchone()
+            if en_curso:
+                return _como_trabajo(en_curso)
+
+            trabajo = {'id': uuid.uuid4().hex, 'tabla': tabla, 'formato': formato,
+                       'estado': 'pendiente', 'clave': clave, 'error': None}
+            conn.execute('''
+                INSERT INTO trabajos (id, tabla, formato, estado, clave, error, creado)
+                VALUES (:id, :tabla, :formato, :estado, :clave, :error, :creado)
+            ''', dict(trabajo, creado=time.time()))
+            self._recortar(conn)
+
+        if self.cache.obtener(clave):
+            self._actualizar(trabajo, estado='listo')
+            return trabajo
+
+        ruta_temporal = self.cache.ruta_temporal()
+        try:
+            futuro = self._obtener_executor().submit(generar_archivo, db_path or self.db_path, tabla, formato,
+                                                     ruta_temporal)
+        except Exception as e:
+            self._actualizar(trabajo, estado='error', error=str(e))
+            return trabajo
+        futuro.add_done_callback(lambda f: self._terminar(trabajo, ruta_temporal, f))
+        return trabajo
+
+    # Olvida los trabajos terminados más antiguos cuando hay más de MAX_TRABAJOS; los
+    # pendientes se conservan porque todavía se consultan y se reutilizan
+    def _recortar(self, conn):
+        conn.execute('''
+            DELETE FROM trabajos
+            WHERE estado != 'pendiente'
+              AND id NOT IN (SELECT id FROM trabajos WHERE estado != 'pendiente' ORDER BY creado DESC
+                             LIMIT MAX(? - (SELECT COUNT(*) FROM trabajos WHERE estado = 'pendiente'), 0))
+        ''', (MAX_TRABAJOS,))
+
+    def _actualizar(self, trabajo, **cambios):
+        trabajo.update(cambios)
+        with transaccion_estado(self.cache.directorio) as conn:
+            conn.execute('UPDATE trabajos SET estado = ?, clave = ?, error = ? WHERE id = ?',
+                         (trabajo['estado'], trabajo['clave'], trabajo['error'], trabajo['id']))
+
+    def _terminar(self, trabajo, ruta_temporal, futuro):
+        try:
+            version = futuro.result()
+            # La clave final usa la versión leída por el proceso, que puede ser más reciente
+            clave = self.cache.clave(trabajo['tabla'], trabajo['formato'], version)
+            self.cache.guardar(clave, ruta_temporal)
+            self._actualizar(trabajo, estado='listo', clave=clave)
+        except Exception as e:
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+            self._actualizar(trabajo, estado='error', error=str(e))
+
+    def estado(self, id_trabajo):
+        with conectar_estado(self.cache.directorio) as conn:
+            fila = conn.execute('SELECT id, tabla, formato, estado, clave, error, creado FROM trabajos WHERE id = ?',
+                                (id_trabajo,)).fetchone()
+        if fila is None:
+            return None
+        trabajo = _como_trabajo(fila[:6])
+        if trabajo['estado'] == 'pendiente' and fila[6] < time.time() - TRABAJO_MAX_SEGUNDOS:
+            self._actualizar(trabajo, estado='error', error='El trabajo no terminó a tiempo')
+        return trabajo
+
+    # Ruta del archivo generado o None si todavía no está listo o fue expulsado
+    def archivo(self, id_trabajo):
+        trabajo = self.estado(id_trabajo)
+        if trabajo is None or trabajo['estado'] != 'listo':
+            return None
+        return self.cache.obtener(trabajo['clave'])
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None